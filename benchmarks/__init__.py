@@ -0,0 +1,4 @@
+"""
+Offline benchmarks of the Tidal client, sync engine and views against a fake Tidal
+API served on loopback. Run with `python -m benchmarks.run`.
+"""
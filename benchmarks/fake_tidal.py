@@ -0,0 +1,429 @@
+"""
+A fake Tidal API served over HTTP on loopback.
+
+FakeTidalServer answers the OAuth token endpoint and the JSON:API resources the client
+uses (user collection, playlists, playlist items, tracks with included artists and
+albums) from a deterministic SyntheticLibrary, with cursor pagination like Tidal's.
+Latency, 429 responses and server errors can be injected so the client's pacing and
+retries are measured over real sockets rather than a stubbed adapter.
+"""
+
+import hashlib
+import json
+import multiprocessing
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+
+PAGE_SIZE = 20
+USER_ID = "4242"
+
+
+class SyntheticLibrary:
+    """
+    A deterministic user library: tracks spread over playlists with some tracks
+    appearing in more than one playlist, like a real collection.
+    """
+
+    def __init__(self, tracks=10_000, playlist_size=500, overlap=0.1, seed=1):
+        rng = random.Random(seed)
+        self.track_count = tracks
+        self.artist_count = max(1, tracks // 10)
+        self.album_count = max(1, tracks // 12)
+
+        track_ids = [str(100_000 + i) for i in range(tracks)]
+        rng.shuffle(track_ids)
+        playlist_count = max(1, round(tracks / playlist_size))
+        self.playlists = {}
+        for index in range(playlist_count):
+            playlist_id = f"bench-{index:05d}"
+            items = track_ids[index::playlist_count]
+            items += rng.sample(track_ids, min(len(track_ids), int(len(items) * overlap)))
+            self.playlists[playlist_id] = {
+                "name": f"Benchmark Playlist {index}",
+                "tracks": items,
+                "modified": "2024-01-01T00:00:00Z",
+            }
+
+    @property
+    def item_count(self):
+        return sum(len(playlist["tracks"]) for playlist in self.playlists.values())
+
+    def track(self, track_id):
+        number = int(track_id) - 100_000
+        if not 0 <= number < self.track_count:
+            return None
+        return {
+            "id": track_id,
+            "type": "tracks",
+            "attributes": {
+                "title": f"Synthetic Track {number}",
+                "isrc": f"QZBEN{number:07d}",
+                "duration": f"PT{2 + number % 4}M{number % 60}S",
+                "explicit": number % 7 == 0,
+            },
+            "relationships": {
+                "artists": {"data": [{"id": self.artist_id(number), "type": "artists"}]},
+                "albums": {"data": [{"id": self.album_id(number), "type": "albums"}]},
+            },
+        }
+
+    def artist_id(self, number):
+        return f"ar{number % self.artist_count}"
+
+    def album_id(self, number):
+        return f"al{number % self.album_count}"
+
+    def included(self, tracks):
+        included = {}
+        for track in tracks:
+            number = int(track["id"]) - 100_000
+            artist_id, album_id = self.artist_id(number), self.album_id(number)
+            included[("artists", artist_id)] = {
+                "id": artist_id,
+                "type": "artists",
+                "attributes": {"name": f"Synthetic Artist {artist_id[2:]}"},
+            }
+            included[("albums", album_id)] = {
+                "id": album_id,
+                "type": "albums",
+                "attributes": {"title": f"Synthetic Album {album_id[2:]}", "releaseDate": None},
+            }
+        return list(included.values())
+
+
+class FakeTidalServer:
+    """
+    Serves a SyntheticLibrary on 127.0.0.1 from a ThreadingHTTPServer.
+
+    latency is added to every response (seconds, plus up to jitter more);
+    the first request for every throttle_every-th distinct API URL is answered 429
+    with a Retry-After of retry_after seconds, and that for every fail_every-th with
+    a 503 (after the 429 when it is both). Faults are counted per URL rather than
+    across requests, so concurrent clients cannot line several faults up against one
+    request: a URL fails at most twice in a row. API responses carry an
+    ETag, answered with a 304 when it matches If-None-Match, and may be cached for
+    max_age seconds (by default they must be revalidated). Counters of what was
+    served, including the API body bytes, are available from `stats`.
+
+    With separate_process the server runs in a child process, so its request handling
+    does not compete with the code being measured for the GIL; tests use the default
+    in-process thread.
+    """
+
+    def __init__(
+        self,
+        library,
+        latency=0.0,
+        jitter=0.0,
+        throttle_every=0,
+        fail_every=0,
+        retry_after=0.0,
+        max_age=0,
+        separate_process=False,
+    ):
+        self.library = library
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle_every = throttle_every
+        self.fail_every = fail_every
+        self.retry_after = retry_after
+        self.max_age = max_age
+        self.separate_process = separate_process
+        self.api_urls = 0
+        # Faults still to answer per API URL, from its serial among distinct URLs
+        self._faults = {}
+        self.token_serial = 0
+        self._stats = Counter()
+        self._lock = threading.Lock()
+        self._random = random.Random(0)
+        self._httpd = None
+        self._thread = None
+        self._process = None
+        self._url = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        if self.separate_process:
+            parent, child = multiprocessing.Pipe()
+            options = {
+                "latency": self.latency,
+                "jitter": self.jitter,
+                "throttle_every": self.throttle_every,
+                "fail_every": self.fail_every,
+                "retry_after": self.retry_after,
+                "max_age": self.max_age,
+            }
+            self._process = multiprocessing.Process(
+                target=_serve, args=(self.library, options, child), name="fake-tidal", daemon=True
+            )
+            self._process.start()
+            self._url = parent.recv()
+            return self
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, name="fake-tidal", daemon=True
+        )
+        self._thread.start()
+        host, port = self._httpd.server_address[:2]
+        self._url = f"http://{host}:{port}"
+        return self
+
+    def stop(self):
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join()
+            self._process = None
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._thread.join()
+            self._httpd = None
+
+    @property
+    def url(self):
+        return self._url
+
+    @property
+    def api_url(self):
+        return f"{self.url}/v2"
+
+    @property
+    def auth_url(self):
+        return f"{self.url}/v1/oauth2/token"
+
+    def environ(self):
+        """
+        Environment variables pointing the Tidal client at this server.
+        """
+        return {
+            "TIDAL_CLIENT_ID": "bench-client",
+            "TIDAL_CLIENT_SECRET": "bench-secret",
+            "TIDAL_AUTH": self.auth_url,
+            "TIDAL_API_URL": self.api_url,
+        }
+
+    @property
+    def stats(self):
+        """
+        A snapshot of the counters of what was served.
+        """
+        if self._process is not None:
+            return Counter(requests.get(f"{self.url}/_fake/stats", timeout=5).json())
+        with self._lock:
+            return Counter(self._stats)
+
+    def reset_stats(self):
+        if self._process is not None:
+            requests.post(f"{self.url}/_fake/reset", timeout=5).raise_for_status()
+            return
+        with self._lock:
+            self._stats.clear()
+
+    def count(self, key, amount=1):
+        with self._lock:
+            self._stats[key] += amount
+
+    def _delay(self):
+        with self._lock:
+            extra = self._random.uniform(0, self.jitter) if self.jitter else 0.0
+        if self.latency or extra:
+            time.sleep(self.latency + extra)
+
+    def _injected_fault(self, url):
+        """
+        Returns the status of an injected 429 or 503 for this API request, or None.
+        """
+        with self._lock:
+            faults = self._faults.get(url)
+            if faults is None:
+                self.api_urls += 1
+                serial = self.api_urls
+                faults = self._faults[url] = [
+                    status
+                    for status, every in ((429, self.throttle_every), (503, self.fail_every))
+                    if every and serial % every == 0
+                ]
+            return faults.pop(0) if faults else None
+
+    # Routes
+
+    def token(self, form):
+        grant_type = form.get("grant_type", [""])[0]
+        if grant_type == "client_credentials":
+            self.count("token_app")
+            return 200, {"access_token": "bench-app", "token_type": "Bearer", "expires_in": 3600}
+        if grant_type == "refresh_token":
+            with self._lock:
+                self.token_serial += 1
+                serial = self.token_serial
+            self.count("token_refresh")
+            return 200, {
+                "access_token": f"bench-user-{serial}",
+                "refresh_token": f"bench-refresh-{serial}",
+                "token_type": "Bearer",
+                "expires_in": 86400,
+            }
+        return 400, {"error": "unsupported_grant_type"}
+
+    def api(self, path, query):
+        segments = path.strip("/").split("/")[1:]
+        if segments == ["users", "me"]:
+            return 200, {"data": {"id": USER_ID, "type": "users", "attributes": {"country": "US"}}}
+        if segments[:1] == ["userCollections"] and segments[2:] == [
+            "relationships",
+            "playlists",
+        ]:
+            items = [
+                {"id": playlist_id, "type": "playlists"} for playlist_id in self.library.playlists
+            ]
+            return self.paginate(path, items, query)
+        if segments[:1] == ["playlists"] and segments[2:] == ["relationships", "items"]:
+            playlist = self.library.playlists.get(segments[1])
+            if playlist is None:
+                return 404, {"errors": [{"detail": "Playlist not found"}]}
+            items = [
+                {
+                    "id": track_id,
+                    "type": "tracks",
+                    "meta": {"itemId": f"{segments[1]}-{i}", "addedAt": "2024-01-01T00:00:00Z"},
+                }
+                for i, track_id in enumerate(playlist["tracks"])
+            ]
+            return self.paginate(path, items, query)
+        if segments == ["playlists"]:
+            data = [self.playlist(playlist_id) for playlist_id in query.get("filter[id]", [])]
+            return 200, {"data": [playlist for playlist in data if playlist]}
+        if segments[:1] == ["playlists"] and len(segments) == 2:
+            return 200, {"data": self.playlist(segments[1])}
+        if segments == ["tracks"]:
+            return 200, self.tracks(query)
+        return 404, {"errors": [{"detail": f"No fake route for {path}"}]}
+
+    def playlist(self, playlist_id):
+        playlist = self.library.playlists.get(playlist_id)
+        if playlist is None:
+            return None
+        return {
+            "id": playlist_id,
+            "type": "playlists",
+            "attributes": {
+                "name": playlist["name"],
+                "numberOfItems": len(playlist["tracks"]),
+                "lastModifiedAt": playlist["modified"],
+            },
+        }
+
+    def tracks(self, query):
+        if "filter[isrc]" in query:
+            ids = [str(100_000 + int(isrc[5:])) for isrc in query["filter[isrc]"]]
+        else:
+            ids = query.get("filter[id]", [])
+        data = [track for track in map(self.library.track, ids) if track is not None]
+        body = {"data": data}
+        if query.get("include"):
+            body["included"] = self.library.included(data)
+        return body
+
+    def paginate(self, path, items, query):
+        cursor = int(query.get("page[cursor]", ["0"])[0])
+        body = {"data": items[cursor : cursor + PAGE_SIZE], "links": {}}
+        if cursor + PAGE_SIZE < len(items):
+            body["links"]["next"] = f"{path[3:]}?page[cursor]={cursor + PAGE_SIZE}"
+        return 200, body
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately; without this, Nagle's algorithm
+            # and delayed ACKs add ~40ms to every keep-alive response
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                self.dispatch()
+
+            def do_POST(self):
+                self.dispatch()
+
+            def dispatch(self):
+                parts = urlsplit(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length).decode() if length else ""
+
+                if parts.path == "/_fake/stats":
+                    return self.respond(200, dict(server.stats))
+                if parts.path == "/_fake/reset":
+                    server.reset_stats()
+                    return self.respond(200, {})
+
+                server._delay()
+                if parts.path.startswith("/v1/oauth2/token"):
+                    status, payload = server.token(parse_qs(body))
+                    return self.respond(status, payload)
+
+                if not self.headers.get("Authorization"):
+                    return self.respond(401, {"errors": [{"detail": "Missing token"}]})
+
+                fault = server._injected_fault(self.path)
+                if fault:
+                    server.count(f"status_{fault}")
+                    headers = {"Retry-After": str(server.retry_after)} if fault == 429 else {}
+                    return self.respond(fault, {"errors": [{"status": fault}]}, headers)
+
+                status, payload = server.api(parts.path, parse_qs(parts.query))
+                server.count("api_requests")
+                if status != 200:
+                    server.count(f"status_{status}")
+                    return self.respond(status, payload)
+
+                data = json.dumps(payload).encode()
+                etag = f'"{hashlib.sha1(data).hexdigest()[:16]}"'
+                cache_control = (
+                    f"private, max-age={server.max_age}" if server.max_age else "private, no-cache"
+                )
+                headers = {"ETag": etag, "Cache-Control": cache_control}
+                if self.headers.get("If-None-Match") == etag:
+                    server.count("status_304")
+                    return self.respond(304, b"", headers)
+                server.count("status_200")
+                server.count("api_bytes", len(data))
+                self.respond(200, data, headers)
+
+            def respond(self, status, payload, headers=None):
+                data = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+                self.send_response(status)
+                if status != 304:
+                    self.send_header("Content-Type", "application/vnd.api+json")
+                    self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def _serve(library, options, connection):
+    """
+    Child process entry point: serve in a thread and report the URL to the parent.
+    """
+    server = FakeTidalServer(library, **options).start()
+    connection.send(server.url)
+    server._thread.join()
@@ -0,0 +1,212 @@
+"""
+Run the benchmark scenarios against a fake Tidal API on loopback and compare the
+results with a stored baseline.
+
+    python -m benchmarks.run                      # default library, compare with baseline
+    python -m benchmarks.run --tracks 100000      # large library
+    python -m benchmarks.run --latency-ms 30 --throttle-every 50
+    python -m benchmarks.run --save-baseline      # record the numbers to compare against
+
+Scenarios run in a throwaway test database, so nothing touches the development data.
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent
+DEFAULT_BASELINE = BASE_DIR / "baseline.json"
+DEFAULT_OUTPUT = BASE_DIR / "results" / "latest.json"
+
+# Library shape and fault injection; results are only compared with a baseline
+# recorded with the same settings
+CONFIG_KEYS = (
+    "tracks",
+    "playlist_size",
+    "latency_ms",
+    "throttle_every",
+    "fail_every",
+    "repeat",
+    "concurrency",
+    "paced",
+)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("scenarios", nargs="*", help="Scenarios to run (default: all)")
+    parser.add_argument("--tracks", type=int, default=10_000)
+    parser.add_argument("--playlist-size", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="Added to every response")
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument(
+        "--throttle-every", type=int, default=0, help="Answer every Nth URL with a 429"
+    )
+    parser.add_argument("--fail-every", type=int, default=0, help="Answer every Nth URL with a 503")
+    parser.add_argument("--retry-after", type=float, default=0.05, help="Seconds, on 429s")
+    parser.add_argument("--repeat", type=int, default=20, help="Samples per latency figure")
+    parser.add_argument("--concurrency", type=int, default=32, help="Token refresh callers")
+    parser.add_argument(
+        "--paced",
+        action="store_true",
+        help="Keep the configured rate limits instead of measuring the client unthrottled",
+    )
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.25, help="Allowed slowdown before flagging"
+    )
+    parser.add_argument(
+        "--check", action="store_true", help="Exit with status 1 when a scenario regressed"
+    )
+    return parser.parse_args(argv)
+
+
+def setup_django(paced):
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "harmoniq.settings")
+    os.environ.setdefault("SERVER_TIMING", "False")
+    if not paced:
+        for name in ("APP_RPS", "APP_BURST", "USER_RPS", "USER_BURST"):
+            os.environ[f"TIDAL_RATE_LIMIT_{name}"] = "1000000"
+
+    import django
+
+    django.setup()
+    # Sync and token refresh log every step at INFO; keep the report readable
+    logging.disable(logging.INFO)
+
+
+def create_database():
+    """
+    Create a throwaway test database. SQLite gets a file rather than Django's in-memory
+    default so WAL and the other pragmas behave as they do in production.
+    Returns a callable destroying it.
+    """
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()
+    directory = None
+    if connection.vendor == "sqlite":
+        directory = tempfile.TemporaryDirectory(prefix="harmoniq-bench-")
+        connection.settings_dict["TEST"]["NAME"] = str(Path(directory.name) / "bench.sqlite3")
+
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+
+    def destroy():
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        if directory is not None:
+            directory.cleanup()
+
+    return destroy
+
+
+def compare(results, baseline, tolerance):
+    """
+    Returns (scenario, seconds, baseline seconds, ratio, regressed) rows.
+    """
+    rows = []
+    for name, result in results.items():
+        previous = (baseline or {}).get("results", {}).get(name, {}).get("seconds")
+        ratio = result["seconds"] / previous if previous else None
+        rows.append(
+            (name, result["seconds"], previous, ratio, bool(ratio and ratio > 1 + tolerance))
+        )
+    return rows
+
+
+def run(options):
+    from tidal.http import TidalTransport, set_transport
+
+    from .fake_tidal import FakeTidalServer, SyntheticLibrary
+    from .scenarios import SCENARIOS, Bench
+
+    names = options.scenarios or list(SCENARIOS)
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    library = SyntheticLibrary(tracks=options.tracks, playlist_size=options.playlist_size)
+    server = FakeTidalServer(
+        library,
+        latency=options.latency_ms / 1000,
+        jitter=options.jitter_ms / 1000,
+        throttle_every=options.throttle_every,
+        fail_every=options.fail_every,
+        retry_after=options.retry_after,
+        separate_process=True,
+    )
+
+    results = {}
+    with server:
+        os.environ.update(server.environ())
+        previous = set_transport(TidalTransport())
+        try:
+            bench = Bench(server, repeat=options.repeat, concurrency=options.concurrency)
+            for name in names:
+                bench.reset()
+                print(f"Running {name}...", file=sys.stderr)
+                results[name] = SCENARIOS[name](bench)
+                results[name]["server"] = dict(sorted(server.stats.items()))
+        finally:
+            set_transport(previous)
+    return results
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    setup_django(options.paced)
+    destroy = create_database()
+    try:
+        results = run(options)
+    finally:
+        destroy()
+
+    config = {key: getattr(options, key) for key in CONFIG_KEYS}
+    report = {
+        "config": config,
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "results": results,
+    }
+
+    baseline = None
+    if options.baseline.exists():
+        baseline = json.loads(options.baseline.read_text())
+        if baseline.get("config") != config:
+            print("Baseline was recorded with other settings; not comparing.", file=sys.stderr)
+            baseline = None
+
+    rows = compare(results, baseline, options.tolerance)
+    print(f"{'scenario':<18}{'seconds':>10}{'baseline':>10}{'ratio':>8}")
+    for name, seconds, previous, ratio, regressed in rows:
+        previous = f"{previous:.4f}" if previous else "-"
+        ratio_text = f"{ratio:.2f}" if ratio else "-"
+        flag = "  REGRESSED" if regressed else ""
+        print(f"{name:<18}{seconds:>10.4f}{previous:>10}{ratio_text:>8}{flag}")
+
+    options.output.parent.mkdir(parents=True, exist_ok=True)
+    options.output.write_text(json.dumps(report, indent=2) + "\n")
+    if options.save_baseline:
+        options.baseline.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"Saved baseline to {options.baseline}", file=sys.stderr)
+
+    if options.check and any(row[-1] for row in rows):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,265 @@
+"""
+Benchmark scenarios. Each takes a Bench and returns a dict of measurements; "seconds"
+is the headline number compared against the baseline.
+"""
+
+import threading
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import close_old_connections
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from tidal import export
+from tidal.api import TidalAPIClient, TidalTokenManager
+from tidal.models import Album, Artist, CatalogEntry, Playlist, Song, TidalToken
+from tidal.sync import PlaylistSyncEngine
+from tidal.token_cache import app_tokens, user_tokens
+
+from .fake_tidal import USER_ID
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def latency_summary(samples, prefix=""):
+    """
+    Median, 95th percentile and mean of durations in seconds, in milliseconds.
+    """
+    return {
+        f"{prefix}p50_ms": round(percentile(samples, 0.5) * 1000, 2),
+        f"{prefix}p95_ms": round(percentile(samples, 0.95) * 1000, 2),
+        f"{prefix}mean_ms": round(sum(samples) / len(samples) * 1000, 2),
+    }
+
+
+class Bench:
+    """
+    What the scenarios share: the fake server, its library and a user connected to it.
+    """
+
+    def __init__(self, server, repeat=20, concurrency=32):
+        self.server = server
+        self.library = server.library
+        self.repeat = repeat
+        self.concurrency = concurrency
+        self.user, _ = User.objects.get_or_create(username="benchmark")
+        TidalToken.objects.update_or_create(
+            user=self.user,
+            defaults={
+                "access_token": "bench-user-0",
+                "refresh_token": "bench-refresh-0",
+                "expires_at": timezone.now() + timedelta(days=1),
+                "tidal_user_id": USER_ID,
+                "tidal_country": "US",
+            },
+        )
+
+    def reset(self):
+        """
+        Start a scenario from an empty library and cold caches.
+        """
+        for model in (Playlist, Song, Album, Artist, CatalogEntry):
+            model.objects.all().delete()
+        for cache in caches.all():
+            cache.clear()
+        user_tokens.clear()
+        app_tokens.clear()
+        self.server.reset_stats()
+
+    def sync(self):
+        return PlaylistSyncEngine().sync_user(self.user)
+
+
+def library_walk(bench):
+    """
+    Walk the user's playlist collection and every playlist's items.
+    """
+    client = TidalAPIClient()
+    started = time.perf_counter()
+    playlist_ids = [item["id"] for item in client.get_all_user_playlists(bench.user)]
+    items = client.collect_playlists_tracks(bench.user, playlist_ids)
+    seconds = time.perf_counter() - started
+
+    count = sum(len(playlist_items) for playlist_items in items.values())
+    if count != bench.library.item_count:
+        raise AssertionError(f"Walked {count} of {bench.library.item_count} items")
+    return {
+        "seconds": round(seconds, 4),
+        "playlists": len(playlist_ids),
+        "items": count,
+        "items_per_second": round(count / seconds),
+        "requests": bench.server.stats["api_requests"],
+    }
+
+
+def revalidated_walk(bench):
+    """
+    Walk the library cold, then again with every page in the HTTP cache: the second
+    walk should be answered with 304s and cost headers only.
+    """
+    cold = library_walk(bench)
+    cold_bytes = bench.server.stats["api_bytes"]
+    warm = library_walk(bench)
+    stats = bench.server.stats
+    return {
+        "seconds": warm["seconds"],
+        "cold_seconds": cold["seconds"],
+        "items": warm["items"],
+        "requests": stats["api_requests"] - cold["requests"],
+        "not_modified": stats["status_304"],
+        "cold_bytes": cold_bytes,
+        "revalidated_bytes": stats["api_bytes"] - cold_bytes,
+    }
+
+
+def page_render(bench):
+    """
+    Render a playlist page cold from Tidal, again from the cache, and once synced
+    from the database.
+    """
+    playlist_id = next(iter(bench.library.playlists))
+    url = reverse("tidal:playlist_tracks", args=[playlist_id])
+    client = Client()
+    client.force_login(bench.user)
+
+    def render():
+        started = time.perf_counter()
+        response = client.get(url)
+        duration = time.perf_counter() - started
+        if response.status_code != 200:
+            raise AssertionError(f"{url} answered {response.status_code}")
+        return duration
+
+    cold = []
+    for _ in range(bench.repeat):
+        caches["default"].clear()
+        CatalogEntry.objects.all().delete()
+        cold.append(render())
+    cached = [render() for _ in range(bench.repeat)]
+
+    engine = PlaylistSyncEngine()
+    engine.sync_playlists(
+        bench.user, engine.upsert_playlists(bench.user, [{"id": playlist_id, "attributes": {}}])
+    )
+    synced = [render() for _ in range(bench.repeat)]
+
+    return {
+        "seconds": round(sum(cold + cached + synced), 4),
+        "tracks": len(bench.library.playlists[playlist_id]["tracks"]),
+        **latency_summary(cold, "tidal_"),
+        **latency_summary(cached, "cached_"),
+        **latency_summary(synced, "synced_"),
+    }
+
+
+def token_refresh(bench):
+    """
+    Expire the user's token and have many threads ask for it at once, several times.
+    A single-flight refresh should reach the token endpoint once per round.
+    """
+    rounds = max(1, bench.repeat // 4)
+    durations = []
+    for _ in range(rounds):
+        TidalToken.objects.filter(user=bench.user).update(
+            expires_at=timezone.now() - timedelta(minutes=1)
+        )
+        user_tokens.clear()
+        barrier = threading.Barrier(bench.concurrency + 1)
+        failures = []
+
+        def fetch():
+            try:
+                barrier.wait()
+                if not TidalTokenManager().get_valid_user_token(bench.user):
+                    failures.append("no token")
+            finally:
+                close_old_connections()
+
+        threads = [threading.Thread(target=fetch) for _ in range(bench.concurrency)]
+        for thread in threads:
+            thread.start()
+        barrier.wait()
+        started = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        durations.append(time.perf_counter() - started)
+        if failures:
+            raise AssertionError(f"{len(failures)} callers got no token")
+
+    return {
+        "seconds": round(sum(durations), 4),
+        "rounds": rounds,
+        "callers": bench.concurrency,
+        "refreshes": bench.server.stats["token_refresh"],
+        **latency_summary(durations),
+    }
+
+
+def sync_throughput(bench):
+    """
+    Sync the whole library into an empty database, then re-sync with nothing changed.
+    """
+    started = time.perf_counter()
+    synced = bench.sync()
+    full = time.perf_counter() - started
+    requests = bench.server.stats["api_requests"]
+
+    started = time.perf_counter()
+    resynced = bench.sync()
+    incremental = time.perf_counter() - started
+
+    items = bench.library.item_count
+    return {
+        "seconds": round(full, 4),
+        "playlists": synced,
+        "items": items,
+        "songs": Song.objects.count(),
+        "items_per_second": round(items / full),
+        "requests": requests,
+        "incremental_seconds": round(incremental, 4),
+        "incremental_playlists": resynced,
+        "incremental_requests": bench.server.stats["api_requests"] - requests,
+    }
+
+
+def export_library(bench):
+    """
+    Stream the synced library as a ZIP of CSVs and the largest playlist as JSON Lines.
+    """
+    bench.sync()
+
+    started = time.perf_counter()
+    size = sum(len(chunk) for chunk in export.export_library(bench.user, "csv"))
+    library_seconds = time.perf_counter() - started
+
+    playlist = max(Playlist.objects.filter(owner=bench.user), key=lambda row: row.item_count or 0)
+    started = time.perf_counter()
+    lines = sum(chunk.count("\n") for chunk in export.export_playlist(playlist, "jsonl"))
+    playlist_seconds = time.perf_counter() - started
+
+    items = bench.library.item_count
+    return {
+        "seconds": round(library_seconds + playlist_seconds, 4),
+        "library_seconds": round(library_seconds, 4),
+        "library_bytes": size,
+        "items_per_second": round(items / library_seconds),
+        "playlist_seconds": round(playlist_seconds, 4),
+        "playlist_rows": lines,
+    }
+
+
+SCENARIOS = {
+    "library_walk": library_walk,
+    "revalidated_walk": revalidated_walk,
+    "page_render": page_render,
+    "token_refresh": token_refresh,
+    "sync_throughput": sync_throughput,
+    "export": export_library,
+}
@@ -0,0 +1,299 @@
+"""
+In-process metrics in the Prometheus text format, and per-request timings.
+
+Counters and histograms live in the memory of each process, so with several worker
+processes every process reports its own numbers and Prometheus should scrape each.
+"""
+
+import contextvars
+import re
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+# Job queueing delay buckets in seconds, from an idle queue to a long backlog
+WAIT_BUCKETS = (0.1, 0.5, 1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0, 3600.0)
+
+# Request latency buckets in seconds, from a cache hit to a slow upstream page walk
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    """
+    Monotonic counter with labels.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        with self._lock:
+            return self._values.get(labels, 0)
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}{_labels(self.labelnames, labels)} {value}"
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram:
+    """
+    Histogram with labels and fixed buckets.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            counts, total = self._values.get(labels, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect_left(self.buckets, value)] += 1
+            self._values[labels] = (counts, total + value)
+
+    def count(self, *labels):
+        with self._lock:
+            counts, _ = self._values.get(labels, ([0], 0.0))
+            return sum(counts)
+
+    def samples(self):
+        with self._lock:
+            values = sorted((labels, (list(c), t)) for labels, (c, t) in self._values.items())
+        for labels, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                le = bound if bound == "+Inf" else repr(float(bound))
+                labelled = _labels(self.labelnames, labels, [("le", le)])
+                yield f"{self.name}_bucket{labelled} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {total}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}"
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Registry:
+    """
+    The metrics of a process, plus callbacks adding gauges read at scrape time.
+    """
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def collector(self, function):
+        """
+        Register function() -> iterable of (name, documentation, value) gauges.
+        """
+        self.collectors.append(function)
+        return function
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        for collect in self.collectors:
+            for name, documentation, value in collect():
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def clear(self):
+        for metric in self.metrics:
+            metric.clear()
+
+
+registry = Registry()
+
+upstream_requests = registry.register(
+    Counter(
+        "harmoniq_upstream_requests_total",
+        "Requests sent to streaming service APIs.",
+        ("endpoint", "method", "status", "token"),
+    )
+)
+upstream_duration = registry.register(
+    Histogram(
+        "harmoniq_upstream_request_duration_seconds",
+        "Time spent waiting for streaming service API responses.",
+        ("endpoint", "method", "token"),
+    )
+)
+http_duration = registry.register(
+    Histogram(
+        "harmoniq_http_request_duration_seconds",
+        "Time spent handling requests, by view.",
+        ("view", "method", "status"),
+    )
+)
+db_queries = registry.register(
+    Counter("harmoniq_db_queries_total", "Database queries run by views.", ("view",))
+)
+db_duration = registry.register(
+    Counter(
+        "harmoniq_db_query_seconds_total", "Time spent in database queries by views.", ("view",)
+    )
+)
+job_wait = registry.register(
+    Histogram(
+        "harmoniq_job_wait_seconds",
+        "Time background jobs waited in the queue after they were due, by job and priority.",
+        ("job", "priority"),
+        buckets=WAIT_BUCKETS,
+    )
+)
+cache_requests = registry.register(
+    Counter(
+        "harmoniq_cache_requests_total",
+        "Cache lookups by cache, resource and result (hit, stale, revalidated or miss).",
+        ("cache", "resource", "result"),
+    )
+)
+
+
+# Path segments following one of these are ids and are collapsed in endpoint labels
+_RESOURCES = {
+    "playlists",
+    "tracks",
+    "albums",
+    "artists",
+    "users",
+    "userCollections",
+    "searchResults",
+    "videos",
+}
+
+
+def endpoint_label(url):
+    """
+    Collapse a request URL into a low-cardinality endpoint, e.g.
+    "openapi.tidal.com/v2/playlists/{id}/relationships/items".
+    """
+    parts = urlsplit(url)
+    segments = parts.path.strip("/").split("/")
+    for i in range(1, len(segments)):
+        if segments[i - 1] in _RESOURCES and segments[i] != "relationships":
+            segments[i] = "{id}"
+    return f"{parts.hostname}/{'/'.join(segments)}"
+
+
+def token_label(rate_key, url):
+    """
+    Which credentials a request used: a user's token, the app's, or none
+    (the OAuth token endpoint itself).
+    """
+    if rate_key and str(rate_key).startswith("user:"):
+        return "user"
+    if re.search(r"/oauth2/token$", urlsplit(url).path):
+        return "oauth"
+    return "app"
+
+
+# Timings of the request being handled, shared with the threads it fans out to
+_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+class RequestTimings:
+    """
+    Durations accumulated while handling one request, by component.
+    """
+
+    def __init__(self):
+        self.totals = {}
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    def add(self, component, duration, count=1):
+        with self._lock:
+            self.totals[component] = self.totals.get(component, 0.0) + duration
+            self.counts[component] = self.counts.get(component, 0) + count
+
+    def server_timing(self, total):
+        """
+        Returns a Server-Timing header value with one entry per component and the total.
+        """
+        entries = [
+            f'{component};dur={self.totals[component] * 1000:.1f};desc="{self.counts[component]}"'
+            for component in sorted(self.totals)
+        ]
+        entries.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(entries)
+
+
+def current_timings():
+    return _timings.get()
+
+
+@contextmanager
+def collect_timings():
+    """
+    Collect the timings of everything run in this context into a RequestTimings.
+    """
+    timings = RequestTimings()
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+
+def record_upstream(method, url, rate_key, status, duration):
+    """
+    Count and time one request to a streaming service API.
+    """
+    endpoint, token = endpoint_label(url), token_label(rate_key, url)
+    upstream_requests.inc(endpoint, method, str(status), token)
+    upstream_duration.observe(duration, endpoint, method, token)
+    timings = current_timings()
+    if timings is not None:
+        timings.add("upstream", duration)
+
+
+def record_cache(cache, resource, result, count=1):
+    """
+    Count cache lookups; result is "hit", "stale", "revalidated" or "miss".
+    """
+    if count:
+        cache_requests.inc(cache, resource, result, amount=count)
@@ -0,0 +1,52 @@
+"""
+Middleware for the harmoniq project.
+"""
+
+import os
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+
+from . import metrics
+
+
+class MetricsMiddleware:
+    """
+    Times every request, counts and times its database queries, and adds a
+    Server-Timing header with the time spent in the database, in upstream APIs and
+    in total. Queries and upstream calls made by threads the request fans out to are
+    included when they run in a copy of its context (see ContextThreadPoolExecutor).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.server_timing = os.getenv("SERVER_TIMING", "True").lower() in ("true", "1", "yes")
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        with metrics.collect_timings() as timings, ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self.time_query))
+            response = self.get_response(request)
+        total = time.perf_counter() - started
+
+        match = getattr(request, "resolver_match", None)
+        view = match.view_name if match else "unresolved"
+        metrics.db_queries.inc(view, amount=timings.counts.get("db", 0))
+        metrics.db_duration.inc(view, amount=timings.totals.get("db", 0.0))
+        metrics.http_duration.observe(total, view, request.method, str(response.status_code))
+
+        if self.server_timing:
+            response["Server-Timing"] = timings.server_timing(total)
+        return response
+
+    @staticmethod
+    def time_query(execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            timings = metrics.current_timings()
+            if timings is not None:
+                timings.add("db", time.perf_counter() - started)
@@ -34,7 +34,7 @@ THIRD_PARTY_APPS = [
     "django_browser_reload",
 ]
 
-LOCAL_APPS = ["tidal"]
+LOCAL_APPS = ["tidal", "providers", "jobs"]
 
 # Application definition
 INSTALLED_APPS = [
@@ -44,6 +44,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "harmoniq.middleware.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -73,13 +74,87 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "harmoniq.wsgi.application"
+ASGI_APPLICATION = "harmoniq.asgi.application"
 
 # Database
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+# SQLite by default, tuned so a sync worker can write while web requests keep reading:
+# WAL lets readers run alongside the single writer, IMMEDIATE transactions take the write
+# lock up front so busy writers wait out the timeout instead of failing with
+# "database is locked", and persistent connections skip the per-request open.
+# Set DB_ENGINE=postgres to move to PostgreSQL.
+DB_ENGINE = os.getenv("DB_ENGINE", "sqlite")
+DB_CONN_MAX_AGE = int(os.getenv("DB_CONN_MAX_AGE", "600"))
+
+if DB_ENGINE == "postgres":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.getenv("DB_NAME", "harmoniq"),
+            "USER": os.getenv("DB_USER", "harmoniq"),
+            "PASSWORD": os.getenv("DB_PASSWORD", ""),
+            "HOST": os.getenv("DB_HOST", "localhost"),
+            "PORT": os.getenv("DB_PORT", "5432"),
+            "CONN_MAX_AGE": DB_CONN_MAX_AGE,
+            "CONN_HEALTH_CHECKS": True,
+        }
+    }
+else:
+    SQLITE_PRAGMAS = {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "20000")),
+        "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+        # Negative values are KiB rather than pages
+        "cache_size": -int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536")),
+        "temp_store": "MEMORY",
+        "foreign_keys": "ON",
+    }
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.getenv("DB_NAME", BASE_DIR / "db.sqlite3"),
+            "CONN_MAX_AGE": DB_CONN_MAX_AGE,
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": {
+                "init_command": ";".join(
+                    f"PRAGMA {name}={value}" for name, value in SQLITE_PRAGMAS.items()
+                ),
+                "transaction_mode": "IMMEDIATE",
+            },
+        }
     }
+
+# Cache
+# Local backends only: locmem (default), file based or database
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.getenv("CACHE_LOCATION", "harmoniq"),
+        "OPTIONS": {"MAX_ENTRIES": int(os.getenv("CACHE_MAX_ENTRIES", "10000"))},
+    },
+    # Tidal API responses kept for conditional requests, apart so their bodies do not
+    # push everything else out of the default cache
+    "tidal_http": {
+        "BACKEND": os.getenv(
+            "TIDAL_HTTP_CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.getenv("TIDAL_HTTP_CACHE_LOCATION", "harmoniq-http"),
+        "OPTIONS": {"MAX_ENTRIES": int(os.getenv("TIDAL_HTTP_CACHE_MAX_ENTRIES", "5000"))},
+    },
+}
+TIDAL_HTTP_CACHE_ALIAS = "tidal_http"
+
+# Seconds a cached Tidal resource stays fresh, and how much longer it may be served
+# stale while it is refreshed in the background
+TIDAL_CACHE_TTLS = {
+    "playlists": (60, 600),
+    "playlist": (300, 3600),
+    "playlist_tracks": (120, 1800),
+}
+
+# Streaming services playlists can be read from and written to, by name
+STREAMING_PROVIDERS = {
+    "tidal": "providers.tidal.TidalProvider",
 }
 
 # Password validation
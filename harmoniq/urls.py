@@ -7,16 +7,18 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
-from .views import IndexView, V1View, V2View, health_check
+from .views import IndexView, V1View, V2View, health_check, metrics
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("__reload__/", include("django_browser_reload.urls")),
     path("health/", health_check, name="health_check"),
+    path("metrics", metrics, name="metrics"),
     path("", IndexView.as_view(), name="index"),
     path("v1/", V1View.as_view(), name="v1"),
     path("v2/", V2View.as_view(), name="v2"),
     path("tidal/", include("tidal.urls"), name="tidal"),
+    path("jobs/", include("jobs.urls"), name="jobs"),
 ]
 
 if settings.DEBUG:
@@ -2,10 +2,15 @@
 Views for the harmoniq project.
 """
 
-from django.http import JsonResponse
+import hmac
+import os
+
+from django.http import HttpResponse, JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.views.generic import TemplateView
 
+from .metrics import registry
+
 
 @require_http_methods(["GET"])
 def health_check(request):
@@ -21,6 +26,21 @@ def health_check(request):
     )
 
 
+@require_http_methods(["GET"])
+def metrics(request):
+    """
+    Prometheus text exposition of this process's metrics. When METRICS_TOKEN is set,
+    scrapers must send it as a bearer token.
+    """
+    token = os.getenv("METRICS_TOKEN")
+    if token:
+        supplied = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        if not hmac.compare_digest(supplied, token):
+            return HttpResponse("Unauthorized", status=401)
+
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 class IndexView(TemplateView):
     """
     Render the index template.
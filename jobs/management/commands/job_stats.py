@@ -0,0 +1,32 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from jobs.stats import tenant_stats
+
+
+def _seconds(value):
+    return "-" if value is None else f"{value:.1f}s"
+
+
+class Command(BaseCommand):
+    help = "Show per-tenant job queue throughput and waiting times."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--minutes", type=float, default=60, help="Report on jobs of the last N minutes"
+        )
+
+    def handle(self, *args, **options):
+        rows = tenant_stats(timezone.now() - timedelta(minutes=options["minutes"]))
+        self.stdout.write(
+            f"{'tenant':<24} {'queued':>7} {'running':>7} {'done':>6} "
+            f"{'cost/min':>9} {'wait p50':>9} {'wait p95':>9}"
+        )
+        for row in rows:
+            self.stdout.write(
+                f"{row['tenant'] or '-':<24} {row['queued']:>7} {row['running']:>7} "
+                f"{row['completed']:>6} {row['throughput']:>9.2f} "
+                f"{_seconds(row['wait_p50']):>9} {_seconds(row['wait_p95']):>9}"
+            )
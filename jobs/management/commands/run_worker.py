@@ -0,0 +1,49 @@
+import multiprocessing
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from jobs.registry import handler_names
+from jobs.worker import Worker
+
+
+def _work(threads, burst):
+    import django
+
+    django.setup()
+    Worker(threads=threads).run(burst=burst)
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs (syncs, imports, playlist edit flushes)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=None, help="Threads per process")
+        parser.add_argument("--processes", type=int, default=1)
+        parser.add_argument(
+            "--burst", action="store_true", help="Exit once no job is due instead of polling"
+        )
+
+    def handle(self, *args, **options):
+        threads, burst = options["threads"], options["burst"]
+        self.stdout.write(f"Handling jobs: {', '.join(handler_names())}")
+
+        if options["processes"] <= 1:
+            processed = Worker(threads=threads).run(burst=burst)
+            self.stdout.write(f"Processed {processed} jobs")
+            return
+
+        # Children open their own database connections
+        connections.close_all()
+        processes = [
+            multiprocessing.Process(target=_work, args=(threads, burst), name=f"job-worker-{i}")
+            for i in range(options["processes"])
+        ]
+        for process in processes:
+            process.start()
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.join()
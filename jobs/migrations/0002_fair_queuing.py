@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("jobs", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Tenant",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("key", models.CharField(max_length=128, unique=True)),
+                ("weight", models.FloatField(default=1.0)),
+                ("virtual_finish", models.FloatField(default=0.0)),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name="job",
+            name="job_claim_order",
+        ),
+        migrations.AddField(
+            model_name="job",
+            name="cost",
+            field=models.FloatField(default=1.0),
+        ),
+        migrations.AddField(
+            model_name="job",
+            name="tenant",
+            field=models.CharField(blank=True, default="", max_length=128),
+        ),
+        migrations.AddField(
+            model_name="job",
+            name="virtual_time",
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AlterField(
+            model_name="job",
+            name="priority",
+            field=models.SmallIntegerField(
+                choices=[(0, "Low"), (50, "Normal"), (100, "High")], default=50
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="job",
+            index=models.Index(
+                fields=["status", "-priority", "virtual_time", "run_at"], name="job_claim_order"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="job",
+            index=models.Index(fields=["tenant", "finished_at"], name="job_tenant_finished"),
+        ),
+    ]
@@ -0,0 +1,88 @@
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+
+class Tenant(models.Model):
+    """
+    Fair-queuing state of one party sharing the workers, usually a user.
+
+    virtual_finish is where the tenant's last queued job ends in virtual time; a
+    tenant with twice the weight advances half as fast per unit of work, so gets
+    twice the share of the workers while it has work waiting.
+    """
+
+    key = models.CharField(max_length=128, unique=True)
+    weight = models.FloatField(default=1.0)
+    virtual_finish = models.FloatField(default=0.0)
+
+    def __str__(self):
+        return f"{self.key} (weight {self.weight})"
+
+
+class Job(models.Model):
+    """
+    A unit of background work stored in the database and run by `manage.py run_worker`.
+
+    Workers claim due jobs in priority order and, within a priority, fairly across
+    tenants by the virtual time at which each job starts (start-time fair queuing).
+    Each claimed job is held under a lease that heartbeats extend; a job whose lease
+    runs out because its worker died is queued again. Only one job per dedupe_key
+    can be waiting in the queue at a time.
+
+    revision goes up with every change of status and updated_at records when, so
+    progress streams in other processes can pick up changes by polling.
+    """
+
+    class Status(models.TextChoices):
+        QUEUED = "queued", "Queued"
+        RUNNING = "running", "Running"
+        SUCCEEDED = "succeeded", "Succeeded"
+        FAILED = "failed", "Failed"
+
+    class Priority(models.IntegerChoices):
+        LOW = 0, "Low"
+        NORMAL = 50, "Normal"
+        HIGH = 100, "High"
+
+    name = models.CharField(max_length=128)
+    args = models.JSONField(default=dict, blank=True)
+    priority = models.SmallIntegerField(choices=Priority.choices, default=Priority.NORMAL)
+    dedupe_key = models.CharField(max_length=255, blank=True, default="")
+    tenant = models.CharField(max_length=128, blank=True, default="")
+    cost = models.FloatField(default=1.0)
+    virtual_time = models.FloatField(default=0.0)
+    status = models.CharField(choices=Status.choices, max_length=16, default=Status.QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    worker = models.CharField(max_length=128, blank=True, default="")
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default="")
+    progress = models.JSONField(default=dict, blank=True)
+    revision = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["status", "-priority", "virtual_time", "run_at"], name="job_claim_order"
+            ),
+            models.Index(fields=["tenant", "finished_at"], name="job_tenant_finished"),
+            models.Index(fields=["tenant", "updated_at"], name="job_tenant_updated"),
+            models.Index(fields=["status", "lease_expires_at"], name="job_lease"),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["dedupe_key"],
+                condition=Q(status="queued") & ~Q(dedupe_key=""),
+                name="job_queued_dedupe_key",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
@@ -0,0 +1,252 @@
+"""
+Live progress of running jobs.
+
+Handlers call report() as they go; the worker running the job publishes each update
+to subscribers in the same process straight away and saves it on the job row every
+JOB_PROGRESS_SAVE_SECONDS, where streams in other processes pick it up by polling.
+"""
+
+import contextvars
+import logging
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db import DatabaseError
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar("job_progress", default=None)
+
+# Streams send a comment this often when idle, so proxies keep the connection open
+KEEPALIVE_SECONDS = 15
+POLL_OVERLAP_SECONDS = 1
+
+
+def save_interval():
+    return float(os.getenv("JOB_PROGRESS_SAVE_SECONDS", "1"))
+
+
+def job_event(job, progress=None, revision=None, status=None, error=None):
+    """
+    The progress event of a job, from its row or from the overrides given.
+    """
+    progress = job.progress if progress is None else progress
+    status = status or job.status
+    if error is None:
+        error = job.last_error if status in (Job.Status.QUEUED, Job.Status.FAILED) else ""
+    return {
+        "id": job.pk,
+        "name": job.name,
+        "status": status,
+        "attempts": job.attempts,
+        "revision": job.revision if revision is None else revision,
+        "seq": progress.get("seq", 0),
+        "stage": progress.get("stage", ""),
+        "pages": progress.get("pages", 0),
+        "items": progress.get("items", 0),
+        "fraction": progress.get("fraction"),
+        "eta": progress.get("eta"),
+        "error": error or None,
+    }
+
+
+class Subscription:
+    """
+    Events published for one tenant, in order, until closed.
+    """
+
+    def __init__(self, broker, tenant):
+        self.broker = broker
+        self.tenant = tenant
+        self.events = queue.SimpleQueue()
+
+    def get(self, timeout=None):
+        """
+        Wait up to timeout seconds for the next event; None if there was none.
+        """
+        try:
+            return self.events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Broker:
+    """
+    In-process publish/subscribe of job events by tenant.
+    """
+
+    def __init__(self):
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, tenant):
+        subscription = Subscription(self, tenant)
+        with self._lock:
+            self._subscriptions[tenant].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.tenant, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self._subscriptions.pop(subscription.tenant, None)
+
+    def publish(self, tenant, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(tenant, ()))
+        for subscription in subscriptions:
+            subscription.events.put(event)
+
+
+broker = Broker()
+
+
+class Tracker:
+    """
+    Progress of one attempt of a running job.
+    """
+
+    def __init__(self, job):
+        self.job = job
+        self.progress = {"seq": 0, "pages": 0, "items": 0}
+        self.started = time.monotonic()
+        self._saved = 0.0
+        self._lock = threading.Lock()
+
+    def report(self, pages=0, items=0, fraction=None, stage=None):
+        with self._lock:
+            progress = self.progress
+            progress["seq"] += 1
+            progress["pages"] += pages
+            progress["items"] += items
+            if stage is not None:
+                progress["stage"] = stage
+            if fraction is not None:
+                progress["fraction"] = fraction = min(max(fraction, 0.0), 1.0)
+                elapsed = time.monotonic() - self.started
+                if fraction > 0:
+                    progress["eta"] = round(elapsed / fraction * (1 - fraction), 1)
+            event = job_event(self.job, dict(progress), status=Job.Status.RUNNING)
+            due = time.monotonic() - self._saved >= save_interval()
+        broker.publish(self.job.tenant, event)
+        if due:
+            self.save()
+
+    def save(self):
+        """
+        Store the progress on the job row. Progress is informational, so a busy
+        database only costs other processes an update.
+        """
+        with self._lock:
+            self._saved = time.monotonic()
+            progress = dict(self.progress)
+        try:
+            Job.objects.filter(pk=self.job.pk).update(progress=progress, updated_at=timezone.now())
+        except DatabaseError as e:
+            logger.warning(f"Could not save the progress of job {self.job}: {e}")
+
+    def publish(self, status, error=""):
+        """
+        Publish the outcome of the attempt, recorded as the job's next revision.
+        """
+        with self._lock:
+            progress = dict(self.progress)
+        event = job_event(
+            self.job, progress, revision=self.job.revision + 1, status=status, error=error
+        )
+        broker.publish(self.job.tenant, event)
+
+
+@contextmanager
+def track(tracker):
+    """
+    Collect in tracker the progress reported while its job runs in this context.
+    """
+    broker.publish(tracker.job.tenant, job_event(tracker.job, tracker.progress))
+    token = _current.set(tracker)
+    try:
+        yield tracker
+    finally:
+        _current.reset(token)
+        tracker.save()
+
+
+def report(pages=0, items=0, fraction=None, stage=None):
+    """
+    Add to the progress of the job running in this context: pages fetched, items
+    written, the fraction done (for the ETA) and what it is doing. Does nothing
+    outside a job, e.g. when a sync runs from the shell.
+    """
+    tracker = _current.get()
+    if tracker is not None:
+        tracker.report(pages=pages, items=items, fraction=fraction, stage=stage)
+
+
+def recent_jobs(tenant, since):
+    """
+    The tenant's jobs that changed after since.
+    """
+    return Job.objects.filter(tenant=tenant, updated_at__gt=since).order_by("updated_at")
+
+
+def stream(tenant, poll_interval=None, duration=None, recent=timedelta(minutes=1)):
+    """
+    Yield the events of the tenant's jobs: first those of the jobs that changed in
+    the last `recent`, then each update as it is published in this process or, when
+    the job runs in another process, as polling the job table finds it. Yields None
+    when there was nothing to send for KEEPALIVE_SECONDS, and stops after duration
+    seconds (JOB_EVENTS_MAX_SECONDS) so clients reconnect to a fresh stream.
+    """
+    poll_interval = poll_interval or float(os.getenv("JOB_EVENTS_POLL_SECONDS", "2"))
+    duration = duration or float(os.getenv("JOB_EVENTS_MAX_SECONDS", "300"))
+    deadline = time.monotonic() + duration
+    seen = {}
+
+    def fresh(event):
+        # Polling finds updates already published here, and saved progress lags behind
+        key = (event["revision"], event["seq"])
+        if seen.get(event["id"], (-1, -1)) >= key:
+            return False
+        seen[event["id"]] = key
+        return True
+
+    with broker.subscribe(tenant) as subscription:
+        since = timezone.now() - recent
+        next_poll = sent = time.monotonic()
+        while time.monotonic() < deadline:
+            if time.monotonic() >= next_poll:
+                polled_at = timezone.now()
+                for job in recent_jobs(tenant, since):
+                    event = job_event(job)
+                    if fresh(event):
+                        sent = time.monotonic()
+                        yield event
+                # Rows written just before the poll may commit after it
+                since = polled_at - timedelta(seconds=POLL_OVERLAP_SECONDS)
+                next_poll = time.monotonic() + poll_interval
+
+            event = subscription.get(timeout=max(0.0, min(next_poll, deadline) - time.monotonic()))
+            if event is not None and fresh(event):
+                sent = time.monotonic()
+                yield event
+            elif time.monotonic() - sent >= KEEPALIVE_SECONDS:
+                sent = time.monotonic()
+                yield None
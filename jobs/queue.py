@@ -0,0 +1,242 @@
+import logging
+import os
+import random
+from datetime import timedelta
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Max, Min
+from django.db.models.functions import Greatest, Least
+from django.utils import timezone
+
+from .models import Job, Tenant
+from .registry import get_handler
+
+logger = logging.getLogger(__name__)
+
+# Jobs looked at per claim; a claim only fails over to the next one when another
+# worker took the first in the meantime
+CLAIM_BATCH = 5
+
+
+def lease_duration():
+    """
+    How long a claimed job stays with its worker without a heartbeat.
+    """
+    return timedelta(seconds=float(os.getenv("JOB_LEASE_SECONDS", "60")))
+
+
+def default_max_attempts():
+    return int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+
+
+def backoff(attempt):
+    """
+    Jittered exponential delay before retrying a job that failed attempt times.
+    """
+    base = float(os.getenv("JOB_BACKOFF_BASE_SECONDS", "5"))
+    cap = float(os.getenv("JOB_BACKOFF_MAX_SECONDS", "600"))
+    delay = min(cap, base * 2 ** max(0, attempt - 1))
+    return timedelta(seconds=random.uniform(delay / 2, delay))
+
+
+def user_tenant(user_id):
+    """
+    The tenant of a user's jobs, so one user's large library cannot hold up everyone
+    else's work.
+    """
+    return f"user:{user_id}"
+
+
+def virtual_now():
+    """
+    The scheduler's virtual time: the start tag of the next due job or, when nothing
+    is waiting, the furthest any tenant has got.
+    """
+    head = Job.objects.filter(status=Job.Status.QUEUED, run_at__lte=timezone.now()).aggregate(
+        tag=Min("virtual_time")
+    )["tag"]
+    if head is not None:
+        return head
+    return Tenant.objects.aggregate(tag=Max("virtual_finish"))["tag"] or 0.0
+
+
+def virtual_start(tenant, cost):
+    """
+    Charge tenant for a job of the given cost and return the job's start tag.
+    A tenant that was idle starts at the current virtual time, so it neither keeps
+    credit from the past nor waits behind other tenants' backlogs.
+    """
+    with transaction.atomic():
+        state, _ = Tenant.objects.select_for_update().get_or_create(key=tenant)
+        start = max(state.virtual_finish, virtual_now())
+        state.virtual_finish = start + cost / state.weight
+        state.save(update_fields=["virtual_finish"])
+    return start
+
+
+def enqueue(
+    name,
+    args=None,
+    priority=Job.Priority.NORMAL,
+    dedupe_key="",
+    run_at=None,
+    max_attempts=None,
+    tenant="",
+    cost=1.0,
+):
+    """
+    Queue a job for the handler registered as name. Jobs of a tenant (e.g.
+    "user:12") share the workers fairly with other tenants' jobs of the same
+    priority, in proportion to their cost and the tenant's weight; HIGH is for work
+    a user is waiting on and goes ahead of everything else.
+
+    When a job with the same dedupe_key is already waiting, no second one is queued:
+    the waiting job is moved up to the higher of the two priorities and the earlier
+    run_at instead. Returns (job, created).
+    """
+    get_handler(name)
+    if os.getenv("JOB_EMBEDDED_WORKER", "False").lower() in ("true", "1", "yes"):
+        from .worker import ensure_embedded_worker
+
+        ensure_embedded_worker()
+
+    run_at = run_at or timezone.now()
+    fields = {
+        "name": name,
+        "args": args or {},
+        "priority": priority,
+        "dedupe_key": dedupe_key,
+        "run_at": run_at,
+        "max_attempts": max_attempts or default_max_attempts(),
+        "tenant": tenant,
+        "cost": cost,
+    }
+    if not dedupe_key:
+        return _create(fields), True
+
+    # The waiting job may be claimed between a failed insert and the lookup; go round again
+    for _ in range(3):
+        waiting = Job.objects.filter(dedupe_key=dedupe_key, status=Job.Status.QUEUED)
+        if waiting.update(
+            priority=Greatest(F("priority"), priority),
+            run_at=Least(F("run_at"), run_at),
+            revision=F("revision") + 1,
+            updated_at=timezone.now(),
+        ):
+            return waiting.get(), False
+        try:
+            with transaction.atomic():
+                return _create(fields), True
+        except IntegrityError:
+            continue
+    raise ValueError(f"Could not queue job with dedupe key: {dedupe_key}")
+
+
+def _create(fields):
+    if fields["tenant"]:
+        virtual_time = virtual_start(fields["tenant"], fields["cost"])
+    else:
+        virtual_time = virtual_now()
+    return Job.objects.create(**fields, virtual_time=virtual_time)
+
+
+def claim(worker, lease=None):
+    """
+    Take the most urgent due job for worker, or return None when nothing is due.
+    """
+    now = timezone.now()
+    lease = lease or lease_duration()
+    with transaction.atomic():
+        due = Job.objects.filter(status=Job.Status.QUEUED, run_at__lte=now).order_by(
+            "-priority", "virtual_time", "run_at", "pk"
+        )
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+
+        for job in due[:CLAIM_BATCH]:
+            claimed = Job.objects.filter(pk=job.pk, status=Job.Status.QUEUED).update(
+                status=Job.Status.RUNNING,
+                worker=worker,
+                attempts=F("attempts") + 1,
+                revision=F("revision") + 1,
+                updated_at=now,
+                started_at=now,
+                heartbeat_at=now,
+                lease_expires_at=now + lease,
+            )
+            if claimed:
+                return Job.objects.get(pk=job.pk)
+    return None
+
+
+def heartbeat(job, lease=None):
+    """
+    Extend the lease of a running job. Returns False when the job is no longer held
+    by its worker, e.g. because the lease ran out and it was reclaimed.
+    """
+    now = timezone.now()
+    return bool(
+        Job.objects.filter(pk=job.pk, worker=job.worker, status=Job.Status.RUNNING).update(
+            heartbeat_at=now, lease_expires_at=now + (lease or lease_duration())
+        )
+    )
+
+
+def complete(job):
+    now = timezone.now()
+    Job.objects.filter(pk=job.pk, worker=job.worker, status=Job.Status.RUNNING).update(
+        status=Job.Status.SUCCEEDED,
+        finished_at=now,
+        lease_expires_at=None,
+        revision=F("revision") + 1,
+        updated_at=now,
+    )
+
+
+def fail(job, error):
+    """
+    Record a failed attempt: queue the job again after a backoff, or mark it failed
+    once it used up its attempts. Returns True if it will be retried.
+    """
+    now = timezone.now()
+    running = Job.objects.filter(pk=job.pk, worker=job.worker, status=Job.Status.RUNNING)
+    if job.attempts < job.max_attempts:
+        try:
+            with transaction.atomic():
+                running.update(
+                    status=Job.Status.QUEUED,
+                    run_at=now + backoff(job.attempts),
+                    worker="",
+                    lease_expires_at=None,
+                    last_error=error,
+                    revision=F("revision") + 1,
+                    updated_at=now,
+                )
+            return True
+        except IntegrityError:
+            # The same work was queued again while this attempt ran; that job retries it
+            error = f"{error}\nNot retried: superseded by a queued job"
+
+    running.update(
+        status=Job.Status.FAILED,
+        finished_at=now,
+        lease_expires_at=None,
+        last_error=error,
+        revision=F("revision") + 1,
+        updated_at=now,
+    )
+    return False
+
+
+def reclaim_expired():
+    """
+    Treat running jobs whose lease ran out as failed attempts of a lost worker.
+    Returns the number of jobs reclaimed.
+    """
+    expired = list(
+        Job.objects.filter(status=Job.Status.RUNNING, lease_expires_at__lt=timezone.now())
+    )
+    for job in expired:
+        logger.warning(f"Reclaiming job {job} from lost worker {job.worker}")
+        fail(job, f"Lease expired on worker {job.worker}")
+    return len(expired)
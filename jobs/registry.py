@@ -0,0 +1,25 @@
+_handlers = {}
+
+
+def register(name):
+    """
+    Decorator registering a function as the handler of jobs called name.
+    The handler is called with the job's args as keyword arguments.
+    """
+
+    def decorator(function):
+        _handlers[name] = function
+        return function
+
+    return decorator
+
+
+def get_handler(name):
+    try:
+        return _handlers[name]
+    except KeyError:
+        raise ValueError(f"No job handler registered for: {name}")
+
+
+def handler_names():
+    return sorted(_handlers)
@@ -0,0 +1,72 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .models import Job
+
+
+def percentile(values, fraction):
+    """
+    The nearest-rank percentile of values, or None when there are none.
+    """
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, round(fraction * len(values)) - 1))]
+
+
+def tenant_stats(since=None):
+    """
+    How each tenant fared in the queue since `since` (default: the last hour).
+
+    Returns a list of dicts, busiest tenant first, with the jobs each tenant has
+    waiting and running, the jobs and cost it completed, its throughput in cost per
+    minute, and the p50 and p95 seconds its jobs waited after they were due.
+    """
+    now = timezone.now()
+    since = since or now - timedelta(hours=1)
+    stats = defaultdict(
+        lambda: {"queued": 0, "running": 0, "completed": 0, "cost": 0.0, "waits": []}
+    )
+
+    current = (
+        Job.objects.filter(status__in=[Job.Status.QUEUED, Job.Status.RUNNING])
+        .values("tenant")
+        .annotate(
+            queued=Count("pk", filter=Q(status=Job.Status.QUEUED)),
+            running=Count("pk", filter=Q(status=Job.Status.RUNNING)),
+        )
+    )
+    for row in current:
+        stats[row["tenant"]].update(queued=row["queued"], running=row["running"])
+
+    completed = (
+        Job.objects.filter(status=Job.Status.SUCCEEDED, finished_at__gte=since)
+        .values("tenant")
+        .annotate(completed=Count("pk"), cost=Sum("cost"))
+    )
+    for row in completed:
+        stats[row["tenant"]].update(completed=row["completed"], cost=row["cost"] or 0.0)
+
+    started = Job.objects.filter(started_at__gte=since).values_list(
+        "tenant", "run_at", "started_at"
+    )
+    for tenant, run_at, started_at in started:
+        stats[tenant]["waits"].append(max(0.0, (started_at - run_at).total_seconds()))
+
+    minutes = max((now - since).total_seconds() / 60, 1 / 60)
+    rows = []
+    for tenant, row in stats.items():
+        waits = row.pop("waits")
+        rows.append(
+            {
+                "tenant": tenant,
+                **row,
+                "throughput": row["cost"] / minutes,
+                "wait_p50": percentile(waits, 0.5),
+                "wait_p95": percentile(waits, 0.95),
+            }
+        )
+    return sorted(rows, key=lambda row: (-row["cost"], -row["queued"], row["tenant"]))
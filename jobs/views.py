@@ -0,0 +1,61 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.db import close_old_connections
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+
+from . import progress
+from .queue import user_tenant
+
+# How long a browser waits before reconnecting a dropped stream, in milliseconds
+RECONNECT_MS = 3000
+
+
+def server_sent_events(events):
+    """
+    Encode job events as a text/event-stream; None becomes a keep-alive comment.
+    """
+    yield f"retry: {RECONNECT_MS}\n\n"
+    for event in events:
+        if event is None:
+            yield ": keep-alive\n\n"
+        else:
+            event_id = f"{event['id']}:{event['revision']}:{event['seq']}"
+            yield f"id: {event_id}\nevent: job\ndata: {json.dumps(event)}\n\n"
+
+
+async def _async_stream(chunks):
+    """
+    Serve a blocking stream under ASGI from a thread of its own, so waiting for
+    events does not hold up the thread that runs synchronous views.
+    """
+
+    def pull():
+        try:
+            return next(chunks, None)
+        finally:
+            close_old_connections()
+
+    while (chunk := await sync_to_async(pull, thread_sensitive=False)()) is not None:
+        yield chunk
+
+
+@require_GET
+def job_events(request):
+    """
+    Server-Sent Events stream of the progress of the user's background jobs: syncs,
+    imports and playlist edit writes, with pages fetched, items written, the ETA and
+    errors.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({"error": "authentication required"}, status=401)
+
+    chunks = server_sent_events(progress.stream(user_tenant(request.user.pk)))
+    if isinstance(request, ASGIRequest):
+        chunks = _async_stream(chunks)
+    response = StreamingHttpResponse(chunks, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -0,0 +1,165 @@
+import logging
+import os
+import socket
+import threading
+import time
+
+from django.db import DatabaseError, close_old_connections
+
+from harmoniq.metrics import job_wait
+
+from . import progress, queue
+from .models import Job
+from .registry import get_handler
+
+logger = logging.getLogger(__name__)
+
+_embedded = None
+_embedded_lock = threading.Lock()
+
+
+class Worker:
+    """
+    Runs queued jobs on a pool of threads.
+
+    Each thread claims one job at a time, runs its handler while a heartbeat keeps
+    the lease alive, and records the outcome. Every so often a thread reclaims the
+    jobs of workers whose leases ran out.
+    """
+
+    def __init__(self, threads=None, lease=None, poll_interval=None, name=None):
+        self.threads = threads or int(os.getenv("JOB_WORKER_THREADS", "4"))
+        self.lease = lease or queue.lease_duration()
+        self.poll_interval = poll_interval or float(os.getenv("JOB_POLL_SECONDS", "1"))
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self.processed = 0
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._last_reclaim = 0.0
+
+    def run(self, burst=False):
+        """
+        Work until stop() is called or, with burst, until no job is due.
+        """
+        pool = [
+            threading.Thread(target=self._loop, args=(burst,), name=f"job-worker-{i}", daemon=True)
+            for i in range(self.threads)
+        ]
+        for thread in pool:
+            thread.start()
+        try:
+            for thread in pool:
+                while thread.is_alive():
+                    thread.join(timeout=0.5)
+        except KeyboardInterrupt:
+            logger.info("Stopping job worker after the running jobs")
+            self.stop()
+            for thread in pool:
+                thread.join()
+        return self.processed
+
+    def stop(self):
+        self._stopping.set()
+
+    def _loop(self, burst):
+        worker = f"{self.name}:{threading.current_thread().name}"
+        try:
+            while not self._stopping.is_set():
+                close_old_connections()
+                try:
+                    self._reclaim()
+                    job = queue.claim(worker, self.lease)
+                except DatabaseError as e:
+                    # e.g. the database is locked by another writer; try again shortly
+                    logger.warning(f"Could not claim a job: {e}")
+                    self._stopping.wait(self.poll_interval)
+                    continue
+                if job is None:
+                    if burst:
+                        return
+                    self._stopping.wait(self.poll_interval)
+                    continue
+                self.run_job(job)
+        finally:
+            close_old_connections()
+
+    def _reclaim(self):
+        with self._lock:
+            if time.monotonic() - self._last_reclaim < self.lease.total_seconds() / 2:
+                return
+            self._last_reclaim = time.monotonic()
+        queue.reclaim_expired()
+
+    def run_job(self, job):
+        """
+        Run a claimed job and record whether it succeeded.
+        """
+        done = threading.Event()
+        beat = threading.Thread(
+            target=self._heartbeat, args=(job, done), name=f"job-heartbeat-{job.pk}", daemon=True
+        )
+        beat.start()
+        job_wait.observe(
+            max(0.0, (job.started_at - job.run_at).total_seconds()),
+            job.name,
+            job.get_priority_display(),
+        )
+        started = time.monotonic()
+        tracker = progress.Tracker(job)
+        try:
+            with progress.track(tracker):
+                get_handler(job.name)(**job.args)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            retried = self._record(queue.fail, job, error)
+            tracker.publish(Job.Status.QUEUED if retried else Job.Status.FAILED, error)
+            logger.exception(
+                f"Job {job} failed on attempt {job.attempts}"
+                + (", will retry" if retried else ", giving up")
+            )
+        else:
+            self._record(queue.complete, job)
+            tracker.publish(Job.Status.SUCCEEDED)
+            logger.info(f"Job {job} succeeded in {time.monotonic() - started:.2f}s")
+        finally:
+            done.set()
+            beat.join()
+            with self._lock:
+                self.processed += 1
+
+    def _record(self, outcome, *args, attempts=5):
+        """
+        Store a job's outcome, retrying briefly if the database is busy. If it still
+        cannot be stored, the lease runs out and the job is run again.
+        """
+        for attempt in range(attempts):
+            try:
+                return outcome(*args)
+            except DatabaseError as e:
+                if attempt == attempts - 1:
+                    logger.error(f"Could not record the outcome of job {args[0]}: {e}")
+                    return None
+                time.sleep(self.poll_interval * (attempt + 1))
+
+    def _heartbeat(self, job, done):
+        try:
+            while not done.wait(self.lease.total_seconds() / 3):
+                if not queue.heartbeat(job, self.lease):
+                    logger.warning(f"Lost the lease of job {job}")
+                    return
+        finally:
+            close_old_connections()
+
+
+def ensure_embedded_worker():
+    """
+    Start a worker on daemon threads of this process unless one is running. Used when
+    JOB_EMBEDDED_WORKER is set, so a single development server runs its own jobs.
+    """
+    global _embedded
+
+    with _embedded_lock:
+        if _embedded is None:
+            _embedded = Worker()
+            threading.Thread(target=_embedded.run, name="job-worker", daemon=True).start()
+    return _embedded
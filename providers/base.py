@@ -0,0 +1,80 @@
+class StreamingProvider:
+    """
+    Interface every streaming service implements so playlists can be read from and
+    written to it without knowing which service it is.
+
+    Tracks are exchanged as plain dicts in the shape of tidal.api.parse_tracks:
+    {"id", "title", "isrc", "duration", "explicit", "artists": [{"id", "name"}], "album"},
+    where duration is an ISO 8601 duration string or None.
+    """
+
+    name = None
+    display_name = None
+
+    # Auth
+
+    def get_authorization_url(self, state=None):
+        """
+        Start the OAuth flow. Returns (authorization_url, code_verifier, state).
+        """
+        raise NotImplementedError
+
+    def complete_authorization(self, user, code, code_verifier):
+        """
+        Exchange the callback's code for tokens and store them for the user.
+        """
+        raise NotImplementedError
+
+    def is_connected(self, user):
+        """
+        Tells whether the user has linked an account of this provider.
+        """
+        raise NotImplementedError
+
+    # Reading
+
+    def iter_playlists(self, user):
+        """
+        Stream the user's playlists as {"id", "name", "track_count"} dicts.
+        """
+        raise NotImplementedError
+
+    def iter_playlist_items(self, user, playlist_id):
+        """
+        Stream the track ids of a playlist in order.
+        """
+        raise NotImplementedError
+
+    # Resolving
+
+    def resolve_tracks(self, user, track_ids):
+        """
+        Returns a dict of track id to track; unknown ids are left out.
+        """
+        raise NotImplementedError
+
+    def lookup_isrcs(self, user, isrcs):
+        """
+        Returns a dict of ISRC to a track carrying it; unknown ISRCs are left out.
+        """
+        raise NotImplementedError
+
+    def search_tracks(self, user, queries):
+        """
+        Returns a dict of query to the tracks of the first page of its results.
+        """
+        raise NotImplementedError
+
+    # Writing
+
+    def create_playlist(self, user, name, description=""):
+        """
+        Create an empty playlist. Returns its id.
+        """
+        raise NotImplementedError
+
+    def add_playlist_items(self, user, playlist_id, track_ids):
+        """
+        Append tracks to a playlist in order. Returns the number added.
+        """
+        raise NotImplementedError
@@ -0,0 +1,87 @@
+import itertools
+
+from .base import StreamingProvider
+from .matching import TrackIndex, normalize
+
+
+class FakeProvider(StreamingProvider):
+    """
+    In-process provider holding its catalogue and playlists in memory.
+    Useful for tests and offline benchmarks; calls are counted in self.calls.
+    """
+
+    display_name = "Fake"
+
+    def __init__(self, name="fake", tracks=(), playlists=None, search_limit=10):
+        self.name = name
+        self.tracks = {track["id"]: track for track in tracks}
+        self.playlists = playlists if playlists is not None else {}
+        self.search_limit = search_limit
+        self.index = TrackIndex(self.tracks.values())
+        self.calls = []
+        self._ids = itertools.count(1)
+
+    def get_authorization_url(self, state=None):
+        return f"https://fake.test/authorize?state={state}", "verifier", state
+
+    def complete_authorization(self, user, code, code_verifier):
+        self.calls.append(("authorize", user.pk))
+
+    def is_connected(self, user):
+        return True
+
+    def iter_playlists(self, user):
+        self.calls.append(("iter_playlists",))
+        for playlist_id, playlist in self.playlists.items():
+            yield {
+                "id": playlist_id,
+                "name": playlist["name"],
+                "track_count": len(playlist["tracks"]),
+            }
+
+    def iter_playlist_items(self, user, playlist_id):
+        self.calls.append(("iter_playlist_items", playlist_id))
+        yield from self.playlists[playlist_id]["tracks"]
+
+    def resolve_tracks(self, user, track_ids):
+        self.calls.append(("resolve_tracks", len(track_ids)))
+        return {
+            track_id: self.tracks[track_id] for track_id in track_ids if track_id in self.tracks
+        }
+
+    def lookup_isrcs(self, user, isrcs):
+        self.calls.append(("lookup_isrcs", len(isrcs)))
+        return {
+            isrc: self.tracks[self.index.by_isrc[isrc]]
+            for isrc in isrcs
+            if isrc in self.index.by_isrc
+        }
+
+    def search_tracks(self, user, queries):
+        self.calls.append(("search_tracks", len(queries)))
+        return {query: self._search(query) for query in queries}
+
+    def _search(self, query):
+        """
+        Rank the tracks sharing a title word with the query by words in common.
+        """
+        words = set(normalize(query).split())
+        hits = []
+        for track_id in {i for word in words for i in self.index.blocks.get(word, ())}:
+            fingerprint = self.index.fingerprints[track_id]
+            overlap = words & (set(fingerprint.title.split()) | fingerprint.artists)
+            hits.append((len(overlap), track_id))
+        hits.sort(key=lambda hit: (-hit[0], hit[1]))
+        return [self.tracks[track_id] for _, track_id in hits[: self.search_limit]]
+
+    def create_playlist(self, user, name, description=""):
+        playlist_id = f"{self.name}-{next(self._ids)}"
+        self.playlists[playlist_id] = {"name": name, "tracks": []}
+        self.calls.append(("create_playlist", name))
+        return playlist_id
+
+    def add_playlist_items(self, user, playlist_id, track_ids):
+        track_ids = list(track_ids)
+        self.playlists[playlist_id]["tracks"].extend(track_ids)
+        self.calls.append(("add_playlist_items", len(track_ids)))
+        return len(track_ids)
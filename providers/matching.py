@@ -0,0 +1,279 @@
+import logging
+import os
+import re
+from collections import defaultdict
+from datetime import timedelta
+from difflib import SequenceMatcher
+from itertools import islice
+
+from django.utils import timezone
+from django.utils.dateparse import parse_duration
+
+from .models import TrackMatch
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THRESHOLD = 0.82
+CHUNK_SIZE = 500
+
+# Candidates are only drawn from the blocks of this many of a title's rarest words
+BLOCKING_WORDS = 2
+
+# Words too common in titles to narrow anything down
+STOP_WORDS = {"a", "an", "and", "the", "of", "in", "on", "to", "my", "me", "you", "i", "la", "le"}
+
+# Version suffixes providers append inconsistently ("- Remastered 2011", "- Radio Edit")
+VERSION_SUFFIX = re.compile(r"\s+-\s+.*\b(remaster(ed)?|version|edit|mix|live|mono|stereo)\b.*$")
+
+
+def normalize(text):
+    """
+    Lowercase text and drop featured artists, bracketed suffixes and punctuation.
+    """
+    text = re.sub(r"[\(\[].*?[\)\]]", " ", (text or "").lower())
+    text = re.sub(r"\b(feat|ft|featuring)\b.*", " ", text)
+    return " ".join(re.findall(r"\w+", text))
+
+
+def normalize_title(title):
+    """
+    Normalise a track title, also dropping " - Remastered"-style version suffixes.
+    """
+    return normalize(VERSION_SUFFIX.sub("", (title or "").lower()))
+
+
+def duration_seconds(duration):
+    """
+    Seconds of an ISO 8601 duration string or timedelta, or None.
+    """
+    if isinstance(duration, str):
+        duration = parse_duration(duration)
+    return duration.total_seconds() if duration else None
+
+
+class Fingerprint:
+    """
+    The parts of a track the fuzzy matcher compares, computed once per track.
+    """
+
+    __slots__ = ("id", "title", "words", "artists", "duration")
+
+    def __init__(self, track):
+        self.id = track["id"]
+        self.title = normalize_title(track.get("title"))
+        self.words = [word for word in self.title.split() if word not in STOP_WORDS]
+        self.artists = {
+            word
+            for artist in track.get("artists") or []
+            for word in normalize(artist.get("name")).split()
+        }
+        self.duration = duration_seconds(track.get("duration"))
+
+    def similarity(self, other):
+        """
+        Score from 0 to 1 weighting title, artist overlap and duration closeness.
+        """
+        title = SequenceMatcher(None, self.title, other.title).ratio()
+
+        artists = 0.5
+        if self.artists and other.artists:
+            artists = len(self.artists & other.artists) / len(self.artists | other.artists)
+
+        duration = 0.5
+        if self.duration is not None and other.duration is not None:
+            # Full marks within 2 seconds, nothing beyond 12
+            duration = max(0.0, 1 - max(0.0, abs(self.duration - other.duration) - 2) / 10)
+
+        return 0.6 * title + 0.3 * artists + 0.1 * duration
+
+
+class TrackIndex:
+    """
+    In-memory index of candidate tracks for matching.
+
+    Tracks are indexed by ISRC and in blocks keyed by the words of their normalised
+    title. A track is only compared with the candidates sharing one of its rarest
+    title words, so matching n tracks costs about n times a block size rather than
+    n times the catalogue.
+    """
+
+    def __init__(self, tracks=()):
+        self.fingerprints = {}
+        self.by_isrc = {}
+        self.blocks = defaultdict(list)
+        self.comparisons = 0
+        for track in tracks:
+            self.add(track)
+
+    def __len__(self):
+        return len(self.fingerprints)
+
+    def add(self, track):
+        if track["id"] in self.fingerprints:
+            return
+        fingerprint = Fingerprint(track)
+        self.fingerprints[track["id"]] = fingerprint
+        if track.get("isrc"):
+            self.by_isrc.setdefault(track["isrc"].upper(), track["id"])
+        for word in set(fingerprint.words or fingerprint.title.split()):
+            self.blocks[word].append(track["id"])
+
+    def candidates(self, fingerprint):
+        """
+        Ids of the indexed tracks sharing one of the fingerprint's rarest title words.
+        """
+        words = [
+            word
+            for word in set(fingerprint.words or fingerprint.title.split())
+            if word in self.blocks
+        ]
+        words.sort(key=lambda word: len(self.blocks[word]))
+        ids = set()
+        for word in words[:BLOCKING_WORDS]:
+            ids.update(self.blocks[word])
+        return ids
+
+    def best_match(self, track, threshold=DEFAULT_THRESHOLD):
+        """
+        Returns (track id, score) of the closest indexed track scoring at least
+        threshold, or (None, best score).
+        """
+        fingerprint = track if isinstance(track, Fingerprint) else Fingerprint(track)
+        best_id, best_score = None, 0.0
+        for candidate_id in self.candidates(fingerprint):
+            self.comparisons += 1
+            score = fingerprint.similarity(self.fingerprints[candidate_id])
+            if score > best_score:
+                best_id, best_score = candidate_id, score
+        if best_score < threshold:
+            return None, best_score
+        return best_id, best_score
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def search_query(track):
+    """
+    Text to search another provider's catalogue for a track.
+    """
+    artist = (track.get("artists") or [{}])[0].get("name") or ""
+    return f"{artist} {normalize_title(track.get('title'))}".strip()
+
+
+class TrackMatcher:
+    """
+    Maps tracks of one provider to tracks of another.
+
+    Tracks are looked up in the TrackMatch cache first, then by ISRC on the target,
+    and the rest are matched fuzzily against the target's search results plus any
+    candidates passed in (e.g. the target library). Every answer, including a miss,
+    is cached.
+    """
+
+    def __init__(self, source, target, threshold=DEFAULT_THRESHOLD, ttl=None):
+        self.source = source
+        self.target = target
+        self.threshold = threshold
+        self.comparisons = 0
+        self.ttl = ttl or timedelta(
+            seconds=int(os.getenv("TRACK_MATCH_TTL_SECONDS", str(30 * 24 * 3600)))
+        )
+
+    def match(self, user, tracks, candidates=()):
+        """
+        Match source tracks. Returns a dict of source track id to
+        (target id or None, method, score).
+        """
+        tracks = {track["id"]: track for track in tracks}
+        matches = self._cached(tracks)
+        pending = [track for track_id, track in tracks.items() if track_id not in matches]
+
+        fresh = {}
+        isrcs = {track["isrc"].upper() for track in pending if track.get("isrc")}
+        by_isrc = self.target.lookup_isrcs(user, isrcs) if isrcs else {}
+        for track in pending:
+            found = by_isrc.get((track.get("isrc") or "").upper())
+            if found:
+                fresh[track["id"]] = (found["id"], TrackMatch.Method.ISRC, 1.0)
+        pending = [track for track in pending if track["id"] not in fresh]
+
+        if pending:
+            # Each track is compared with its own search results and with the candidates
+            # sharing its rarest title words, never with everything that came back
+            index = TrackIndex(candidates)
+            queries = {track["id"]: search_query(track) for track in pending}
+            results = self.target.search_tracks(user, list(set(queries.values())))
+            for track in pending:
+                fingerprint = Fingerprint(track)
+                searched = TrackIndex(results.get(queries[track["id"]], []))
+                target_id, score = max(
+                    index.best_match(fingerprint, self.threshold),
+                    searched.best_match(fingerprint, self.threshold),
+                    key=lambda found: found[1],
+                )
+                self.comparisons += searched.comparisons
+                method = TrackMatch.Method.FUZZY if target_id else ""
+                fresh[track["id"]] = (target_id, method, round(score, 4))
+            self.comparisons += index.comparisons
+            logger.debug(f"Fuzzy matched {len(pending)} tracks in {self.comparisons} comparisons")
+
+        self._store(fresh)
+        matches.update(fresh)
+        return matches
+
+    def _cached(self, tracks):
+        matches = {}
+        for batch in chunked(tracks, CHUNK_SIZE):
+            rows = TrackMatch.objects.filter(
+                source_provider=self.source.name,
+                target_provider=self.target.name,
+                source_id__in=batch,
+                matched_at__gte=timezone.now() - self.ttl,
+            ).values_list("source_id", "target_id", "method", "score")
+            for source_id, target_id, method, score in rows:
+                matches[source_id] = (target_id, method, score)
+        return matches
+
+    def _store(self, matches):
+        now = timezone.now()
+        TrackMatch.objects.bulk_create(
+            [
+                TrackMatch(
+                    source_provider=self.source.name,
+                    source_id=source_id,
+                    target_provider=self.target.name,
+                    target_id=target_id,
+                    method=method,
+                    score=score,
+                    matched_at=now,
+                )
+                for source_id, (target_id, method, score) in matches.items()
+            ],
+            batch_size=CHUNK_SIZE,
+            update_conflicts=True,
+            unique_fields=["source_provider", "source_id", "target_provider"],
+            update_fields=["target_id", "method", "score", "matched_at"],
+        )
+
+
+def transfer_playlist(user, source, target, playlist_id, name, matcher=None):
+    """
+    Copy a playlist from one provider to another.
+    Returns (new playlist id, number of tracks added, ids of unmatched source tracks).
+    """
+    matcher = matcher or TrackMatcher(source, target)
+    track_ids = list(source.iter_playlist_items(user, playlist_id))
+    tracks = source.resolve_tracks(user, track_ids)
+    matches = matcher.match(
+        user, [tracks[track_id] for track_id in track_ids if track_id in tracks]
+    )
+
+    new_id = target.create_playlist(user, name)
+    matched = [matches[track_id][0] for track_id in track_ids if matches.get(track_id, (None,))[0]]
+    added = target.add_playlist_items(user, new_id, matched)
+    unmatched = [track_id for track_id in track_ids if not matches.get(track_id, (None,))[0]]
+    return new_id, added, unmatched
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="TrackMatch",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("source_provider", models.CharField(max_length=32)),
+                ("source_id", models.CharField(max_length=128)),
+                ("target_provider", models.CharField(max_length=32)),
+                ("target_id", models.CharField(blank=True, max_length=128, null=True)),
+                (
+                    "method",
+                    models.CharField(
+                        blank=True,
+                        choices=[("isrc", "ISRC"), ("fuzzy", "Title, artist and duration")],
+                        default="",
+                        max_length=16,
+                    ),
+                ),
+                ("score", models.FloatField(default=0)),
+                ("matched_at", models.DateTimeField()),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("source_provider", "source_id", "target_provider"),
+                        name="trackmatch_source_target",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+from django.db import models
+
+
+class TrackMatch(models.Model):
+    """
+    Cached answer to "which track of the target provider is this source track?".
+    A null target_id records that nothing matched well enough.
+    """
+
+    class Method(models.TextChoices):
+        ISRC = "isrc", "ISRC"
+        FUZZY = "fuzzy", "Title, artist and duration"
+
+    source_provider = models.CharField(max_length=32)
+    source_id = models.CharField(max_length=128)
+    target_provider = models.CharField(max_length=32)
+    target_id = models.CharField(max_length=128, null=True, blank=True)
+    method = models.CharField(choices=Method.choices, max_length=16, blank=True, default="")
+    score = models.FloatField(default=0)
+    matched_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["source_provider", "source_id", "target_provider"],
+                name="trackmatch_source_target",
+            )
+        ]
+
+    def __str__(self):
+        target = self.target_id or "no match"
+        return f"{self.source_provider}:{self.source_id} -> {self.target_provider}:{target}"
@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+def provider_names():
+    """
+    Returns the names of the configured streaming providers.
+    """
+    return list(settings.STREAMING_PROVIDERS)
+
+
+def get_provider(name, **kwargs):
+    """
+    Instantiate the provider configured under name in settings.STREAMING_PROVIDERS.
+    """
+    try:
+        path = settings.STREAMING_PROVIDERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown streaming provider: {name}")
+    return import_string(path)(**kwargs)
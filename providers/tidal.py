@@ -0,0 +1,80 @@
+from tidal.api import TidalAPIClient, TidalOAuthManager, TidalTokenManager
+from tidal.catalog import TrackCatalog
+from tidal.models import TidalToken
+
+from .base import StreamingProvider
+
+# Search results per query considered as match candidates
+SEARCH_CANDIDATES = 5
+
+
+class TidalProvider(StreamingProvider):
+    """
+    Tidal through TidalAPIClient, with track metadata served from the shared catalog.
+    """
+
+    name = "tidal"
+    display_name = "Tidal"
+
+    def __init__(self, api_client=None, oauth_manager=None, catalog=None):
+        self.api_client = api_client or TidalAPIClient()
+        self.oauth_manager = oauth_manager or TidalOAuthManager()
+        self.catalog = catalog or TrackCatalog()
+
+    def get_authorization_url(self, state=None):
+        return self.oauth_manager.get_authorization_url(state)
+
+    def complete_authorization(self, user, code, code_verifier):
+        token_data = self.oauth_manager.exchange_code_for_token(code, code_verifier)
+        token_manager = TidalTokenManager()
+        token_manager.save_user_token(user, token_data)
+        token_manager.save_tidal_user_id(user)
+
+    def is_connected(self, user):
+        return TidalToken.objects.filter(user=user).exists()
+
+    def iter_playlists(self, user):
+        ids = [item["id"] for item in self.api_client.iter_user_playlists(user)]
+        data, _ = self.api_client.fetch_resources(user, "playlists", ids)
+        for item in data:
+            attributes = item.get("attributes", {})
+            yield {
+                "id": item["id"],
+                "name": attributes.get("name"),
+                "track_count": attributes.get("numberOfItems"),
+            }
+
+    def iter_playlist_items(self, user, playlist_id):
+        for item in self.api_client.iter_playlist_tracks(user, playlist_id):
+            if item.get("type") == "tracks":
+                yield item["id"]
+
+    def resolve_tracks(self, user, track_ids):
+        return self.catalog.get_tracks(user, self.api_client, track_ids)
+
+    def lookup_isrcs(self, user, isrcs):
+        country = self.api_client._user_country(user)
+        tracks = self.catalog.lookup_isrcs(isrcs, country)
+        missing = set(isrcs) - set(tracks)
+        if missing:
+            found = self.api_client.resolve_isrcs(user, missing, country_code=country)
+            self.catalog.store_tracks(found.values(), country)
+            tracks.update(found)
+        return tracks
+
+    def search_tracks(self, user, queries):
+        results = {
+            query: ids[:SEARCH_CANDIDATES]
+            for query, ids in self.api_client.search_tracks(user, queries).items()
+        }
+        tracks = self.resolve_tracks(user, [i for ids in results.values() for i in ids])
+        return {
+            query: [tracks[track_id] for track_id in ids if track_id in tracks]
+            for query, ids in results.items()
+        }
+
+    def create_playlist(self, user, name, description=""):
+        return self.api_client.create_playlist(user, name, description)
+
+    def add_playlist_items(self, user, playlist_id, track_ids):
+        return self.api_client.add_playlist_items(user, playlist_id, track_ids)
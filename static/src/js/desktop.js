@@ -125,6 +125,75 @@ function initializeModalCloseHandlers() {
     });
 }
 
+// Job Progress
+
+const JOB_LABELS = {
+    'tidal.sync_playlists': 'Checking playlists',
+    'tidal.sync_playlist': 'Syncing playlist',
+    'tidal.import_playlist': 'Importing playlist',
+    'tidal.flush_playlist_edits': 'Saving playlist edits'
+};
+
+// Finished jobs stay on screen this long before they are removed
+const FINISHED_JOB_MS = 4000;
+
+function describeJob(job) {
+    const parts = [job.stage || JOB_LABELS[job.name] || job.name];
+    if (job.status === 'queued' && job.error) {
+        parts.push(`retrying: ${job.error}`);
+    } else if (job.status === 'queued') {
+        parts.push('waiting');
+    } else if (job.status === 'failed') {
+        parts.push(`failed: ${job.error || 'unknown error'}`);
+    } else if (job.status === 'succeeded') {
+        parts.push('done');
+    } else {
+        if (job.pages) parts.push(`${job.pages} pages`);
+        if (job.items) parts.push(`${job.items} items`);
+        if (job.eta != null) parts.push(`about ${Math.ceil(job.eta)}s left`);
+    }
+    return parts.join(' · ');
+}
+
+function renderJob(container, job) {
+    let element = container.querySelector(`[data-job-id="${job.id}"]`);
+    if (!element) {
+        element = document.createElement('div');
+        element.className = 'job-progress-item';
+        element.dataset.jobId = job.id;
+        element.innerHTML = '<div class="job-progress-bar"><div class="job-progress-fill"></div></div><span></span>';
+        container.appendChild(element);
+    }
+
+    const fraction = job.status === 'succeeded' ? 1 : (job.fraction || 0);
+    element.querySelector('.job-progress-fill').style.width = `${Math.round(fraction * 100)}%`;
+    element.querySelector('span').textContent = describeJob(job);
+    element.classList.toggle('failed', job.status === 'failed');
+
+    if (job.status === 'succeeded' || job.status === 'failed') {
+        setTimeout(() => element.remove(), FINISHED_JOB_MS);
+    }
+}
+
+function initializeJobProgress() {
+    const container = document.getElementById('job-progress');
+    if (!container || !window.EventSource) {
+        return;
+    }
+
+    // The browser reconnects by itself when the server ends the stream
+    const events = new EventSource(container.dataset.eventsUrl);
+    events.addEventListener('job', event => {
+        const job = JSON.parse(event.data);
+        // Only show what happened while the page is open, not earlier finished jobs
+        if (!container.querySelector(`[data-job-id="${job.id}"]`) &&
+            (job.status === 'succeeded' || job.status === 'failed')) {
+            return;
+        }
+        renderJob(container, job);
+    });
+}
+
 function initializeDesktop() {
     // Initialize date/time updates
     updateDateTime();
@@ -138,6 +207,9 @@ function initializeDesktop() {
 
     // Initialize draggable
     initializeDraggable();
+
+    // Initialize live job progress
+    initializeJobProgress();
 }
 
 // Initialize when DOM is loaded
@@ -0,0 +1,110 @@
+// Drag-and-drop reordering of a synced playlist's tracks.
+//
+// Drops are applied to the list right away and sent to the server in batches once
+// the user pauses; the server coalesces them again before writing to Tidal.
+
+const SEND_DELAY_MS = 400;
+
+function initializePlaylistEdits(list) {
+    const editsUrl = list.dataset.editsUrl;
+    let revision = Number(list.dataset.revision);
+    let pending = [];
+    let timer = null;
+    let sending = false;
+    let dragged = null;
+
+    function rows() {
+        return Array.from(list.querySelectorAll('[data-item]'));
+    }
+
+    function renumber() {
+        rows().forEach((row, index) => {
+            const number = row.querySelector('[data-position]');
+            if (number) {
+                number.textContent = index + 1;
+            }
+        });
+    }
+
+    function queue(op) {
+        pending.push(op);
+        clearTimeout(timer);
+        timer = setTimeout(send, SEND_DELAY_MS);
+    }
+
+    async function send() {
+        if (sending || pending.length === 0) {
+            return;
+        }
+        sending = true;
+        const ops = pending;
+        pending = [];
+
+        try {
+            const response = await fetch(editsUrl, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'X-CSRFToken': list.dataset.csrf,
+                },
+                body: JSON.stringify({ revision, ops }),
+            });
+            if (response.status === 409) {
+                // Someone else changed the playlist; show theirs
+                window.location.reload();
+                return;
+            }
+            if (!response.ok) {
+                throw new Error(`Saving edits failed with ${response.status}`);
+            }
+            revision = (await response.json()).revision;
+            list.dataset.revision = revision;
+        } catch (error) {
+            console.error(error);
+            window.location.reload();
+        } finally {
+            sending = false;
+            if (pending.length) {
+                send();
+            }
+        }
+    }
+
+    list.addEventListener('dragstart', (event) => {
+        dragged = event.target.closest('[data-item]');
+        if (dragged) {
+            event.dataTransfer.effectAllowed = 'move';
+            dragged.classList.add('opacity-50');
+        }
+    });
+
+    list.addEventListener('dragover', (event) => {
+        if (dragged) {
+            event.preventDefault();
+        }
+    });
+
+    list.addEventListener('drop', (event) => {
+        const target = event.target.closest('[data-item]');
+        if (!dragged || !target || target === dragged) {
+            return;
+        }
+        event.preventDefault();
+
+        const before = event.offsetY < target.offsetHeight / 2;
+        target.parentNode.insertBefore(dragged, before ? target : target.nextSibling);
+        queue({ op: 'move', item: Number(dragged.dataset.item), to: rows().indexOf(dragged) });
+        renumber();
+    });
+
+    list.addEventListener('dragend', () => {
+        if (dragged) {
+            dragged.classList.remove('opacity-50');
+            dragged = null;
+        }
+    });
+
+    window.addEventListener('beforeunload', send);
+}
+
+up.compiler('#track-list[data-edits-url]', initializePlaylistEdits);
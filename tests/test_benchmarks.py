@@ -0,0 +1,84 @@
+"""
+Tests for the fake Tidal server and the benchmark scenarios.
+"""
+
+from unittest import mock
+
+from django.core.cache import cache, caches
+from django.test import TestCase
+
+from benchmarks.fake_tidal import FakeTidalServer, SyntheticLibrary
+from benchmarks.scenarios import Bench, library_walk, revalidated_walk, sync_throughput
+from tidal.http import TidalTransport, set_transport
+from tidal.models import PlaylistItem
+from tidal.ratelimit import RateLimitScheduler
+from tidal.token_cache import app_tokens, user_tokens
+
+
+class FakeTidalServerTestCase(TestCase):
+    """Test cases for the Tidal client against the fake server on loopback."""
+
+    def setUp(self):
+        cache.clear()
+        caches["tidal_http"].clear()
+        user_tokens.clear()
+        app_tokens.clear()
+        self.library = SyntheticLibrary(tracks=200, playlist_size=50)
+
+    def start(self, **options):
+        server = FakeTidalServer(self.library, **options).start()
+        self.addCleanup(server.stop)
+        patcher = mock.patch.dict("os.environ", server.environ())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        scheduler = RateLimitScheduler(
+            app_rate=1000, app_burst=1000, user_rate=1000, user_burst=1000, backoff_base=0.01
+        )
+        previous = set_transport(TidalTransport(scheduler=scheduler))
+        self.addCleanup(set_transport, previous)
+        return Bench(server, repeat=2, concurrency=4)
+
+    def test_library_walk(self):
+        """Test that every page of every playlist is walked over HTTP."""
+        bench = self.start()
+
+        result = library_walk(bench)
+
+        self.assertEqual(result["playlists"], 4)
+        self.assertEqual(result["items"], self.library.item_count)
+        # One collection page plus three item pages per 55-item playlist
+        self.assertEqual(bench.server.stats["api_requests"], 1 + 4 * 3)
+
+    def test_revalidated_walk(self):
+        """Test that walking the library again only costs 304s without bodies."""
+        bench = self.start()
+
+        result = revalidated_walk(bench)
+
+        self.assertEqual(result["items"], self.library.item_count)
+        self.assertEqual(result["not_modified"], result["requests"])
+        self.assertEqual(result["revalidated_bytes"], 0)
+        self.assertGreater(result["cold_bytes"], 0)
+
+    def test_injected_faults_are_retried(self):
+        """Test that 429s and 503s are retried and the walk still completes."""
+        bench = self.start(throttle_every=3, fail_every=5, retry_after=0.01)
+
+        result = library_walk(bench)
+
+        stats = bench.server.stats
+        self.assertEqual(result["items"], self.library.item_count)
+        # Every 3rd and 5th of the 13 URLs fails once, within the default retry budget
+        self.assertEqual(stats["status_429"], 4)
+        self.assertEqual(stats["status_503"], 2)
+
+    def test_sync_throughput(self):
+        """Test that the sync scenario stores the library and re-syncs nothing."""
+        bench = self.start()
+
+        result = sync_throughput(bench)
+
+        self.assertEqual(result["songs"], 200)
+        self.assertEqual(PlaylistItem.objects.count(), self.library.item_count)
+        self.assertEqual(result["incremental_playlists"], 0)
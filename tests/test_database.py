@@ -0,0 +1,121 @@
+"""
+Tests for the SQLite concurrency profile in settings.
+"""
+
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.db import connections, transaction
+from django.test import SimpleTestCase
+
+
+class SQLiteProfileTestCase(SimpleTestCase):
+    """Test cases for WAL mode, pragmas and lock behaviour on a file database."""
+
+    databases = {"profile"}
+
+    @classmethod
+    def setUpClass(cls):
+        # The test database is in memory; use the same options on a throwaway file
+        cls.directory = tempfile.TemporaryDirectory()
+        connections.settings["profile"] = {
+            **connections.settings["default"],
+            "NAME": Path(cls.directory.name) / "db",
+        }
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections["profile"].close()
+        del connections["profile"]
+        del connections.settings["profile"]
+        cls.directory.cleanup()
+
+    def setUp(self):
+        super().setUp()
+        with connections["profile"].cursor() as cursor:
+            cursor.execute("DROP TABLE IF EXISTS song")
+            cursor.execute("CREATE TABLE song (id INTEGER PRIMARY KEY, title TEXT)")
+
+    def in_thread(self, target):
+        """Run target in a thread with its own connection and return the thread."""
+
+        def run():
+            try:
+                target(connections["profile"])
+            finally:
+                connections["profile"].close()
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        return thread
+
+    def pragma(self, name):
+        with connections["profile"].cursor() as cursor:
+            cursor.execute(f"PRAGMA {name}")
+            return cursor.fetchone()[0]
+
+    def test_pragmas_are_applied(self):
+        """Test that every connection opens in WAL mode with the tuned pragmas."""
+        self.assertEqual(self.pragma("journal_mode"), "wal")
+        self.assertEqual(self.pragma("synchronous"), 1)
+        self.assertEqual(self.pragma("busy_timeout"), 20000)
+        self.assertEqual(self.pragma("cache_size"), -65536)
+        self.assertGreater(self.pragma("mmap_size"), 0)
+
+    def test_readers_are_not_blocked_during_bulk_write(self):
+        """Test that reads complete while a bulk sync holds the write transaction."""
+        writing = threading.Event()
+        done = threading.Event()
+
+        def bulk_sync(connection):
+            with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+                # Write more than fits in the page cache, so pages spill to the database
+                # file mid-transaction; without WAL that locks every reader out
+                cursor.execute("PRAGMA cache_size=-1024")
+                cursor.execute(
+                    "WITH RECURSIVE n(i) AS "
+                    "(SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 5000) "
+                    "INSERT INTO song (title) SELECT hex(randomblob(500)) FROM n"
+                )
+                writing.set()
+                done.wait(timeout=5)
+
+        writer = self.in_thread(bulk_sync)
+        self.assertTrue(writing.wait(timeout=5))
+
+        started = time.monotonic()
+        with connections["profile"].cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM song")
+            count = cursor.fetchone()[0]
+        elapsed = time.monotonic() - started
+
+        done.set()
+        writer.join()
+        self.assertEqual(count, 0)
+        self.assertLess(elapsed, 1)
+
+    def test_second_writer_waits_instead_of_failing(self):
+        """Test that a writer queued behind another one succeeds once the lock is released."""
+        holding = threading.Event()
+
+        def hold_lock(connection):
+            with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+                cursor.execute("INSERT INTO song (title) VALUES ('first')")
+                holding.set()
+                time.sleep(0.3)
+
+        writer = self.in_thread(hold_lock)
+        self.assertTrue(holding.wait(timeout=5))
+
+        connection = connections["profile"]
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute("INSERT INTO song (title) VALUES ('second')")
+
+        writer.join()
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT title FROM song ORDER BY id")
+            self.assertEqual([row[0] for row in cursor.fetchall()], ["first", "second"])
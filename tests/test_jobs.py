@@ -0,0 +1,347 @@
+"""
+Tests for the database-backed job queue and its worker.
+"""
+
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from jobs import progress, queue
+from jobs.models import Job, Tenant
+from jobs.registry import register
+from jobs.stats import tenant_stats
+from jobs.worker import Worker
+from tidal.tasks import enqueue_playlist_sync, enqueue_sync_playlists, run_sync
+
+calls = []
+
+
+@register("tests.record")
+def record(value):
+    calls.append(value)
+
+
+@register("tests.progress")
+def report_progress():
+    progress.report(pages=2, items=5, fraction=0.5, stage="Halfway")
+
+
+@register("tests.explode")
+def explode():
+    raise RuntimeError("boom")
+
+
+class JobQueueTestCase(TestCase):
+    """Test cases for enqueueing, claiming and retrying jobs."""
+
+    def setUp(self):
+        calls.clear()
+        self.worker = Worker(threads=1, name="test")
+
+    def test_dedupe_key_queues_once(self):
+        """Test that waiting work with the same key is merged, keeping the higher priority."""
+        first, created = queue.enqueue("tests.record", {"value": 1}, dedupe_key="user:1")
+        second, created_again = queue.enqueue(
+            "tests.record", {"value": 1}, priority=Job.Priority.HIGH, dedupe_key="user:1"
+        )
+
+        self.assertTrue(created)
+        self.assertFalse(created_again)
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(second.priority, Job.Priority.HIGH)
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_running_job_does_not_block_a_new_one(self):
+        """Test that work queued while the same work runs is queued again."""
+        queue.enqueue("tests.record", {"value": 1}, dedupe_key="user:1")
+        queue.claim("test")
+
+        _, created = queue.enqueue("tests.record", {"value": 1}, dedupe_key="user:1")
+
+        self.assertTrue(created)
+
+    def test_unknown_handler(self):
+        """Test that jobs without a handler are refused."""
+        with self.assertRaises(ValueError):
+            queue.enqueue("tests.missing")
+
+    def test_claim_order(self):
+        """Test that due jobs are claimed by priority, then in order, and future ones wait."""
+        low, _ = queue.enqueue("tests.record", {"value": "low"}, priority=Job.Priority.LOW)
+        normal, _ = queue.enqueue("tests.record", {"value": "normal"})
+        queue.enqueue(
+            "tests.record", {"value": "later"}, run_at=timezone.now() + timedelta(hours=1)
+        )
+        high, _ = queue.enqueue("tests.record", {"value": "high"}, priority=Job.Priority.HIGH)
+
+        claimed = [queue.claim("test").pk for _ in range(3)]
+
+        self.assertEqual(claimed, [high.pk, normal.pk, low.pk])
+        self.assertIsNone(queue.claim("test"))
+
+    def test_run_job(self):
+        """Test that a claimed job runs its handler and is marked succeeded."""
+        queue.enqueue("tests.record", {"value": 42})
+
+        self.worker.run_job(queue.claim("test"))
+
+        job = Job.objects.get()
+        self.assertEqual(calls, [42])
+        self.assertEqual((job.status, job.attempts), (Job.Status.SUCCEEDED, 1))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_failed_job_is_retried_with_backoff(self):
+        """Test that failures are retried later until the attempts run out."""
+        queue.enqueue("tests.explode", max_attempts=2)
+
+        self.worker.run_job(queue.claim("test"))
+
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts), (Job.Status.QUEUED, 1))
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn("RuntimeError: boom", job.last_error)
+
+        Job.objects.update(run_at=timezone.now())
+        self.worker.run_job(queue.claim("test"))
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.Status.FAILED, 2))
+
+    def test_expired_lease_is_reclaimed(self):
+        """Test that a job whose worker stopped heartbeating is queued again."""
+        queue.enqueue("tests.record", {"value": 1})
+        job = queue.claim("crashed", lease=timedelta(seconds=30))
+
+        self.assertTrue(queue.heartbeat(job))
+        Job.objects.update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(queue.reclaim_expired(), 1)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.QUEUED)
+        self.assertIn("crashed", job.last_error)
+        self.assertFalse(queue.heartbeat(job))
+
+    def test_retry_superseded_by_queued_job(self):
+        """Test that a failure is not retried when the same work was queued meanwhile."""
+        queue.enqueue("tests.explode", dedupe_key="k")
+        job = queue.claim("test")
+        queue.enqueue("tests.explode", dedupe_key="k")
+
+        self.assertFalse(queue.fail(job, "boom"))
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.FAILED)
+        self.assertEqual(Job.objects.filter(status=Job.Status.QUEUED).count(), 1)
+
+
+class FairQueuingTestCase(TestCase):
+    """Test cases for sharing the workers between tenants."""
+
+    def claim_tenants(self, count):
+        return [queue.claim("test").tenant for _ in range(count)]
+
+    def test_light_tenants_are_not_starved(self):
+        """Test that tenants arriving behind a large backlog are served within a round."""
+        for value in range(300):
+            queue.enqueue("tests.record", {"value": value}, tenant="heavy")
+        self.claim_tenants(50)
+
+        for index in range(20):
+            queue.enqueue("tests.record", {"value": index}, tenant=f"light:{index}")
+
+        claimed = self.claim_tenants(21)
+        self.assertEqual(len([tenant for tenant in claimed if tenant != "heavy"]), 20)
+
+    def test_weight_sets_the_share(self):
+        """Test that a tenant with twice the weight gets twice the jobs."""
+        Tenant.objects.create(key="gold", weight=2)
+        for value in range(30):
+            queue.enqueue("tests.record", {"value": value}, tenant="gold")
+            queue.enqueue("tests.record", {"value": value}, tenant="basic")
+
+        claimed = self.claim_tenants(30)
+
+        self.assertEqual(claimed.count("gold"), 20)
+        self.assertEqual(claimed.count("basic"), 10)
+
+    def test_cost_is_charged(self):
+        """Test that a tenant of costly jobs gets fewer of them."""
+        for value in range(10):
+            queue.enqueue("tests.record", {"value": value}, tenant="big", cost=4)
+            queue.enqueue("tests.record", {"value": value}, tenant="small")
+
+        claimed = self.claim_tenants(10)
+
+        self.assertEqual(claimed.count("big"), 2)
+        self.assertEqual(claimed.count("small"), 8)
+
+    def test_interactive_refresh_preempts_background_syncs(self):
+        """Test that a refresh the user asked for is claimed before queued syncs."""
+        user = User.objects.create(username="listener")
+        for index in range(20):
+            enqueue_playlist_sync(7, f"playlist-{index}", {}, item_count=100)
+
+        self.client.force_login(user)
+        response = self.client.post(reverse("tidal:playlist_refresh", args=["mine"]))
+
+        self.assertRedirects(
+            response, reverse("tidal:playlist_tracks", args=["mine"]), fetch_redirect_response=False
+        )
+        job = queue.claim("test")
+        self.assertEqual(job.args, {"user_id": user.pk, "playlist_id": "mine"})
+        self.assertEqual((job.priority, job.tenant), (Job.Priority.HIGH, f"user:{user.pk}"))
+
+    def test_sync_is_sharded_per_playlist(self):
+        """Test that a user's sync queues one job per changed playlist, costed by size."""
+        changed = {"a": {"numberOfItems": 45}, "b": {"numberOfItems": 0}}
+        with mock.patch(
+            "tidal.sync.PlaylistSyncEngine.plan_user", return_value=({}, changed)
+        ), mock.patch("django.contrib.auth.models.User.objects.get"):
+            run_sync(3)
+
+        jobs = Job.objects.filter(name="tidal.sync_playlist").order_by("pk")
+        self.assertEqual([job.args["playlist_id"] for job in jobs], ["a", "b"])
+        self.assertEqual([job.cost for job in jobs], [4, 1])
+        self.assertEqual({job.tenant for job in jobs}, {"user:3"})
+
+    def test_tenant_stats(self):
+        """Test that per-tenant waiting, throughput and wait times are reported."""
+        for value in range(3):
+            queue.enqueue("tests.record", {"value": value}, tenant="a", cost=2)
+        queue.enqueue("tests.record", {"value": 0}, tenant="b")
+        for _ in range(2):
+            queue.complete(queue.claim("test"))
+        Job.objects.filter(status=Job.Status.SUCCEEDED).update(
+            started_at=F("run_at") + timedelta(seconds=10)
+        )
+
+        stats = {row["tenant"]: row for row in tenant_stats()}
+
+        self.assertEqual((stats["a"]["completed"], stats["a"]["queued"]), (1, 2))
+        self.assertEqual((stats["b"]["completed"], stats["b"]["queued"]), (1, 0))
+        self.assertAlmostEqual(stats["a"]["throughput"], 2 / 60)
+        self.assertEqual(stats["a"]["wait_p95"], 10)
+
+
+class JobProgressTestCase(TestCase):
+    """Test cases for reporting and streaming job progress."""
+
+    def run_claimed(self):
+        Worker(threads=1, name="test").run_job(queue.claim("test"))
+
+    def test_report_outside_a_job_is_ignored(self):
+        """Test that progress reported outside a job does nothing."""
+        progress.report(pages=1)
+
+    def test_progress_is_published_and_saved(self):
+        """Test that a job's progress reaches subscribers at once and is saved on the job."""
+        job, _ = queue.enqueue("tests.progress", tenant="user:1")
+
+        with progress.broker.subscribe("user:1") as subscription:
+            self.run_claimed()
+            events = []
+            while (event := subscription.get(timeout=0)) is not None:
+                events.append(event)
+
+        self.assertEqual([event["status"] for event in events], ["running", "running", "succeeded"])
+        update = events[1]
+        self.assertEqual((update["pages"], update["items"], update["stage"]), (2, 5, "Halfway"))
+        self.assertEqual(update["fraction"], 0.5)
+        self.assertIsNotNone(update["eta"])
+        job.refresh_from_db()
+        self.assertEqual(job.progress["pages"], 2)
+        self.assertEqual(progress.job_event(job)["revision"], events[-1]["revision"])
+
+    def test_failure_is_published(self):
+        """Test that the error of a failed job is published."""
+        queue.enqueue("tests.explode", tenant="user:1", max_attempts=1)
+
+        with progress.broker.subscribe("user:1") as subscription:
+            self.run_claimed()
+            *_, last = iter(lambda: subscription.get(timeout=0), None)
+
+        self.assertEqual(last["status"], "failed")
+        self.assertIn("RuntimeError: boom", last["error"])
+
+    def test_failure_to_start_tracking_is_recorded(self):
+        """Test that a job whose progress cannot be published still has its failure stored."""
+        job, _ = queue.enqueue("tests.record", {"value": 1}, tenant="user:1", max_attempts=1)
+
+        with mock.patch.object(
+            progress.broker, "publish", side_effect=[RuntimeError("down"), None]
+        ):
+            self.run_claimed()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.FAILED)
+        self.assertIn("RuntimeError: down", job.last_error)
+
+    def test_stream_polls_jobs_of_other_processes(self):
+        """Test that the stream finds saved progress and skips updates it already sent."""
+        job, _ = queue.enqueue("tests.record", {"value": 1}, tenant="user:1")
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.Status.RUNNING, revision=1, progress={"seq": 3, "pages": 7}
+        )
+        # Published in this process before the progress was saved
+        progress.broker.publish("user:1", {**progress.job_event(Job.objects.get()), "seq": 3})
+
+        events = [
+            event
+            for event in progress.stream("user:1", poll_interval=0.01, duration=0.1)
+            if event is not None
+        ]
+
+        self.assertEqual(len(events), 1)
+        self.assertEqual((events[0]["id"], events[0]["pages"]), (job.pk, 7))
+
+    def test_events_endpoint(self):
+        """Test that the events endpoint streams the user's jobs as Server-Sent Events."""
+        self.assertEqual(self.client.get(reverse("jobs:events")).status_code, 401)
+
+        user = User.objects.create(username="listener")
+        queue.enqueue("tests.record", {"value": 1}, tenant=queue.user_tenant(user.pk))
+        queue.enqueue("tests.record", {"value": 2}, tenant="user:other")
+        self.client.force_login(user)
+
+        with mock.patch.dict("os.environ", {"JOB_EVENTS_MAX_SECONDS": "0.05"}):
+            response = self.client.get(reverse("jobs:events"))
+            body = b"".join(response.streaming_content).decode()
+
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertTrue(body.startswith("retry: "))
+        self.assertEqual(body.count("event: job"), 1)
+        self.assertIn('"status": "queued"', body)
+
+
+class WorkerTestCase(TransactionTestCase):
+    """Test cases for the threaded worker."""
+
+    def test_burst_runs_every_due_job(self):
+        """Test that a burst worker drains the queue on several threads."""
+        calls.clear()
+        for value in range(10):
+            queue.enqueue("tests.record", {"value": value})
+
+        processed = Worker(threads=3, poll_interval=0.01, name="test").run(burst=True)
+
+        self.assertEqual(processed, 10)
+        self.assertEqual(sorted(calls), list(range(10)))
+        self.assertEqual(Job.objects.filter(status=Job.Status.SUCCEEDED).count(), 10)
+
+    def test_sync_is_queued_once_per_user(self):
+        """Test that repeated sync requests for a user run one sync."""
+        user = User.objects.create(username="listener")
+        self.assertTrue(enqueue_sync_playlists(user.pk))
+        self.assertFalse(enqueue_sync_playlists(user.pk))
+
+        with mock.patch(
+            "tidal.sync.PlaylistSyncEngine.plan_user", return_value=({}, {})
+        ) as plan_user:
+            Worker(threads=2, poll_interval=0.01, name="test").run(burst=True)
+
+        plan_user.assert_called_once_with(user, False)
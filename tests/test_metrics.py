@@ -0,0 +1,94 @@
+"""
+Tests for the metrics registry, the metrics middleware and the /metrics endpoint.
+"""
+
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from harmoniq import metrics
+from tidal.http import set_transport
+
+from .tidal_stubs import API_URL, FakeLibrary, TidalStubMixin
+
+
+class EndpointLabelTestCase(TestCase):
+    """Test cases for endpoint_label."""
+
+    def test_ids_are_collapsed(self):
+        """Test that resource ids are replaced and relationship names kept."""
+        self.assertEqual(
+            metrics.endpoint_label(f"{API_URL}/playlists/abc-123/relationships/items?page=2"),
+            "openapi.tidal.test/v2/playlists/{id}/relationships/items",
+        )
+        self.assertEqual(
+            metrics.endpoint_label(f"{API_URL}/tracks?filter[id]=1,2"),
+            "openapi.tidal.test/v2/tracks",
+        )
+
+
+class MetricsTestCase(TidalStubMixin, TestCase):
+    """Test cases for upstream, cache and per-view metrics."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        metrics.registry.clear()
+        FakeLibrary(self.stub, {"p1": {"name": "Road Trip", "tracks": ["1", "2"]}})
+        previous = set_transport(self.transport)
+        self.addCleanup(set_transport, previous)
+        self.client.force_login(self.user)
+
+    def test_upstream_requests_are_counted(self):
+        """Test that upstream calls are counted by endpoint, status and token kind."""
+        self.client.get(reverse("tidal:tidal_playlists"))
+
+        endpoint = "openapi.tidal.test/v2/userCollections/{id}/relationships/playlists"
+        self.assertEqual(metrics.upstream_requests.value(endpoint, "GET", "200", "user"), 1)
+        self.assertEqual(metrics.upstream_duration.count(endpoint, "GET", "user"), 1)
+
+    def test_cache_hits_and_misses_are_counted(self):
+        """Test that a repeat page view is counted as a cache hit."""
+        url = reverse("tidal:tidal_playlists")
+        self.client.get(url)
+        self.client.get(url)
+
+        self.assertEqual(metrics.cache_requests.value("tidal", "playlists", "miss"), 1)
+        self.assertEqual(metrics.cache_requests.value("tidal", "playlists", "hit"), 1)
+
+    def test_server_timing_header(self):
+        """Test that responses carry database, upstream and total timings."""
+        response = self.client.get(reverse("tidal:tidal_playlists"))
+
+        header = response["Server-Timing"]
+        self.assertIn("db;dur=", header)
+        self.assertIn("upstream;dur=", header)
+        self.assertIn("total;dur=", header)
+        self.assertGreater(metrics.db_queries.value("tidal:tidal_playlists"), 0)
+        self.assertEqual(metrics.http_duration.count("tidal:tidal_playlists", "GET", "200"), 1)
+
+    def test_metrics_endpoint(self):
+        """Test that /metrics renders the Prometheus text format."""
+        self.client.get(reverse("tidal:tidal_playlists"))
+
+        response = self.client.get(reverse("metrics"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        body = response.content.decode()
+        self.assertIn("# TYPE harmoniq_upstream_requests_total counter", body)
+        self.assertIn(
+            'harmoniq_http_request_duration_seconds_bucket{view="tidal:tidal_playlists"', body
+        )
+        self.assertIn("harmoniq_upstream_scheduler_requests", body)
+
+    def test_metrics_endpoint_token(self):
+        """Test that METRICS_TOKEN requires a matching bearer token."""
+        with mock.patch.dict("os.environ", {"METRICS_TOKEN": "scrape-secret"}):
+            self.assertEqual(self.client.get(reverse("metrics")).status_code, 401)
+            response = self.client.get(
+                reverse("metrics"), headers={"Authorization": "Bearer scrape-secret"}
+            )
+            self.assertEqual(response.status_code, 200)
@@ -0,0 +1,179 @@
+"""
+Tests for the streaming provider interface and cross-service track matching.
+"""
+
+import random
+import time
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+
+from providers.fake import FakeProvider
+from providers.matching import Fingerprint, TrackMatcher, normalize_title, transfer_playlist
+from providers.models import TrackMatch
+from providers.registry import get_provider
+from providers.tidal import TidalProvider
+from tidal.api import TidalAPIClient
+
+from .tidal_stubs import API_URL, TidalStubMixin
+
+SYLLABLES = [c + v for c in "bdfgklmnprstvz" for v in "aeiou"]
+
+
+def track(track_id, title, artist, duration=200, isrc=None):
+    minutes, seconds = divmod(duration, 60)
+    return {
+        "id": track_id,
+        "title": title,
+        "isrc": isrc,
+        "duration": f"PT{minutes}M{seconds}S",
+        "artists": [{"id": artist, "name": artist}],
+        "album": None,
+    }
+
+
+def make_libraries(size, distractors):
+    """
+    Returns (source tracks, target tracks): every source track has a counterpart in
+    the target, half of them only findable by title, artist and duration.
+    """
+    rng = random.Random(7)
+    words = [a + b for a in SYLLABLES for b in SYLLABLES]
+    artists = [f"{rng.choice(words)} {rng.choice(words)}".title() for _ in range(size // 10)]
+
+    titles = set()
+    while len(titles) < size + distractors:
+        titles.add(" ".join(rng.choice(words) for _ in range(rng.randint(2, 4))).title())
+    titles = sorted(titles)
+    rng.shuffle(titles)
+
+    source, target = [], []
+    for n, title in enumerate(titles[:size]):
+        artist, duration = rng.choice(artists), rng.randint(120, 400)
+        source.append(track(f"s{n}", title, artist, duration, isrc=f"SRC{n}"))
+        if n % 2:
+            target.append(track(f"t{n}", title, artist, duration, isrc=f"SRC{n}"))
+        else:
+            variant = f"{title} - Remastered 2011" if n % 4 else f"{title} (feat. Someone)"
+            target.append(track(f"t{n}", variant, artist, duration + 1))
+    for n, title in enumerate(titles[size:]):
+        target.append(track(f"d{n}", title, rng.choice(artists), rng.randint(120, 400)))
+    return source, target
+
+
+class MatchingTestCase(TestCase):
+    """Test cases for fuzzy similarity and the TrackMatcher."""
+
+    def setUp(self):
+        self.user = User.objects.create(username="listener")
+
+    def test_version_suffixes_are_ignored(self):
+        """Test that remaster suffixes, brackets and featured artists are normalised away."""
+        self.assertEqual(normalize_title("Heroes - 2017 Remaster"), "heroes")
+        self.assertEqual(normalize_title("Heroes (feat. Someone)"), "heroes")
+        self.assertEqual(normalize_title("Live - Forever"), "live forever")
+
+    def test_similarity_weighs_artist_and_duration(self):
+        """Test that the same title by another artist or of another length scores lower."""
+        original = Fingerprint(track("1", "Heroes", "David Bowie", 371))
+
+        same = original.similarity(
+            Fingerprint(track("2", "Heroes - Remastered", "David Bowie", 372))
+        )
+        cover = original.similarity(Fingerprint(track("3", "Heroes", "Cover Band", 371)))
+        edit = original.similarity(Fingerprint(track("4", "Heroes", "David Bowie", 210)))
+
+        self.assertGreater(same, 0.95)
+        self.assertLess(cover, 0.82)
+        self.assertLess(edit, same)
+
+    def test_library_transfer_is_matched_without_pairwise_comparisons(self):
+        """Test that 5k tracks match by ISRC or fuzzily in seconds and bounded comparisons."""
+        source_tracks, target_tracks = make_libraries(5000, 15000)
+        source = FakeProvider(
+            "source",
+            source_tracks,
+            {"p1": {"name": "Everything", "tracks": [t["id"] for t in source_tracks]}},
+        )
+        target = FakeProvider("target", target_tracks)
+        matcher = TrackMatcher(source, target)
+
+        started = time.monotonic()
+        new_id, added, unmatched = transfer_playlist(
+            self.user, source, target, "p1", "Everything", matcher=matcher
+        )
+        elapsed = time.monotonic() - started
+
+        self.assertEqual((added, unmatched), (5000, []))
+        self.assertEqual(target.playlists[new_id]["tracks"], [f"t{n}" for n in range(5000)])
+        self.assertLess(matcher.comparisons, 2500 * 20)
+        self.assertLess(elapsed, 30)
+        self.assertEqual(TrackMatch.objects.filter(method=TrackMatch.Method.ISRC).count(), 2500)
+
+    def test_matches_are_cached_including_misses(self):
+        """Test that a second match is answered from TrackMatch without the target."""
+        source = FakeProvider("source", [track("s1", "Heroes", "Bowie"), track("s2", "Nope", "X")])
+        target = FakeProvider("target", [track("t1", "Heroes", "Bowie")])
+        tracks = list(source.tracks.values())
+
+        first = TrackMatcher(source, target).match(self.user, tracks)
+        target.calls.clear()
+        second = TrackMatcher(source, target).match(self.user, tracks)
+
+        self.assertEqual(first, second)
+        self.assertEqual(second["s1"][:2], ("t1", "fuzzy"))
+        self.assertIsNone(second["s2"][0])
+        self.assertEqual(target.calls, [])
+
+    def test_candidates_are_matched_without_search_hits(self):
+        """Test that tracks passed as candidates (e.g. the target library) are matched."""
+        source = FakeProvider("source")
+        target = FakeProvider("target")
+
+        matches = TrackMatcher(source, target).match(
+            self.user,
+            [track("s1", "Heroes", "Bowie")],
+            candidates=[track("lib1", "Heroes", "Bowie")],
+        )
+
+        self.assertEqual(matches["s1"][0], "lib1")
+
+    @override_settings(STREAMING_PROVIDERS={"fake": "providers.fake.FakeProvider"})
+    def test_registry(self):
+        """Test that providers are instantiated by their configured name."""
+        self.assertIsInstance(get_provider("fake"), FakeProvider)
+        with self.assertRaises(ValueError):
+            get_provider("tidal")
+
+
+class TidalProviderTestCase(TidalStubMixin, TestCase):
+    """Test cases for the Tidal implementation of the provider interface."""
+
+    def setUp(self):
+        super().setUp()
+        self.stub.add("GET", f"{API_URL}/tracks", self.serve_tracks)
+        self.stub.add("GET", f"{API_URL}/searchResults/", self.serve_search)
+        self.provider = TidalProvider(TidalAPIClient(transport=self.transport))
+
+    def serve_tracks(self, request):
+        query = parse_qs(urlsplit(request.url).query)
+        ids = query.get("filter[id]") or [isrc.lower() for isrc in query["filter[isrc]"]]
+        data = [
+            {"id": i, "type": "tracks", "attributes": {"title": f"Song {i}", "isrc": i.upper()}}
+            for i in ids
+        ]
+        return 200, {"data": data, "included": []}
+
+    def serve_search(self, request):
+        query = unquote(urlsplit(request.url).path.split("/")[-3])
+        return 200, {"data": [{"id": f"x{n}", "type": "tracks"} for n in range(len(query))]}
+
+    def test_lookup_isrcs_and_search(self):
+        """Test that ISRC lookups and search results come back as track dicts."""
+        self.assertEqual(self.provider.lookup_isrcs(self.user, ["AB1"])["AB1"]["id"], "ab1")
+
+        results = self.provider.search_tracks(self.user, ["abcdefgh"])
+
+        self.assertEqual([t["id"] for t in results["abcdefgh"]], ["x0", "x1", "x2", "x3", "x4"])
+        self.assertEqual(results["abcdefgh"][0]["title"], "Song x0")
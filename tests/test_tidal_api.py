@@ -0,0 +1,158 @@
+"""
+Tests for TidalAPIClient pagination and resolution helpers.
+"""
+
+import threading
+from urllib.parse import parse_qs, urlsplit
+
+from django.test import TestCase
+
+from tidal.api import MAX_FILTER_IDS, TidalAPIClient
+
+from .tidal_stubs import API_URL, TidalStubMixin, paginate
+
+
+def track_stubs(prefix, count):
+    return [{"id": f"{prefix}{i}", "type": "tracks"} for i in range(count)]
+
+
+class TidalPaginationTestCase(TidalStubMixin, TestCase):
+    """Test cases for walking paginated relationships."""
+
+    def setUp(self):
+        super().setUp()
+        self.api = TidalAPIClient(transport=self.transport)
+
+    def add_playlist(self, playlist_id, items):
+        path = f"/playlists/{playlist_id}/relationships/items"
+        self.stub.add("GET", f"{API_URL}{path}", paginate(path, items))
+
+    def test_iter_playlist_tracks_walks_every_page(self):
+        """Test that every page is fetched and items are yielded in order."""
+        items = track_stubs("t", 45)
+        self.add_playlist("p1", items)
+
+        self.assertEqual(list(self.api.iter_playlist_tracks(self.user, "p1")), items)
+        self.assertEqual(len(self.stub.calls), 3)
+
+    def test_next_page_is_prefetched(self):
+        """Test that page N+1 is requested before the consumer asks for it."""
+        path = "/playlists/p1/relationships/items"
+        serve = paginate(path, track_stubs("t", 40))
+        second_page_requested = threading.Event()
+
+        def handler(request):
+            if "cursor" in request.url:
+                second_page_requested.set()
+            return serve(request)
+
+        self.stub.add("GET", f"{API_URL}{path}", handler)
+
+        pages = self.api.iter_pages(self.user, f"{API_URL}{path}")
+        first_page = next(pages)
+
+        # The consumer is still holding page 1; page 2 must already be on its way
+        self.assertEqual(len(first_page), 20)
+        self.assertTrue(second_page_requested.wait(timeout=2))
+        self.assertEqual(len(next(pages)), 20)
+
+    def test_repeated_cursor_raises(self):
+        """Test that a server repeating its next cursor does not loop forever."""
+        path = "/playlists/p1/relationships/items"
+        self.stub.add(
+            "GET",
+            f"{API_URL}{path}",
+            lambda request: (200, {"data": [], "links": {"next": f"{path}?page[cursor]=x"}}),
+        )
+
+        with self.assertRaises(ValueError):
+            self.api.get_all_playlist_tracks(self.user, "p1")
+        with self.assertRaises(ValueError):
+            self.api.collect_playlists_tracks(self.user, ["p1"])
+        self.assertEqual(len(self.stub.calls), 4)
+
+    def test_collect_playlists_tracks(self):
+        """Test that several playlists are walked into a dict of ordered items."""
+        first, second = track_stubs("a", 30), track_stubs("b", 5)
+        self.add_playlist("p1", first)
+        self.add_playlist("p2", second)
+
+        tracks = self.api.collect_playlists_tracks(self.user, ["p1", "p2"])
+
+        self.assertEqual(tracks, {"p1": first, "p2": second})
+
+    def test_collect_playlists_tracks_runs_concurrently(self):
+        """Test that playlists are in flight at the same time rather than one after another."""
+        # Each first page waits for the other one; a serial walk would break the barrier
+        barrier = threading.Barrier(2, timeout=2)
+
+        for playlist_id in ("p1", "p2"):
+            path = f"/playlists/{playlist_id}/relationships/items"
+            serve = paginate(path, track_stubs(playlist_id, 3))
+
+            def handler(request, serve=serve):
+                barrier.wait()
+                return serve(request)
+
+            self.stub.add("GET", f"{API_URL}{path}", handler)
+
+        tracks = self.api.collect_playlists_tracks(self.user, ["p1", "p2"])
+
+        self.assertEqual(len(tracks["p1"]), 3)
+        self.assertEqual(len(tracks["p2"]), 3)
+
+
+class TidalResolveTracksTestCase(TidalStubMixin, TestCase):
+    """Test cases for batch track resolution."""
+
+    def setUp(self):
+        super().setUp()
+        self.api = TidalAPIClient(transport=self.transport)
+        self.queries = []
+        self.stub.add("GET", f"{API_URL}/tracks", self.serve_tracks)
+
+    def serve_tracks(self, request):
+        query = parse_qs(urlsplit(request.url).query)
+        self.queries.append(query)
+        data = [
+            {
+                "id": track_id,
+                "type": "tracks",
+                "attributes": {"title": f"Song {track_id}", "isrc": f"ISRC{track_id}"},
+                "relationships": {
+                    "artists": {"data": [{"id": "ar1", "type": "artists"}]},
+                    "albums": {"data": [{"id": "al1", "type": "albums"}]},
+                },
+            }
+            for track_id in query["filter[id]"]
+            if track_id != "missing"
+        ]
+        included = [
+            {"id": "ar1", "type": "artists", "attributes": {"name": "Band"}},
+            {"id": "al1", "type": "albums", "attributes": {"title": "Record"}},
+        ]
+        return 200, {"data": data, "included": included}
+
+    def test_resolve_tracks_batches_filter_ids(self):
+        """Test that ids are resolved in maximum-size batches with included relations."""
+        track_ids = [str(i) for i in range(MAX_FILTER_IDS * 2 + 5)] + ["missing"]
+
+        tracks = self.api.resolve_tracks(self.user, track_ids)
+
+        self.assertEqual(len(self.queries), 3)
+        self.assertTrue(all(len(q["filter[id]"]) <= MAX_FILTER_IDS for q in self.queries))
+        self.assertEqual(self.queries[0]["include"], ["artists", "albums"])
+        self.assertEqual(self.queries[0]["countryCode"], ["US"])
+        self.assertEqual(len(tracks), len(track_ids) - 1)
+        self.assertEqual(
+            tracks["3"],
+            {
+                "id": "3",
+                "title": "Song 3",
+                "isrc": "ISRC3",
+                "duration": None,
+                "explicit": False,
+                "artists": [{"id": "ar1", "name": "Band"}],
+                "album": {"id": "al1", "title": "Record", "release_date": None},
+            },
+        )
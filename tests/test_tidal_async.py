@@ -0,0 +1,234 @@
+"""
+Tests for AsyncTidalAPIClient and the async views.
+"""
+
+import asyncio
+import json
+from types import SimpleNamespace
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from tidal.api import TidalAPIClient
+from tidal.async_api import AsyncTidalAPIClient, get_async_client
+from tidal.ratelimit import RateLimitScheduler
+from tidal.sync import PlaylistSyncEngine
+
+from .tidal_stubs import API_URL, FakeLibrary, TidalStubMixin
+
+
+def mock_client(stub):
+    """
+    Returns an httpx.AsyncClient answering from the routes registered on a StubAdapter.
+    """
+
+    def handler(request):
+        shim = SimpleNamespace(
+            method=request.method,
+            url=str(request.url),
+            headers=request.headers,
+            body=request.content,
+        )
+        stub.calls.append((request.method, shim.url))
+        for method, url_prefix, route in stub.routes:
+            if request.method == method and shim.url.startswith(url_prefix):
+                status_code, body = route(shim)
+                return httpx.Response(status_code, json=body)
+        return httpx.Response(404, json={"errors": [{"detail": "No stub route"}]})
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+class AsyncTidalAPIClientTestCase(TidalStubMixin, TestCase):
+    """Test cases for the asyncio Tidal client."""
+
+    def setUp(self):
+        super().setUp()
+        self.library = FakeLibrary(
+            self.stub,
+            {
+                "p1": {"name": "Long", "tracks": [f"t{i}" for i in range(45)]},
+                "p2": {"name": "Short", "tracks": ["t1", "t2"]},
+            },
+        )
+        self.api = AsyncTidalAPIClient(
+            client=mock_client(self.stub), scheduler=RateLimitScheduler(max_retries=0)
+        )
+
+    async def test_get_all_playlist_tracks_walks_every_page(self):
+        """Test that every page is fetched and items come back in order."""
+        items = await self.api.get_all_playlist_tracks(self.user, "p1")
+
+        self.assertEqual([item["id"] for item in items], [f"t{i}" for i in range(45)])
+        self.assertEqual(len(self.stub.calls), 3)
+
+    async def test_collect_playlists_tracks(self):
+        """Test that several playlists are walked concurrently into one dict."""
+        results = await self.api.collect_playlists_tracks(self.user, ["p1", "p2"], max_workers=2)
+
+        self.assertEqual(len(results["p1"]), 45)
+        self.assertEqual([item["id"] for item in results["p2"]], ["t1", "t2"])
+
+    async def test_resolve_tracks_batches_ids(self):
+        """Test that track ids are resolved in filter batches with artists and album."""
+        track_ids = [f"t{i}" for i in range(25)]
+
+        tracks = await self.api.resolve_tracks(self.user, track_ids)
+
+        self.assertEqual(set(tracks), set(track_ids))
+        self.assertEqual(tracks["t3"]["artists"], [{"id": "ar1", "name": "Band"}])
+        self.assertEqual(len([call for call in self.stub.calls if "/tracks" in call[1]]), 2)
+
+    async def test_resolve_isrcs(self):
+        """Test that ISRCs are looked up with the isrc filter and keyed by ISRC."""
+        self.stub.routes.insert(0, ("GET", f"{API_URL}/tracks", self.serve_isrcs))
+
+        found = await self.api.resolve_isrcs(self.user, ["isrct1", "ISRCT2"])
+
+        self.assertEqual({isrc: track["id"] for isrc, track in found.items()}, {"ISRCT1": "t1"})
+        self.assertIn("filter%5Bisrc%5D", self.stub.calls[-1][1])
+
+    def serve_isrcs(self, request):
+        query = parse_qs(urlsplit(request.url).query)
+        data = [
+            {"id": "t1", "type": "tracks", "attributes": {"title": "Song t1", "isrc": "ISRCT1"}}
+            for isrc in query["filter[isrc]"]
+            if isrc.upper() == "ISRCT1"
+        ]
+        return 200, {"data": data}
+
+    async def test_search_tracks_runs_queries_concurrently(self):
+        """Test that each distinct query is searched once and answered with its track ids."""
+        self.stub.add(
+            "GET",
+            f"{API_URL}/searchResults/",
+            lambda request: (200, {"data": [{"id": "t9", "type": "tracks"}]}),
+        )
+
+        results = await self.api.search_tracks(self.user, ["Band Song", "Other", "Band Song"])
+
+        self.assertEqual(results, {"Band Song": ["t9"], "Other": ["t9"]})
+        self.assertEqual(len(self.stub.calls), 2)
+
+    async def test_create_playlist_and_write_items(self):
+        """Test that a playlist is created and items are added, moved and removed in batches."""
+        bodies = []
+
+        def record(request):
+            bodies.append((request.method, json.loads(request.body)))
+            return 201, {}
+
+        self.stub.add("POST", f"{API_URL}/playlists/", record)
+        self.stub.add("PATCH", f"{API_URL}/playlists/", record)
+        self.stub.add("DELETE", f"{API_URL}/playlists/", record)
+        self.stub.add(
+            "POST", f"{API_URL}/playlists", lambda request: (201, {"data": {"id": "new"}})
+        )
+
+        playlist_id = await self.api.create_playlist(self.user, "Fresh")
+        added = await self.api.add_playlist_items(
+            self.user, playlist_id, [str(i) for i in range(25)]
+        )
+        moved = await self.api.move_playlist_items(
+            self.user, playlist_id, [("i1", "1")], position_before="i0"
+        )
+        removed = await self.api.remove_playlist_items(self.user, playlist_id, [("i2", "2")])
+
+        self.assertEqual((playlist_id, added, moved, removed), ("new", 25, 1, 1))
+        self.assertEqual([method for method, _ in bodies], ["POST", "POST", "PATCH", "DELETE"])
+        self.assertEqual([len(body["data"]) for _, body in bodies], [20, 5, 1, 1])
+        self.assertEqual(bodies[2][1]["meta"], {"positionBefore": "i0"})
+        self.assertEqual(bodies[3][1]["data"][0]["meta"], {"itemId": "i2"})
+
+    async def test_one_pooled_client_per_event_loop(self):
+        """Test that get_async_client reuses its client within a loop."""
+        self.assertIs(get_async_client(), get_async_client())
+
+
+class AsyncViewsTestCase(TidalStubMixin, TestCase):
+    """Test cases for the async playlist views."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.library = FakeLibrary(self.stub, {"p1": {"name": "Road Trip", "tracks": ["t1", "t2"]}})
+        patcher = mock.patch(
+            "tidal.async_api.get_async_client", side_effect=lambda: mock_client(self.stub)
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_playlist_tracks_renders(self):
+        """Test that details and tracks are fetched and rendered by the async view."""
+        await self.async_client.aforce_login(self.user)
+
+        response = await self.async_client.get(reverse("tidal:async_playlist_tracks", args=["p1"]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Road Trip")
+        self.assertContains(response, "Song t2")
+
+    async def test_details_and_tracks_fetched_concurrently(self):
+        """Test that the playlist and its items are requested before either completes."""
+        started = []
+        both_started = asyncio.Event()
+
+        async def fetch(name, result):
+            started.append(name)
+            if len(started) == 2:
+                both_started.set()
+            await asyncio.wait_for(both_started.wait(), timeout=2)
+            return result
+
+        with (
+            mock.patch("tidal.views.afetch_playlist", lambda user, pid: fetch("details", {})),
+            mock.patch(
+                "tidal.views.afetch_track_page", lambda user, pid: fetch("tracks", ([], None))
+            ),
+        ):
+            await self.async_client.aforce_login(self.user)
+            response = await self.async_client.get(
+                reverse("tidal:async_playlist_tracks", args=["p1"])
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertCountEqual(started, ["details", "tracks"])
+
+    async def test_unsynced_playlist_fetches_only_the_first_page(self):
+        """Test that a long unsynced playlist only fetches the Tidal pages of its first page."""
+        self.library.playlists["long"] = {"name": "Long", "tracks": [str(i) for i in range(200)]}
+        await self.async_client.aforce_login(self.user)
+
+        response = await self.async_client.get(
+            reverse("tidal:async_playlist_tracks", args=["long"])
+        )
+
+        item_pages = [url for _, url in self.stub.calls if "/relationships/items" in url]
+        self.assertEqual(len(item_pages), 3)
+        self.assertEqual(len(response.context["tracks"]), 50)
+        self.assertContains(response, "skip=10")
+
+    async def test_synced_playlist_is_read_from_the_database(self):
+        """Test that a synced playlist renders with the keyset page and without Tidal."""
+        engine = PlaylistSyncEngine(TidalAPIClient(transport=self.transport))
+        await sync_to_async(engine.sync_user)(self.user)
+        self.stub.calls.clear()
+        await self.async_client.aforce_login(self.user)
+
+        response = await self.async_client.get(reverse("tidal:async_playlist_tracks", args=["p1"]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.stub.calls, [])
+        self.assertContains(response, "Song t2")
+        self.assertContains(response, "data-edits-url")
+
+    async def test_anonymous_user_is_redirected_to_login(self):
+        """Test that the async views require authentication."""
+        response = await self.async_client.get(reverse("tidal:async_tidal_playlists"))
+
+        self.assertEqual(response.status_code, 302)
@@ -0,0 +1,81 @@
+"""
+Tests for the read-through cache and the views served from it.
+"""
+
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from tidal.cache import ReadThroughCache
+from tidal.http import set_transport
+
+from .tidal_stubs import FakeLibrary, TidalStubMixin
+
+
+class ReadThroughCacheTestCase(TidalStubMixin, TestCase):
+    """Test cases for ReadThroughCache."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.cache = ReadThroughCache(ttls={"playlists": (60, 600)})
+        self.fetch = mock.Mock(side_effect=["first", "second"])
+
+    def test_fresh_value_is_served_from_cache(self):
+        """Test that a fresh value is fetched once."""
+        self.assertEqual(self.cache.get_or_fetch(self.user, "playlists", self.fetch), "first")
+        self.assertEqual(self.cache.get_or_fetch(self.user, "playlists", self.fetch), "first")
+        self.assertEqual(self.fetch.call_count, 1)
+
+    def test_stale_value_is_served_while_refreshing(self):
+        """Test that a stale value is returned immediately and refreshed in the background."""
+        self.cache.get_or_fetch(self.user, "playlists", self.fetch)
+
+        with mock.patch("tidal.cache.time.time", return_value=time.time() + 120):
+            self.assertEqual(self.cache.get_or_fetch(self.user, "playlists", self.fetch), "first")
+
+        for _ in range(100):
+            if self.cache.get_or_fetch(self.user, "playlists", self.fetch) == "second":
+                break
+            time.sleep(0.01)
+        self.assertEqual(self.cache.get_or_fetch(self.user, "playlists", self.fetch), "second")
+        self.assertEqual(self.fetch.call_count, 2)
+
+    def test_invalidate(self):
+        """Test that invalidation makes the next read fetch again."""
+        self.cache.get_or_fetch(self.user, "playlists", self.fetch)
+        self.cache.invalidate(self.user, "playlists")
+
+        self.assertEqual(self.cache.get_or_fetch(self.user, "playlists", self.fetch), "second")
+
+
+class CachedPlaylistViewsTestCase(TidalStubMixin, TestCase):
+    """Test cases for the playlist views reading through the cache."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        FakeLibrary(self.stub, {"p1": {"name": "Road Trip", "tracks": ["1", "2"]}})
+        previous = set_transport(self.transport)
+        self.addCleanup(set_transport, previous)
+        self.client.force_login(self.user)
+
+    def test_repeat_navigation_does_not_call_tidal(self):
+        """Test that the second render of each page makes no upstream calls."""
+        for url in (
+            reverse("tidal:tidal_playlists"),
+            reverse("tidal:playlist_tracks", args=["p1"]),
+        ):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            calls = len(self.stub.calls)
+
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(self.stub.calls), calls)
+
+        self.assertContains(response, "Song 2")
+        self.assertContains(response, "Road Trip")
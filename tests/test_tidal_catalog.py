@@ -0,0 +1,91 @@
+"""
+Tests for the shared track catalog.
+"""
+
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+
+from tidal.api import TidalAPIClient
+from tidal.catalog import TrackCatalog
+from tidal.models import CatalogEntry, TidalToken
+
+from .tidal_stubs import FakeLibrary, TidalStubMixin
+
+
+class TrackCatalogTestCase(TidalStubMixin, TestCase):
+    """Test cases for TrackCatalog."""
+
+    def setUp(self):
+        super().setUp()
+        FakeLibrary(self.stub, {})
+        self.api = TidalAPIClient(transport=self.transport)
+        self.catalog = TrackCatalog()
+
+    def track_calls(self):
+        return [url for _, url in self.stub.calls if "/tracks?" in url]
+
+    def add_user(self, username, country):
+        user = User.objects.create(username=username)
+        TidalToken.objects.create(
+            user=user,
+            access_token=f"{username}-token",
+            refresh_token="refresh-token",
+            expires_at=timezone.now() + timedelta(hours=1),
+            tidal_user_id=username,
+            tidal_country=country,
+        )
+        return user
+
+    def test_second_user_is_served_from_the_catalog(self):
+        """Test that tracks resolved for one user are reused for another in the same country."""
+        first = self.catalog.get_tracks(self.user, self.api, ["1", "2"])
+        second = self.catalog.get_tracks(self.add_user("neighbour", "US"), self.api, ["2", "1"])
+
+        self.assertEqual(first, second)
+        self.assertEqual(second["1"]["artists"], [{"id": "ar1", "name": "Band"}])
+        self.assertEqual(len(self.track_calls()), 1)
+        self.assertEqual(
+            CatalogEntry.objects.filter(kind=CatalogEntry.Kind.ARTIST, country="").count(), 1
+        )
+
+    def test_only_missing_ids_are_fetched(self):
+        """Test that a partial hit only sends the missing ids upstream."""
+        self.catalog.get_tracks(self.user, self.api, ["1"])
+
+        tracks = self.catalog.get_tracks(self.user, self.api, ["1", "2"])
+
+        self.assertEqual(set(tracks), {"1", "2"})
+        self.assertIn("filter%5Bid%5D=2", self.track_calls()[-1])
+        self.assertNotIn("filter%5Bid%5D=1", self.track_calls()[-1])
+
+    def test_tracks_are_partitioned_by_country(self):
+        """Test that another country does not reuse the entries."""
+        self.catalog.get_tracks(self.user, self.api, ["1"])
+        self.catalog.get_tracks(self.add_user("traveller", "DE"), self.api, ["1"])
+
+        self.assertEqual(len(self.track_calls()), 2)
+        self.assertIn("countryCode=DE", self.track_calls()[-1])
+
+    def test_expired_entries_are_refetched(self):
+        """Test that entries older than the TTL are fetched again and refreshed."""
+        self.catalog.get_tracks(self.user, self.api, ["1"])
+        CatalogEntry.objects.update(fetched_at=timezone.now() - timedelta(days=30))
+
+        TrackCatalog(ttl=timedelta(days=1)).get_tracks(self.user, self.api, ["1"])
+
+        self.assertEqual(len(self.track_calls()), 2)
+        entry = CatalogEntry.objects.get(kind=CatalogEntry.Kind.TRACK, tidal_id="1")
+        self.assertGreater(entry.fetched_at, timezone.now() - timedelta(minutes=1))
+
+    def test_lookup_by_isrc(self):
+        """Test that stored tracks can be found by ISRC in bulk."""
+        self.catalog.get_tracks(self.user, self.api, ["1", "2"])
+
+        found = self.catalog.lookup_isrcs(["ISRC2", "ISRC9"], "US")
+
+        self.assertEqual(list(found), ["ISRC2"])
+        self.assertEqual(found["ISRC2"]["id"], "2")
+        self.assertEqual(self.catalog.lookup_isrcs(["ISRC2"], "DE"), {})
@@ -0,0 +1,222 @@
+"""
+Tests for queued, coalesced playlist edits written back to Tidal.
+"""
+
+import itertools
+import json
+import random
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+from urllib.parse import urlsplit
+
+from django.test import TestCase
+from django.urls import reverse
+
+from tidal import edits
+from tidal.api import TidalAPIClient
+from tidal.models import Playlist, PlaylistEditQueue
+from tidal.sync import PlaylistSyncEngine
+
+from .tidal_stubs import API_URL, FakeLibrary, TidalStubMixin, paginate
+
+
+class EditableLibrary(FakeLibrary):
+    """
+    FakeLibrary whose playlist items have stable item ids and accept Tidal's
+    relationship writes: POST adds, PATCH moves and DELETE removes items, each
+    before meta.positionBefore or at the end.
+    """
+
+    def __init__(self, stub, playlists, user_id="42"):
+        super().__init__(stub, playlists, user_id)
+        self.ids = itertools.count(1)
+        self.items = {
+            playlist_id: [[f"i{next(self.ids)}", track_id] for track_id in playlist["tracks"]]
+            for playlist_id, playlist in playlists.items()
+        }
+        self.writes = []
+        for method in ("POST", "PATCH", "DELETE"):
+            stub.add(method, f"{API_URL}/playlists/", self.serve_write)
+
+    def serve_items(self, request):
+        playlist_id = urlsplit(request.url).path.split("/")[-3]
+        path = f"/playlists/{playlist_id}/relationships/items"
+        items = [
+            {"id": track_id, "type": "tracks", "meta": {"itemId": item_id}}
+            for item_id, track_id in self.items[playlist_id]
+        ]
+        return paginate(path, items)(request)
+
+    def serve_write(self, request):
+        playlist_id = urlsplit(request.url).path.split("/")[-3]
+        body = json.loads(request.body)
+        self.writes.append((request.method, len(body["data"])))
+        items = self.items[playlist_id]
+
+        if request.method == "POST":
+            entries = [[f"i{next(self.ids)}", entry["id"]] for entry in body["data"]]
+        else:
+            ids = {entry["meta"]["itemId"] for entry in body["data"]}
+            by_id = {item[0]: item for item in items}
+            entries = [by_id[entry["meta"]["itemId"]] for entry in body["data"]]
+            items[:] = [item for item in items if item[0] not in ids]
+
+        if request.method != "DELETE":
+            anchor = body.get("meta", {}).get("positionBefore")
+            index = [item[0] for item in items].index(anchor) if anchor else len(items)
+            items[index:index] = entries
+        self.touch(playlist_id)
+        return 201 if request.method == "POST" else 204, ""
+
+    def touch(self, playlist_id):
+        playlist = self.playlists[playlist_id]
+        playlist["tracks"] = [track_id for _, track_id in self.items[playlist_id]]
+        modified = datetime.fromisoformat(playlist["modified"]) + timedelta(minutes=1)
+        playlist["modified"] = modified.isoformat()
+
+
+class PlanEditsTestCase(TestCase):
+    """Test cases for turning two orders into a minimal write plan."""
+
+    base = [("a", "1"), ("b", "2"), ("c", "3"), ("d", "4")]
+
+    def test_single_move_is_one_write(self):
+        """Test that moving one item keeps every other item in place."""
+        current = [("b", "2"), ("c", "3"), ("a", "1"), ("d", "4")]
+
+        plan = edits.plan_edits(self.base, current)
+
+        self.assertEqual(plan, {"remove": [], "move": [("d", [("a", "1")])], "add": []})
+
+    def test_adds_and_removes_are_anchored(self):
+        """Test that removed items are deleted and new runs go before their successor."""
+        current = [("a", "1"), (None, "9"), (None, "8"), ("c", "3"), (None, "7")]
+
+        plan = edits.plan_edits(self.base, current)
+
+        self.assertEqual(plan["remove"], [("b", "2"), ("d", "4")])
+        self.assertEqual(plan["move"], [])
+        self.assertEqual(plan["add"], [("c", ["9", "8"]), (None, ["7"])])
+
+    def test_longest_increasing_run(self):
+        """Test that the longest run in base order is found."""
+        values = [3, 1, 2, 8, 4, 5, 0]
+
+        self.assertEqual([values[i] for i in edits.longest_increasing_run(values)], [1, 2, 4, 5])
+
+
+class PlaylistEditsTestCase(TidalStubMixin, TestCase):
+    """Test cases for applying edits locally and flushing them to Tidal."""
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch("tidal.tasks.schedule_edit_flush")
+        self.schedule_edit_flush = patcher.start()
+        self.addCleanup(patcher.stop)
+        tracks = [str(n) for n in range(1, 61)]
+        self.library = EditableLibrary(
+            self.stub,
+            {"p1": {"name": "Mix", "tracks": tracks, "modified": "2024-01-01T00:00:00+00:00"}},
+        )
+        self.api_client = TidalAPIClient(transport=self.transport)
+        PlaylistSyncEngine(self.api_client).sync_user(self.user)
+        self.playlist = Playlist.objects.get(tidal_id="p1")
+
+    def local_order(self):
+        return list(
+            self.playlist.items.order_by("position").values_list("song__tidal_id", flat=True)
+        )
+
+    def pks(self):
+        return list(self.playlist.items.order_by("position").values_list("pk", flat=True))
+
+    def test_burst_of_moves_is_flushed_as_one_diff(self):
+        """Test that many drops collapse into a few batched writes matching the local order."""
+        rng = random.Random(3)
+        pks = self.pks()
+        for revision in range(200):
+            op = {"op": "move", "item": rng.choice(pks[:10]), "to": rng.randrange(10)}
+            edits.apply_edits(self.user, self.playlist, [op], base_revision=revision)
+        edits.apply_edits(
+            self.user,
+            self.playlist,
+            [{"op": "add", "track": "5", "to": 0}, {"op": "remove", "item": pks[-1]}],
+        )
+
+        result = edits.EditFlusher(self.api_client).flush(self.playlist.pk, force=True)
+
+        self.assertEqual(result, "flushed")
+        self.assertEqual(self.library.playlists["p1"]["tracks"], self.local_order())
+        self.assertLessEqual(len(self.library.writes), 12)
+        self.assertFalse(PlaylistEditQueue.objects.exists())
+        self.assertFalse(self.playlist.items.filter(item_id__isnull=True).exists())
+        self.playlist.refresh_from_db()
+        self.assertEqual(self.playlist.revision, 201)
+
+    def test_flush_waits_for_debounce(self):
+        """Test that edits are not written before they are due."""
+        edits.apply_edits(self.user, self.playlist, [{"op": "remove", "item": self.pks()[0]}])
+
+        self.assertIsNone(edits.EditFlusher(self.api_client).flush(self.playlist.pk))
+        self.assertEqual(self.library.writes, [])
+        PlaylistEditQueue.objects.update(due_at=datetime.now(timezone.utc))
+        self.assertEqual(edits.flush_due_edits(self.api_client), 1)
+        self.assertEqual(self.library.writes, [("DELETE", 1)])
+
+    def test_stale_revision_is_rejected(self):
+        """Test that edits based on an old revision raise a conflict and change nothing."""
+        edits.apply_edits(self.user, self.playlist, [{"op": "remove", "item": self.pks()[0]}])
+        order = self.local_order()
+
+        with self.assertRaises(edits.EditConflict) as conflict:
+            edits.apply_edits(
+                self.user, self.playlist, [{"op": "remove", "item": self.pks()[0]}], 0
+            )
+
+        self.assertEqual(conflict.exception.revision, 1)
+        self.assertEqual(self.local_order(), order)
+
+    def test_upstream_change_drops_local_edits(self):
+        """Test that edits are discarded and the playlist re-synced when Tidal changed."""
+        edits.apply_edits(self.user, self.playlist, [{"op": "remove", "item": self.pks()[0]}])
+        self.library.items["p1"].reverse()
+        self.library.touch("p1")
+
+        result = edits.EditFlusher(self.api_client).flush(self.playlist.pk, force=True)
+
+        self.assertEqual(result, "conflict")
+        self.assertEqual(self.library.writes, [])
+        self.assertEqual(self.local_order(), [str(n) for n in range(60, 0, -1)])
+        self.playlist.refresh_from_db()
+        self.assertEqual(self.playlist.revision, 2)
+
+    def test_sync_skips_playlists_with_queued_edits(self):
+        """Test that a background sync does not undo edits waiting to be written."""
+        edits.apply_edits(self.user, self.playlist, [{"op": "remove", "item": self.pks()[0]}])
+        self.library.touch("p1")
+
+        self.assertEqual(PlaylistSyncEngine(self.api_client).sync_user(self.user), 0)
+        self.assertEqual(len(self.local_order()), 59)
+
+    def test_edits_endpoint(self):
+        """Test that the endpoint applies edits, schedules a flush and reports conflicts."""
+        self.client.force_login(self.user)
+        url = reverse("tidal:playlist_edits", args=["p1"])
+        ops = [{"op": "move", "item": self.pks()[0], "to": 59}]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                url, {"revision": 0, "ops": ops}, content_type="application/json"
+            )
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()["revision"], 1)
+        self.schedule_edit_flush.assert_called_once()
+        self.assertEqual(self.local_order()[-1], "1")
+        stale = self.client.post(url, {"revision": 0, "ops": ops}, content_type="application/json")
+        self.assertEqual((stale.status_code, stale.json()["revision"]), (409, 1))
+        bad = self.client.post(
+            url, {"revision": 1, "ops": [{"op": "jump"}]}, content_type="application/json"
+        )
+        self.assertEqual(bad.status_code, 400)
+        self.assertEqual(self.client.get(url).json()["pending"], True)
@@ -0,0 +1,137 @@
+"""
+Tests for streaming playlist exports.
+"""
+
+import csv
+import io
+import json
+import os
+import tempfile
+import zipfile
+from xml.etree import ElementTree
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from tidal import export
+from tidal.api import TidalAPIClient
+from tidal.models import Playlist
+from tidal.sync import PlaylistSyncEngine
+
+from .tidal_stubs import FakeLibrary, TidalStubMixin
+
+
+class PlaylistExportTestCase(TidalStubMixin, TestCase):
+    """Test cases for the export formats, endpoints and command."""
+
+    def setUp(self):
+        super().setUp()
+        FakeLibrary(
+            self.stub,
+            {
+                "p1": {"name": "Road & Trip", "tracks": [str(i) for i in range(30)]},
+                "p2": {"name": "Chill", "tracks": ["3", "30"]},
+            },
+        )
+        PlaylistSyncEngine(TidalAPIClient(transport=self.transport)).sync_user(self.user)
+        self.playlist = Playlist.objects.get(owner=self.user, tidal_id="p1")
+        self.client.force_login(self.user)
+
+    def download(self, fmt):
+        response = self.client.get(reverse("tidal:export_playlist", args=["p1", fmt]))
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode()
+
+    def test_csv(self):
+        """Test that the CSV has a header and one row per track in order."""
+        rows = list(csv.DictReader(io.StringIO(self.download("csv"))))
+
+        self.assertEqual(len(rows), 30)
+        self.assertEqual(rows[0]["title"], "Song 0")
+        self.assertEqual(rows[0]["artists"], "Band")
+        self.assertEqual(rows[29]["position"], "30")
+        self.assertEqual(rows[0]["duration"], "200")
+
+    def test_jsonl(self):
+        """Test that every line is a JSON object for one track."""
+        lines = [json.loads(line) for line in self.download("jsonl").splitlines()]
+
+        self.assertEqual([line["tidal_id"] for line in lines], [str(i) for i in range(30)])
+        self.assertEqual(lines[0]["playlist"], "p1")
+
+    def test_m3u8(self):
+        """Test that the playlist has EXTINF entries followed by track URLs."""
+        lines = self.download("m3u8").splitlines()
+
+        self.assertEqual(lines[:2], ["#EXTM3U", "#PLAYLIST:Road & Trip"])
+        self.assertEqual(lines[2], "#EXTINF:200,Band - Song 0")
+        self.assertEqual(lines[3], "https://tidal.com/browse/track/0")
+
+    def test_xspf(self):
+        """Test that the XSPF is well-formed XML with escaped names."""
+        root = ElementTree.fromstring(self.download("xspf"))
+        ns = {"x": "http://xspf.org/ns/0/"}
+
+        self.assertEqual(root.find("x:title", ns).text, "Road & Trip")
+        tracks = root.findall("x:trackList/x:track", ns)
+        self.assertEqual(len(tracks), 30)
+        self.assertEqual(tracks[0].find("x:duration", ns).text, "200000")
+
+    def test_rows_are_read_in_chunks(self):
+        """Test that tracks are read with a chunked iterator instead of loaded at once."""
+        # One cursor over the items, plus one artist prefetch per chunk of 10
+        with self.assertNumQueries(4):
+            tracks = list(export.iter_tracks(self.playlist, chunk_size=10))
+
+        self.assertEqual(len(tracks), 30)
+
+    def test_unknown_format_and_foreign_playlist(self):
+        """Test that unknown formats and other users' playlists are not found."""
+        self.assertEqual(
+            self.client.get(reverse("tidal:export_playlist", args=["p1", "pdf"])).status_code, 404
+        )
+        self.assertEqual(
+            self.client.get(reverse("tidal:export_playlist", args=["nope", "csv"])).status_code,
+            404,
+        )
+
+    def test_playlist_not_completely_synced_is_a_conflict(self):
+        """Test that a playlist still syncing or failed is not exported, alone or in the ZIP."""
+        Playlist.objects.filter(tidal_id="p2").update(sync_status=Playlist.SyncStatus.IN_PROGRESS)
+
+        response = self.client.get(reverse("tidal:export_playlist", args=["p2", "csv"]))
+        archive = zipfile.ZipFile(
+            io.BytesIO(b"".join(self.client.get(reverse("tidal:export_library")).streaming_content))
+        )
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["sync_status"], "in_progress")
+        self.assertEqual(archive.namelist(), ["Road Trip (p1).csv"])
+
+    def test_library_zip(self):
+        """Test that the library ZIP is streamed and holds one file per playlist."""
+        response = self.client.get(reverse("tidal:export_library"), {"format": "m3u8"})
+
+        self.assertTrue(response.streaming)
+        archive = zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content)))
+        self.assertEqual(archive.namelist(), ["Chill (p2).m3u8", "Road Trip (p1).m3u8"])
+        self.assertIn(b"#EXTINF:200,Band - Song 30", archive.read("Chill (p2).m3u8"))
+
+    def test_management_command(self):
+        """Test that the command writes an export file."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "p1.jsonl")
+            call_command(
+                "export_playlists",
+                "listener",
+                "--playlist",
+                "p1",
+                "--format",
+                "jsonl",
+                "-o",
+                path,
+                stdout=io.StringIO(),
+            )
+            with open(path) as output:
+                self.assertEqual(len(output.readlines()), 30)
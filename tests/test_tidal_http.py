@@ -0,0 +1,183 @@
+"""
+Tests for the shared Tidal HTTP transport.
+"""
+
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import TestCase
+
+from tidal.api import TidalAPIClient, TidalOAuthManager, TidalTokenManager
+from tidal.http import TidalTransport, get_transport, set_transport
+
+from .tidal_stubs import API_URL, AUTH_URL, TidalStubMixin
+
+
+class TidalTransportTestCase(TidalStubMixin, TestCase):
+    """Test cases for TidalTransport and the clients using it."""
+
+    def test_get_transport_is_shared(self):
+        """Test that the process-wide transport is created once and can be swapped."""
+        self.assertIs(get_transport(), get_transport())
+
+        previous = set_transport(self.transport)
+        try:
+            self.assertIs(TidalAPIClient().transport, self.transport)
+            self.assertIs(TidalOAuthManager().transport, self.transport)
+        finally:
+            set_transport(previous)
+
+    def test_pool_size_and_timeouts_from_arguments(self):
+        """Test that constructor arguments reach the adapter and the request timeout."""
+        transport = TidalTransport(pool_size=7, connect_timeout=2, read_timeout=9)
+
+        self.assertEqual(transport.session.get_adapter("https://x.test")._pool_maxsize, 7)
+        self.assertEqual(transport.timeout, (2, 9))
+
+    def test_pool_size_and_timeouts_from_env(self):
+        """Test that the TIDAL_HTTP_* environment variables configure the transport."""
+        env = {
+            "TIDAL_HTTP_POOL_SIZE": "13",
+            "TIDAL_HTTP_CONNECT_TIMEOUT": "1.25",
+            "TIDAL_HTTP_READ_TIMEOUT": "30",
+        }
+        with mock.patch.dict("os.environ", env):
+            transport = TidalTransport()
+
+        self.assertEqual(transport.session.get_adapter("https://x.test")._pool_maxsize, 13)
+        self.assertEqual(transport.timeout, (1.25, 30.0))
+
+    def test_api_client_uses_transport(self):
+        """Test that API calls go through the mounted adapter with the default timeout."""
+        self.stub.add(
+            "GET",
+            f"{API_URL}/playlists/abc",
+            lambda request: (200, {"data": {"id": "abc", "attributes": {"name": "Road Trip"}}}),
+        )
+
+        client = TidalAPIClient(transport=self.transport)
+        playlist_id, name = client.get_playlist_details(self.user, "abc")
+
+        self.assertEqual((playlist_id, name), ("abc", "Road Trip"))
+        self.assertEqual(self.stub.calls, [("GET", f"{API_URL}/playlists/abc")])
+        self.assertEqual(self.stub.timeouts, [(1.5, 7)])
+        self.assertIs(client.token_manager.transport, self.transport)
+
+    def test_accept_header_only_on_api_calls(self):
+        """Test that JSON:API Accept is sent to the API but not to the token endpoint."""
+        seen = {}
+
+        def capture(name, status_code, body):
+            def handler(request):
+                seen[name] = request.headers.get("Accept")
+                return status_code, body
+
+            return handler
+
+        self.stub.add("GET", f"{API_URL}/playlists/abc", capture("api", 200, {"data": {}}))
+        self.stub.add(
+            "POST",
+            AUTH_URL,
+            capture(
+                "auth",
+                200,
+                {"access_token": "app-token", "token_type": "Bearer", "expires_in": 3600},
+            ),
+        )
+
+        TidalAPIClient(transport=self.transport).get_playlist_details(self.user, "abc")
+        TidalTokenManager(transport=self.transport).get_token()
+
+        self.assertEqual(seen["api"], "application/vnd.api+json")
+        self.assertEqual(seen["auth"], "*/*")
+
+    def test_app_token_uses_transport(self):
+        """Test that the client credentials grant goes through the transport."""
+        self.stub.add(
+            "POST",
+            AUTH_URL,
+            lambda request: (
+                200,
+                {"access_token": "app-token", "token_type": "Bearer", "expires_in": 3600},
+            ),
+        )
+
+        token_manager = TidalTokenManager(transport=self.transport)
+
+        self.assertEqual(token_manager.get_token(), "Bearer app-token")
+        self.assertEqual(self.stub.calls, [("POST", AUTH_URL)])
+
+
+class HTTPCacheTestCase(TidalStubMixin, TestCase):
+    """Test cases for the transport's HTTP cache of GET responses."""
+
+    url = f"{API_URL}/playlists/abc"
+
+    def setUp(self):
+        super().setUp()
+        caches["tidal_http"].clear()
+        self.requests = []
+
+    def serve(self, cache_control="private, no-cache"):
+        def handler(request):
+            self.requests.append(request.headers.copy())
+            headers = {"ETag": '"v1"', "Cache-Control": cache_control}
+            if request.headers.get("If-None-Match") == '"v1"':
+                return self.stub.build_response(request, 304, b"", headers)
+            body = {"data": {"id": "abc", "attributes": {"name": "Road Trip"}}}
+            return self.stub.build_response(request, 200, body, headers)
+
+        self.stub.add("GET", self.url, handler)
+
+    def get(self, rate_key="user:1"):
+        response = self.transport.get(self.url, headers={"Authorization": "x"}, rate_key=rate_key)
+        self.assertEqual(response.status_code, 200)
+        return response.json()["data"]["attributes"]["name"]
+
+    def test_not_modified_is_served_from_cache(self):
+        """Test that stored responses are revalidated and a 304 returns the stored body."""
+        self.serve()
+
+        self.assertEqual(self.get(), "Road Trip")
+        self.assertEqual(self.get(), "Road Trip")
+
+        self.assertEqual(len(self.requests), 2)
+        self.assertNotIn("If-None-Match", self.requests[0])
+        self.assertEqual(self.requests[1]["If-None-Match"], '"v1"')
+
+    def test_fresh_response_is_not_requested(self):
+        """Test that within max-age no request is sent, and other users do not share it."""
+        self.serve("private, max-age=60")
+
+        self.get()
+        self.get()
+        self.assertEqual(len(self.requests), 1)
+
+        self.get(rate_key="user:2")
+        self.assertEqual(len(self.requests), 2)
+
+    def test_write_makes_the_user_revalidate(self):
+        """Test that a user's write makes their fresh responses revalidate."""
+        self.serve("private, max-age=60")
+        self.stub.add("POST", f"{API_URL}/playlists", lambda request: (201, {"data": {}}))
+
+        self.get()
+        self.transport.post(f"{API_URL}/playlists", json={}, rate_key="user:1")
+        self.get()
+
+        self.assertEqual(len(self.requests), 2)
+        self.assertEqual(self.requests[1]["If-None-Match"], '"v1"')
+
+    def test_no_store_is_not_cached(self):
+        """Test that no-store responses are always fetched in full."""
+        self.serve("no-store")
+
+        self.get()
+        self.get()
+
+        self.assertNotIn("If-None-Match", self.requests[1])
+
+    def test_cache_can_be_turned_off(self):
+        """Test that TIDAL_HTTP_CACHE=False leaves requests alone."""
+        with mock.patch.dict("os.environ", {"TIDAL_HTTP_CACHE": "False"}):
+            self.assertIsNone(TidalTransport().http_cache)
@@ -0,0 +1,225 @@
+"""
+Tests for importing CSV, M3U and JSON playlists into Tidal.
+"""
+
+import io
+import json
+import shutil
+import tempfile
+from unittest import mock
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from tidal import importer
+from tidal.api import TidalAPIClient
+from tidal.models import CatalogEntry, ImportJob, TrackResolution
+
+from .tidal_stubs import API_URL, TidalStubMixin
+
+# ISRC -> track id of the fake catalog; searches for "Band Song <id>" find <id>
+CATALOG = {f"ISRC{n}": str(n) for n in range(1, 60)}
+
+# Titles of catalog tracks other than "Song <id>"
+TITLES = {"66": "Something Else Entirely"}
+
+
+class ImportParserTestCase(TestCase):
+    """Test cases for the incremental upload parsers."""
+
+    def test_csv_columns_are_matched_by_name(self):
+        """Test that CSV columns are found case-insensitively and URLs give ids."""
+        stream = io.StringIO(
+            "Track Name,Artist,ISRC,URL\n"
+            "Song 1,Band,isrc1,\n"
+            "Song 2,Band,,https://tidal.com/browse/track/2\n"
+        )
+
+        entries = list(importer.parse_csv(stream))
+
+        self.assertEqual(
+            entries[0],
+            {"line": 2, "title": "Song 1", "artist": "Band", "isrc": "ISRC1", "tidal_id": ""},
+        )
+        self.assertEqual(entries[1]["tidal_id"], "2")
+
+    def test_m3u_uses_extinf_or_file_name(self):
+        """Test that M3U entries take artist and title from #EXTINF or the file name."""
+        stream = io.StringIO(
+            "#EXTM3U\n#EXTINF:200,Band - Song 1\nmusic/song1.flac\n\nmusic/Band - Song 2.mp3\n"
+        )
+
+        entries = list(importer.parse_m3u(stream))
+
+        self.assertEqual(
+            [(e["line"], e["artist"], e["title"]) for e in entries],
+            [(2, "Band", "Song 1"), (5, "Band", "Song 2")],
+        )
+
+    def test_json_array_is_decoded_incrementally(self):
+        """Test that a JSON array split across small reads yields every item."""
+        items = [
+            {"title": f"Song {n}", "artists": [{"name": "Band"}], "isrc": f"ISRC{n}"}
+            for n in range(1, 50)
+        ]
+
+        entries = list(importer._iter_json_array(io.StringIO(json.dumps(items)), chunk_size=7))
+
+        self.assertEqual(entries, items)
+
+    def test_json_lines(self):
+        """Test that JSON Lines uploads are parsed line by line."""
+        stream = io.StringIO('{"title": "Song 1", "artist": "Band"}\n\n{"tidal_id": 3}\n')
+
+        entries = list(importer.parse_json(stream))
+
+        self.assertEqual(
+            [(e["line"], e["title"], e["tidal_id"]) for e in entries],
+            [(1, "Song 1", ""), (3, "", "3")],
+        )
+
+    def test_normalize(self):
+        """Test that featured artists, brackets and punctuation are ignored when matching."""
+        self.assertEqual(importer.normalize("Song (Remastered 2011) feat. Someone!"), "song")
+
+
+class PlaylistImportTestCase(TidalStubMixin, TestCase):
+    """Test cases for PlaylistImporter against a stubbed Tidal API."""
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.added = []
+        self.stub.add("GET", f"{API_URL}/tracks", self.serve_tracks)
+        self.stub.add("GET", f"{API_URL}/searchResults/", self.serve_search)
+        self.stub.add("POST", f"{API_URL}/playlists/", self.serve_add_items)
+        self.stub.add(
+            "POST", f"{API_URL}/playlists", lambda request: (201, {"data": {"id": "new"}})
+        )
+        self.importer = importer.PlaylistImporter(
+            TidalAPIClient(transport=self.transport), batch_size=25
+        )
+
+    def serve_tracks(self, request):
+        query = parse_qs(urlsplit(request.url).query)
+        if "filter[isrc]" in query:
+            found = [(CATALOG[isrc], isrc) for isrc in query["filter[isrc]"] if isrc in CATALOG]
+        else:
+            found = [(track_id, None) for track_id in query["filter[id]"]]
+        data = [
+            {
+                "id": track_id,
+                "type": "tracks",
+                "attributes": {"title": TITLES.get(track_id, f"Song {track_id}"), "isrc": isrc},
+                "relationships": {"artists": {"data": [{"id": "ar1", "type": "artists"}]}},
+            }
+            for track_id, isrc in found
+        ]
+        included = [{"id": "ar1", "type": "artists", "attributes": {"name": "Band"}}]
+        return 200, {"data": data, "included": included}
+
+    def serve_search(self, request):
+        query = unquote(urlsplit(request.url).path.split("/")[-3])
+        track_id = query.rsplit(" ", 1)[-1]
+        data = [{"id": track_id, "type": "tracks"}] if query.startswith("Band Song") else []
+        return 200, {"data": data}
+
+    def serve_add_items(self, request):
+        self.assertIn("/playlists/new/relationships/items", request.url)
+        self.added.append([item["id"] for item in json.loads(request.body)["data"]])
+        return 201, {}
+
+    def make_job(self, content, fmt=ImportJob.Format.CSV):
+        job = ImportJob(owner=self.user, name="Imported", format=fmt)
+        job.source.save("upload", ContentFile(content.encode()), save=True)
+        return job
+
+    def test_import_resolves_in_order_and_batches_writes(self):
+        """Test that tracks resolve by id, ISRC or search and are added 20 at a time."""
+        rows = [f"Song {n},Band,ISRC{n}," for n in range(1, 41)]
+        rows += ["Song 70,Band,,", "Unknown,Nobody,,", "Song 80,Band,,https://tidal.com/track/80"]
+        job = self.make_job("title,artist,isrc,url\n" + "\n".join(rows) + "\n")
+
+        job = self.importer.run(job)
+
+        self.assertEqual(job.status, ImportJob.Status.COMPLETED)
+        self.assertEqual(job.playlist_tidal_id, "new")
+        self.assertEqual((job.lines, job.matched, job.unmatched, job.added), (43, 42, 1, 42))
+        added = [track_id for batch in self.added for track_id in batch]
+        self.assertEqual(added, [str(n) for n in range(1, 41)] + ["70", "80"])
+        self.assertTrue(all(len(batch) <= 20 for batch in self.added))
+        isrc_requests = [url for method, url in self.stub.calls if "filter%5Bisrc%5D" in url]
+        self.assertEqual(len(isrc_requests), 3)  # 20 + 5 ISRCs, then 15
+        self.assertEqual(CatalogEntry.objects.filter(isrc="ISRC5").count(), 1)
+
+        with job.result.open("r") as result:
+            lines = result.read().splitlines()
+        self.assertEqual(lines[0], "line,status,method,tidal_id,isrc,artist,title")
+        self.assertEqual(lines[1], "2,matched,isrc,1,ISRC1,Band,Song 1")
+        self.assertEqual(lines[41], "42,matched,search,70,,Band,Song 70")
+        self.assertEqual(lines[42], "43,unmatched,,,,Nobody,Unknown")
+        self.assertEqual(lines[43].split(",")[2], "tidal_id")
+
+    def test_resolutions_are_cached_including_misses(self):
+        """Test that a second import reuses ISRC, search and negative results."""
+        content = "title,artist,isrc\nSong 3,Band,ISRC3\nSong 71,Band,\nUnknown,Nobody,XX1\n"
+        self.importer.run(self.make_job(content))
+        self.assertEqual(TrackResolution.objects.filter(tidal_id__isnull=True).count(), 2)
+        self.stub.calls.clear()
+
+        job = self.importer.run(self.make_job(content))
+
+        self.assertEqual(job.matched, 2)
+        self.assertFalse([url for method, url in self.stub.calls if method == "GET"])
+
+    def test_dissimilar_search_hit_is_left_unresolved(self):
+        """Test that a search hit scoring below the threshold does not match the row."""
+        job = self.importer.run(self.make_job("title,artist\nSong 66,Band\nSong 67,Band\n"))
+
+        self.assertEqual((job.matched, job.unmatched), (1, 1))
+        self.assertEqual([track_id for batch in self.added for track_id in batch], ["67"])
+        self.assertIsNone(
+            TrackResolution.objects.get(
+                method=TrackResolution.Method.SEARCH, key="band - song 66"
+            ).tidal_id
+        )
+
+    def test_failure_is_recorded(self):
+        """Test that a failing import marks the job failed with the error."""
+        job = self.make_job('[{"title": ', fmt=ImportJob.Format.JSON)
+
+        with self.assertRaises(ValueError):
+            self.importer.run(job)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.Status.FAILED)
+        self.assertIn("Truncated", job.error)
+
+    def test_upload_endpoint(self):
+        """Test that uploads create a job and its progress can be polled."""
+        self.client.force_login(self.user)
+        upload = ContentFile(b"title,artist\nSong 1,Band\n", name="road trip.csv")
+
+        with mock.patch("tidal.views.enqueue_import") as enqueue:
+            response = self.client.post(reverse("tidal:import_playlist"), {"file": upload})
+
+        self.assertEqual(response.status_code, 202)
+        job = ImportJob.objects.get()
+        enqueue.assert_called_once_with(job.pk)
+        self.assertEqual((job.name, job.format), ("road trip", ImportJob.Format.CSV))
+        self.assertEqual(response["Location"], reverse("tidal:import_status", args=[job.pk]))
+
+        self.importer.run(job)
+        status = self.client.get(response["Location"]).json()
+        self.assertEqual((status["status"], status["matched"]), ("completed", 1))
+        result = self.client.get(status["result_url"])
+        self.assertEqual(
+            b"".join(result.streaming_content).splitlines()[1], b"2,matched,search,1,,Band,Song 1"
+        )
@@ -0,0 +1,133 @@
+"""
+Tests for the paginated playlist track views.
+"""
+
+from urllib.parse import parse_qs, urlsplit
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from tidal.api import TidalAPIClient
+from tidal.http import set_transport
+from tidal.sync import PlaylistSyncEngine
+
+from .tidal_stubs import FakeLibrary, TidalStubMixin
+
+
+class TrackPagesTestCase(TidalStubMixin, TestCase):
+    """Test cases for keyset-paginated track lists."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.library = FakeLibrary(
+            self.stub, {"big": {"name": "Everything", "tracks": [str(i) for i in range(120)]}}
+        )
+        previous = set_transport(self.transport)
+        self.addCleanup(set_transport, previous)
+
+        PlaylistSyncEngine(TidalAPIClient(transport=self.transport)).sync_user(self.user)
+        self.library.playlists["live"] = {
+            "name": "Not Synced",
+            "tracks": [str(i) for i in range(60)],
+        }
+        self.stub.calls.clear()
+        self.client.force_login(self.user)
+
+    def page(self, playlist_id, **params):
+        url = reverse("tidal:playlist_tracks_page", args=[playlist_id])
+        return self.client.get(url, {"format": "json", **params}).json()
+
+    def test_synced_playlist_renders_first_page_from_the_database(self):
+        """Test that only the header and first page are rendered, without calling Tidal."""
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse("tidal:playlist_tracks", args=["big"]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.stub.calls, [])
+        self.assertEqual(len(response.context["tracks"]), 50)
+        self.assertContains(response, "120 tracks")
+        self.assertContains(response, "Song 49")
+        self.assertNotContains(response, "Song 50<")
+        self.assertContains(response, "?after=49")
+
+    def test_json_pages_walk_the_playlist(self):
+        """Test that following the keyset cursor returns every track once, in order."""
+        positions, after = [], -1
+        while after is not None:
+            body = self.page("big", after=after, limit=50)
+            positions += [track["position"] for track in body["tracks"]]
+            after = body["after"]
+
+        self.assertEqual(positions, list(range(120)))
+        self.assertIsNone(body["next"])
+        self.assertEqual(body["tracks"][0]["item"]["duration"], "3:20")
+        self.assertEqual(body["tracks"][0]["item"]["artists"], [{"id": "ar1", "name": "Band"}])
+
+    def test_page_queries_do_not_grow_with_position(self):
+        """Test that a late page costs the same queries as the first one."""
+        # Session, user, playlist, items with songs and albums, artists
+        with self.assertNumQueries(5):
+            first = self.page("big", after=-1, limit=10)
+        with self.assertNumQueries(5):
+            late = self.page("big", after=100, limit=10)
+
+        self.assertEqual(first["tracks"][0]["position"], 0)
+        self.assertEqual([track["position"] for track in late["tracks"]], list(range(101, 111)))
+        self.assertIn("after=110", late["next"])
+
+    def test_fragment_for_unpoly(self):
+        """Test that the HTML page is a fragment with the rows and the next load-more link."""
+        url = reverse("tidal:playlist_tracks_page", args=["big"])
+
+        response = self.client.get(url, {"after": 49}, HTTP_X_UP_TARGET="#track-list:after")
+
+        self.assertContains(response, 'id="track-list"')
+        self.assertContains(response, "Song 99")
+        self.assertContains(response, "?after=99")
+        self.assertNotContains(response, "<html")
+
+    def test_unsynced_playlist_is_paged_from_tidal(self):
+        """Test that playlists not in the database are paginated from the cached fetch."""
+        body = self.page("live", after=49, limit=50)
+
+        self.assertEqual(
+            [track["item"]["id"] for track in body["tracks"]], [str(i) for i in range(50, 60)]
+        )
+        self.assertIsNone(body["after"])
+
+    def test_unsynced_page_fetches_only_the_tidal_pages_it_spans(self):
+        """Test that an unsynced page stops at its last Tidal page and carries its cursor."""
+        self.library.playlists["live"]["tracks"] = [str(i) for i in range(200)]
+
+        first = self.page("live", limit=50)
+        item_pages = [url for _, url in self.stub.calls if "/relationships/items" in url]
+        self.assertEqual(len(item_pages), 3)
+        self.assertIn("skip=10", first["next"])
+
+        self.stub.calls.clear()
+        second = self.client.get(first["next"]).json()
+        item_pages = [url for _, url in self.stub.calls if "/relationships/items" in url]
+
+        self.assertEqual(len(item_pages), 3)
+        self.assertEqual(parse_qs(urlsplit(item_pages[0]).query)["page[cursor]"], ["40"])
+        self.assertEqual([track["position"] for track in second["tracks"]], list(range(50, 100)))
+        self.assertEqual(
+            [track["item"]["id"] for track in second["tracks"]], [str(i) for i in range(50, 100)]
+        )
+        self.assertEqual(second["after"], 99)
+
+    def test_foreign_cursor_is_rejected(self):
+        """Test that a cursor that does not continue the playlist's items is refused."""
+        url = reverse("tidal:playlist_tracks_page", args=["live"])
+
+        response = self.client.get(url, {"cursor": "/playlists/other/relationships/items?x=1"})
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_invalid_cursor(self):
+        """Test that a non-numeric cursor is rejected."""
+        url = reverse("tidal:playlist_tracks_page", args=["big"])
+
+        self.assertEqual(self.client.get(url, {"after": "x"}).status_code, 400)
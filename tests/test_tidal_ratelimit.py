@@ -0,0 +1,106 @@
+"""
+Tests for the Tidal rate-limit scheduler and transport retries.
+"""
+
+import time
+from email.utils import formatdate
+
+from django.test import SimpleTestCase
+
+from tidal.http import StubAdapter, TidalTransport
+from tidal.ratelimit import RateLimitScheduler, parse_retry_after
+
+API_URL = "https://openapi.tidal.test/v2"
+
+
+class RateLimitSchedulerTestCase(SimpleTestCase):
+    """Test cases for RateLimitScheduler."""
+
+    def setUp(self):
+        self.scheduler = RateLimitScheduler(
+            app_rate=100, app_burst=100, user_rate=2, user_burst=1, backoff_base=1
+        )
+        self.sleeps = []
+        self.scheduler.sleep = self.sleeps.append
+
+        self.stub = StubAdapter()
+        self.transport = TidalTransport(scheduler=self.scheduler)
+        self.transport.mount("https://", self.stub)
+
+    def test_user_bucket_paces_requests(self):
+        """Test that requests beyond the user's burst wait for tokens to refill."""
+        waits = [self.scheduler.reserve("user:1") for _ in range(3)]
+
+        self.assertEqual(waits[0], 0)
+        self.assertAlmostEqual(waits[1], 0.5, places=2)
+        self.assertAlmostEqual(waits[2], 1.0, places=2)
+        self.assertEqual(self.scheduler.reserve("user:2"), 0)
+
+    def test_rate_limit_headers_adapt_bucket(self):
+        """Test that X-RateLimit-* headers shrink the user's remaining budget."""
+        self.stub.add(
+            "GET",
+            API_URL,
+            lambda request: self.stub.build_response(
+                request,
+                200,
+                {},
+                {"X-RateLimit-Remaining": "0", "X-RateLimit-Replenish-Rate": "4"},
+            ),
+        )
+
+        self.transport.get(f"{API_URL}/tracks", rate_key="user:1")
+
+        self.assertAlmostEqual(self.scheduler.reserve("user:1"), 0.25, places=2)
+
+    def test_get_is_retried_after_429(self):
+        """Test that a throttled GET waits for Retry-After and is sent again."""
+        responses = iter([(429, {}), (200, {"data": []})])
+
+        def handler(request):
+            status_code, body = next(responses)
+            headers = {"Retry-After": "3"} if status_code == 429 else {}
+            return self.stub.build_response(request, status_code, body, headers)
+
+        self.stub.add("GET", API_URL, handler)
+
+        response = self.transport.get(f"{API_URL}/tracks", rate_key="user:1")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.stub.calls), 2)
+        self.assertIn(3.0, self.sleeps)
+        metrics = self.scheduler.metrics()
+        self.assertEqual(metrics["throttled"], 1)
+        self.assertEqual(metrics["retries"], 1)
+        self.assertEqual(metrics["queue_depth"], 0)
+        self.assertGreaterEqual(metrics["max_queue_depth"], 1)
+
+    def test_post_is_not_retried(self):
+        """Test that non-idempotent requests are returned as-is."""
+        self.stub.add("POST", API_URL, lambda request: (503, {}))
+
+        response = self.transport.post(f"{API_URL}/playlists")
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(len(self.stub.calls), 1)
+
+    def test_retries_are_bounded_with_backoff(self):
+        """Test that failing GETs stop after max_retries with growing jittered delays."""
+        self.scheduler.max_retries = 3
+        self.stub.add("GET", API_URL, lambda request: (503, {}))
+
+        response = self.transport.get(f"{API_URL}/tracks")
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(len(self.stub.calls), 4)
+        self.assertEqual(len(self.sleeps), 3)
+        for attempt, delay in enumerate(self.sleeps):
+            self.assertLessEqual(delay, 2**attempt)
+
+    def test_parse_retry_after(self):
+        """Test both Retry-After formats."""
+        self.assertEqual(parse_retry_after("12"), 12.0)
+        self.assertAlmostEqual(
+            parse_retry_after(formatdate(time.time() + 60, usegmt=True)), 60, delta=2
+        )
+        self.assertIsNone(parse_retry_after("soon"))
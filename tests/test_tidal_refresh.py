@@ -0,0 +1,104 @@
+"""
+Tests for single-flight and proactive user token refresh.
+"""
+
+import threading
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from tidal.api import TidalTokenManager
+from tidal.models import TidalToken
+
+from .tidal_stubs import AUTH_URL, TidalStubMixin
+
+
+class RefreshStubMixin(TidalStubMixin):
+    """Serves a slow refresh endpoint that rotates tokens and counts its calls."""
+
+    def setUp(self):
+        super().setUp()
+        self.refreshes = 0
+        self.refreshed = threading.Event()
+        self.stub.add("POST", AUTH_URL, self.serve_refresh)
+
+    def serve_refresh(self, request):
+        time.sleep(0.05)
+        self.refreshes += 1
+        self.refreshed.set()
+        return 200, {
+            "access_token": f"access-{self.refreshes}",
+            "refresh_token": f"refresh-{self.refreshes}",
+            "expires_in": 3600,
+        }
+
+    def expire_in(self, minutes):
+        TidalToken.objects.filter(user=self.user).update(
+            expires_at=timezone.now() + timedelta(minutes=minutes)
+        )
+
+
+class ConcurrentRefreshTestCase(RefreshStubMixin, TransactionTestCase):
+    """Test cases for refreshes involving several threads."""
+
+    def test_concurrent_callers_share_one_refresh(self):
+        """Test that parallel callers trigger exactly one refresh round trip."""
+        self.expire_in(1)
+        results = []
+
+        def call():
+            user = User.objects.get(pk=self.user.pk)
+            results.append(TidalTokenManager(transport=self.transport).get_valid_user_token(user))
+            connection.close()
+
+        threads = [threading.Thread(target=call) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.refreshes, 1)
+        self.assertEqual(results, ["Bearer access-1"] * 5)
+        self.assertEqual(TidalToken.objects.get(user=self.user).refresh_token, "refresh-1")
+
+    def test_token_near_expiry_is_refreshed_in_background(self):
+        """Test that a token inside the proactive window is returned while it refreshes."""
+        self.expire_in(10)
+        token_manager = TidalTokenManager(transport=self.transport)
+
+        self.assertEqual(token_manager.get_valid_user_token(self.user), "Bearer user-token")
+        self.assertTrue(self.refreshed.wait(timeout=2))
+        for _ in range(100):
+            if token_manager.get_valid_user_token(self.user) == "Bearer access-1":
+                break
+            time.sleep(0.01)
+        self.assertEqual(token_manager.get_valid_user_token(self.user), "Bearer access-1")
+        self.assertEqual(self.refreshes, 1)
+
+
+class RefreshCoordinationTestCase(RefreshStubMixin, TestCase):
+    """Test cases for refresh coordination within a single thread."""
+
+    def test_waiter_reuses_token_refreshed_by_another_caller(self):
+        """Test that a caller that saw an old token does not refresh again."""
+        token_manager = TidalTokenManager(transport=self.transport)
+
+        tidal_token = token_manager._refresh_single_flight(self.user, "token-seen-before")
+
+        self.assertEqual(tidal_token.access_token, "user-token")
+        self.assertEqual(self.refreshes, 0)
+
+    def test_rejected_refresh_token_deletes_row(self):
+        """Test that a refresh token Tidal rejects removes the stored token."""
+        self.stub.routes.insert(
+            0, ("POST", AUTH_URL, lambda request: (400, {"error": "invalid_grant"}))
+        )
+
+        token_manager = TidalTokenManager(transport=self.transport)
+
+        self.assertFalse(token_manager.refresh_user_token(self.user))
+        self.assertFalse(TidalToken.objects.filter(user=self.user).exists())
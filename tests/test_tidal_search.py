@@ -0,0 +1,100 @@
+"""
+Tests for full-text search over the synced library.
+"""
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+
+from tidal import search
+from tidal.api import TidalAPIClient
+from tidal.models import Playlist, PlaylistItem, Song
+from tidal.sync import PlaylistSyncEngine
+
+from .tidal_stubs import FakeLibrary, TidalStubMixin
+
+
+class LibrarySearchTestCase(TidalStubMixin, TestCase):
+    """Test cases for the FTS5 search index and endpoint."""
+
+    def setUp(self):
+        super().setUp()
+        FakeLibrary(
+            self.stub,
+            {
+                "p1": {"name": "Road Trip Anthems", "tracks": ["1", "2"]},
+                "p2": {"name": "Beyoncé Deep Cuts", "tracks": ["3"]},
+            },
+        )
+        PlaylistSyncEngine(TidalAPIClient(transport=self.transport)).sync_user(self.user)
+
+    def test_build_match_query(self):
+        """Test that input words become quoted prefix terms and operators are dropped."""
+        self.assertEqual(search.build_match_query('Road "tr'), '"road"* "tr"*')
+        self.assertEqual(search.build_match_query("NEAR(* -)"), '"near"*')
+        self.assertEqual(search.build_match_query("  "), "")
+
+    def test_prefix_search_finds_synced_rows(self):
+        """Test that partial words match playlists, songs, artists and albums."""
+        results = search.search(self.user, "road tr")
+        self.assertEqual(
+            results[0], {"type": "playlist", "id": "p1", "name": "Road Trip Anthems", "detail": ""}
+        )
+
+        song = search.search(self.user, "song 2")[0]
+        self.assertEqual((song["type"], song["id"], song["detail"]), ("song", "2", "Band Record"))
+
+        kinds = {result["type"] for result in search.search(self.user, "ban")}
+        self.assertEqual(kinds, {"artist", "song"})
+        self.assertEqual(search.search(self.user, "reco", limit=1)[0]["type"], "album")
+
+    def test_diacritics_are_ignored(self):
+        """Test that accented names are found without the accents."""
+        self.assertEqual(search.search(self.user, "beyonce")[0]["id"], "p2")
+
+    def test_results_are_scoped_to_the_user(self):
+        """Test that another user's library does not leak into results."""
+        other = User.objects.create(username="other")
+
+        self.assertEqual(search.search(other, "song"), [])
+        self.assertEqual(search.search(other, "road"), [])
+
+    def test_other_users_matches_do_not_crowd_out_the_user(self):
+        """Test that a user's match is found behind more than MAX_CANDIDATES of others'."""
+        other = User.objects.create(username="other")
+        crowd = Playlist.objects.create(owner=other, tidal_id="crowd", name="Crowd")
+        songs = Song.objects.bulk_create(
+            Song(tidal_id=f"c{n}", title=f"Song {n}") for n in range(search.MAX_CANDIDATES + 100)
+        )
+        PlaylistItem.objects.bulk_create(
+            PlaylistItem(playlist=crowd, song=song, position=n) for n, song in enumerate(songs)
+        )
+        late = User.objects.create(username="late")
+        playlist = Playlist.objects.create(owner=late, tidal_id="late", name="Late")
+        song = Song.objects.create(tidal_id="late-song", title="Song Late")
+        PlaylistItem.objects.create(playlist=playlist, song=song, position=0)
+        search.rebuild()
+
+        results = search.search(late, "song", limit=100)
+
+        self.assertEqual([result["id"] for result in results], ["late-song"])
+        self.assertEqual(len(search.search(other, "song", limit=100)), 100)
+
+    def test_rebuild(self):
+        """Test that the index can be rebuilt from the library tables."""
+        search.rebuild()
+
+        self.assertEqual(len(search.search(self.user, "song", limit=100)), 3)
+
+    def test_search_endpoint(self):
+        """Test that the endpoint returns JSON results honouring the limit."""
+        self.client.force_login(self.user)
+
+        response = self.client.get(reverse("tidal:search"), {"q": "song", "limit": 2})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["query"], "song")
+        self.assertEqual(len(response.json()["results"]), 2)
+        self.assertEqual(
+            self.client.get(reverse("tidal:search"), {"q": "x", "limit": "many"}).status_code, 400
+        )
@@ -0,0 +1,172 @@
+"""
+Tests for the playlist sync engine.
+"""
+
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from tidal import search
+from tidal.api import TidalAPIClient
+from tidal.models import Playlist, PlaylistItem, Song
+from tidal.sync import PlaylistSyncEngine
+
+from .tidal_stubs import FakeLibrary, TidalStubMixin
+
+
+class PlaylistSyncEngineTestCase(TidalStubMixin, TestCase):
+    """Test cases for PlaylistSyncEngine."""
+
+    def setUp(self):
+        super().setUp()
+        self.library = FakeLibrary(
+            self.stub,
+            {
+                "p1": {"name": "Road Trip", "tracks": [str(i) for i in range(25)]},
+                "p2": {"name": "Chill", "tracks": ["3", "30"]},
+            },
+        )
+        self.engine = PlaylistSyncEngine(TidalAPIClient(transport=self.transport), chunk_size=10)
+
+    def test_sync_user_stores_playlists_and_songs(self):
+        """Test that playlists, songs and their links are stored and marked completed."""
+        self.assertEqual(self.engine.sync_user(self.user), 2)
+
+        self.assertEqual(
+            set(Playlist.objects.values_list("tidal_id", "name", "sync_status")),
+            {
+                ("p1", "Road Trip", Playlist.SyncStatus.COMPLETED),
+                ("p2", "Chill", Playlist.SyncStatus.COMPLETED),
+            },
+        )
+        self.assertEqual(Song.objects.count(), 26)
+        self.assertEqual(Song.objects.get(tidal_id="30").ISRC, "ISRC30")
+        self.assertEqual(Playlist.objects.get(tidal_id="p1").songs.count(), 25)
+        self.assertEqual(Song.objects.get(tidal_id="3").playlists.count(), 2)
+
+    def test_resync_replaces_links(self):
+        """Test that a second sync updates names and drops removed tracks."""
+        self.engine.sync_user(self.user)
+        self.library.playlists["p2"] = {"name": "Chill Out", "tracks": ["30"]}
+
+        self.engine.sync_user(self.user)
+
+        playlist = Playlist.objects.get(tidal_id="p2")
+        self.assertEqual(playlist.name, "Chill Out")
+        self.assertEqual(list(playlist.songs.values_list("tidal_id", flat=True)), ["30"])
+
+    def test_resync_removes_playlists_that_left_the_collection(self):
+        """Test that a playlist gone from the collection is deleted with its search rows."""
+        self.engine.sync_user(self.user)
+        gone = Playlist.objects.get(tidal_id="p2")
+        self.assertEqual([hit["id"] for hit in search.search(self.user, "chill")], ["p2"])
+        del self.library.playlists["p2"]
+
+        self.engine.sync_user(self.user)
+
+        self.assertEqual(list(Playlist.objects.values_list("tidal_id", flat=True)), ["p1"])
+        self.assertFalse(PlaylistItem.objects.filter(playlist_id=gone.pk).exists())
+        self.assertEqual(search.search(self.user, "chill"), [])
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT count(*) FROM tidal_search WHERE rowid = %s", [gone.pk * 4 + 3])
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+    def test_unchanged_playlists_are_skipped(self):
+        """Test that playlists with the same lastModifiedAt and item count are not refetched."""
+        self.library.playlists["p1"]["modified"] = "2026-01-01T10:00:00Z"
+        self.engine.sync_user(self.user)
+        self.library.playlists["p2"]["modified"] = "2026-01-02T10:00:00Z"
+        self.stub.calls.clear()
+
+        self.assertEqual(self.engine.sync_user(self.user), 1)
+
+        item_calls = [url for _, url in self.stub.calls if "/relationships/items" in url]
+        self.assertTrue(item_calls)
+        self.assertTrue(all("/playlists/p2/" in url for url in item_calls))
+
+    def test_changed_playlist_resolves_only_new_tracks(self):
+        """Test that a changed playlist only resolves tracks not already stored."""
+        self.engine.sync_user(self.user)
+        self.library.playlists["p2"] = {"name": "Chill", "tracks": ["3", "30", "99"]}
+        self.stub.calls.clear()
+
+        self.engine.sync_user(self.user)
+
+        track_calls = [url for _, url in self.stub.calls if "/tracks?" in url]
+        self.assertEqual(len(track_calls), 1)
+        self.assertIn("filter%5Bid%5D=99", track_calls[0])
+        self.assertNotIn("filter%5Bid%5D=3&", track_calls[0])
+        playlist = Playlist.objects.get(tidal_id="p2")
+        self.assertEqual(playlist.songs.count(), 3)
+        self.assertEqual(playlist.item_count, 3)
+
+    def test_items_keep_tidal_order(self):
+        """Test that items are stored with their positions and read back in order."""
+        self.engine.sync_user(self.user)
+
+        playlist = Playlist.objects.get(owner=self.user, tidal_id="p1")
+        with CaptureQueriesContext(connection) as queries:
+            items = list(playlist.ordered_items())
+            titles = [str(item.song) for item in items]
+
+        self.assertEqual([item.song.tidal_id for item in items], [str(i) for i in range(25)])
+        self.assertEqual(titles[0], "Song 0 by Band")
+        self.assertEqual(items[0].song.album.title, "Record")
+        self.assertEqual(items[0].song.duration, timedelta(minutes=3, seconds=20))
+        self.assertEqual(len(queries), 2)
+
+    def test_moves_reuse_rows(self):
+        """Test that reordering updates positions instead of recreating items."""
+        self.engine.sync_user(self.user)
+        before = dict(
+            PlaylistItem.objects.filter(playlist__tidal_id="p2").values_list("song__tidal_id", "pk")
+        )
+        self.library.playlists["p2"]["tracks"] = ["30", "7", "3"]
+        self.library.playlists["p2"]["modified"] = "2026-01-03T10:00:00Z"
+
+        self.engine.sync_user(self.user)
+
+        items = Playlist.objects.get(tidal_id="p2").ordered_items()
+        self.assertEqual([item.song.tidal_id for item in items], ["30", "7", "3"])
+        self.assertEqual(items[0].pk, before["30"])
+        self.assertEqual(items[2].pk, before["3"])
+
+    def test_playlists_are_per_owner(self):
+        """Test that two users following the same playlist get their own rows."""
+        self.engine.sync_user(self.user)
+        other = User.objects.create(username="other")
+        self.user.tidal_token.pk = None
+        self.user.tidal_token.user = other
+        self.user.tidal_token.save()
+
+        self.engine.sync_user(other)
+
+        self.assertEqual(Playlist.objects.filter(tidal_id="p1").count(), 2)
+        self.assertEqual(other.playlists.get(tidal_id="p1").songs.count(), 25)
+
+    def test_failed_sync_marks_playlists_failed(self):
+        """Test that an error while fetching items leaves playlists FAILED."""
+        with mock.patch.object(
+            TidalAPIClient, "resolve_tracks", side_effect=ValueError("boom")
+        ), self.assertRaises(ValueError):
+            self.engine.sync_user(self.user)
+
+        self.assertEqual(
+            set(Playlist.objects.values_list("sync_status", flat=True)),
+            {Playlist.SyncStatus.FAILED},
+        )
+
+    def test_management_command(self):
+        """Test that the sync_playlists command syncs linked users."""
+        stdout = StringIO()
+        with mock.patch("tidal.sync.TidalAPIClient", lambda: self.engine.api_client):
+            call_command("sync_playlists", "listener", stdout=stdout)
+
+        self.assertIn("listener: synced 2 playlists", stdout.getvalue())
+        self.assertEqual(Playlist.objects.count(), 2)
@@ -0,0 +1,73 @@
+"""
+Tests for Tidal token caching.
+"""
+
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from tidal.api import TidalAPIClient, TidalTokenManager
+from tidal.models import TidalToken
+
+from .tidal_stubs import AUTH_URL, TidalStubMixin
+
+
+class TokenCacheTestCase(TidalStubMixin, TestCase):
+    """Test cases for the in-process user and app token caches."""
+
+    def test_user_token_is_queried_once(self):
+        """Test that repeated API calls reuse the cached token instead of the database."""
+        client = TidalAPIClient(transport=self.transport)
+
+        with self.assertNumQueries(1):
+            for _ in range(3):
+                headers = client._get_auth_headers(self.user)
+
+        self.assertEqual(headers["Authorization"], "Bearer user-token")
+
+    def test_save_user_token_replaces_cached_token(self):
+        """Test that saving a new token is visible to the next lookup."""
+        token_manager = TidalTokenManager(transport=self.transport)
+        token_manager.get_valid_user_token(self.user)
+
+        token_manager.save_user_token(
+            self.user, {"access_token": "new-token", "refresh_token": "r2", "expires_in": 3600}
+        )
+
+        with self.assertNumQueries(0):
+            self.assertEqual(token_manager.get_valid_user_token(self.user), "Bearer new-token")
+
+    def test_token_in_refresh_buffer_is_not_cached(self):
+        """Test that a token close to expiry is looked up (and refreshed) again."""
+        self.stub.add(
+            "POST",
+            AUTH_URL,
+            lambda request: (200, {"access_token": "refreshed", "expires_in": 3600}),
+        )
+        TidalToken.objects.filter(user=self.user).update(
+            expires_at=timezone.now() + timedelta(minutes=2)
+        )
+
+        token_manager = TidalTokenManager(transport=self.transport)
+
+        self.assertEqual(token_manager.get_valid_user_token(self.user), "Bearer refreshed")
+        with self.assertNumQueries(0):
+            self.assertEqual(token_manager.get_valid_user_token(self.user), "Bearer refreshed")
+
+    def test_app_token_is_shared_between_managers(self):
+        """Test that a new manager reuses the client credentials token of another."""
+        self.stub.add(
+            "POST",
+            AUTH_URL,
+            lambda request: (
+                200,
+                {"access_token": "app-token", "token_type": "Bearer", "expires_in": 3600},
+            ),
+        )
+
+        TidalTokenManager(transport=self.transport).get_token()
+        token = TidalTokenManager(transport=self.transport).get_token()
+
+        self.assertEqual(token, "Bearer app-token")
+        self.assertEqual(len(self.stub.calls), 1)
@@ -0,0 +1,146 @@
+"""
+Shared fixtures for tests that talk to a stubbed Tidal API.
+"""
+
+from datetime import timedelta
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
+
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from tidal.http import StubAdapter, TidalTransport
+from tidal.models import TidalToken
+from tidal.token_cache import app_tokens, user_tokens
+
+API_URL = "https://openapi.tidal.test/v2"
+AUTH_URL = "https://auth.tidal.test/v1/oauth2/token"
+
+TIDAL_ENV = {
+    "TIDAL_CLIENT_ID": "client-id",
+    "TIDAL_CLIENT_SECRET": "client-secret",
+    "TIDAL_AUTH": AUTH_URL,
+    "TIDAL_API_URL": API_URL,
+}
+
+
+def paginate(path, items, page_size=20):
+    """
+    Returns a stub handler serving items as cursor-paginated JSON:API pages under path.
+    """
+
+    def handler(request):
+        query = parse_qs(urlsplit(request.url).query)
+        cursor = int(query.get("page[cursor]", ["0"])[0])
+        page = items[cursor : cursor + page_size]
+        body = {"data": page, "links": {}}
+        if cursor + page_size < len(items):
+            body["links"]["next"] = f"{path}?page[cursor]={cursor + page_size}"
+        return 200, body
+
+    return handler
+
+
+class TidalStubMixin:
+    """
+    Sets up a stubbed transport and a user holding a valid Tidal token.
+    """
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.dict("os.environ", TIDAL_ENV)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        user_tokens.clear()
+        app_tokens.clear()
+
+        self.stub = StubAdapter()
+        self.transport = TidalTransport(pool_size=4, connect_timeout=1.5, read_timeout=7)
+        self.transport.mount("https://", self.stub)
+
+        self.user = User.objects.create(username="listener")
+        TidalToken.objects.create(
+            user=self.user,
+            access_token="user-token",
+            refresh_token="refresh-token",
+            expires_at=timezone.now() + timedelta(hours=1),
+            tidal_user_id="42",
+            tidal_country="US",
+        )
+
+
+class FakeLibrary:
+    """
+    Serves a small Tidal library through a StubAdapter: the user collection, playlist
+    resources, playlist items and tracks. playlists maps playlist id to a dict with a
+    "name" and an ordered list of "tracks" ids; mutate it between calls to simulate edits.
+    """
+
+    def __init__(self, stub, playlists, user_id="42"):
+        self.playlists = playlists
+        collection = f"/userCollections/{user_id}/relationships/playlists"
+        stub.add("GET", f"{API_URL}{collection}", self.serve_collection(collection))
+        stub.add("GET", f"{API_URL}/playlists/", self.serve_items)
+        stub.add("GET", f"{API_URL}/playlists", self.serve_playlists)
+        stub.add("GET", f"{API_URL}/tracks", self.serve_tracks)
+
+    def serve_collection(self, path):
+        def handler(request):
+            items = [{"id": playlist_id, "type": "playlists"} for playlist_id in self.playlists]
+            return paginate(path, items)(request)
+
+        return handler
+
+    def serve_items(self, request):
+        playlist_id = urlsplit(request.url).path.split("/")[-3]
+        path = f"/playlists/{playlist_id}/relationships/items"
+        items = [
+            {"id": track_id, "type": "tracks", "meta": {"itemId": f"{playlist_id}-{i}"}}
+            for i, track_id in enumerate(self.playlists[playlist_id]["tracks"])
+        ]
+        return paginate(path, items)(request)
+
+    def serve_playlists(self, request):
+        query = parse_qs(urlsplit(request.url).query)
+        data = [
+            {
+                "id": playlist_id,
+                "type": "playlists",
+                "attributes": {
+                    "name": self.playlists[playlist_id]["name"],
+                    "numberOfItems": len(self.playlists[playlist_id]["tracks"]),
+                    "lastModifiedAt": self.playlists[playlist_id].get("modified"),
+                },
+            }
+            for playlist_id in query["filter[id]"]
+            if playlist_id in self.playlists
+        ]
+        return 200, {"data": data}
+
+    def serve_tracks(self, request):
+        query = parse_qs(urlsplit(request.url).query)
+        data = [
+            {
+                "id": track_id,
+                "type": "tracks",
+                "attributes": {
+                    "title": f"Song {track_id}",
+                    "isrc": f"ISRC{track_id}",
+                    "duration": "PT3M20S",
+                },
+                "relationships": {
+                    "artists": {"data": [{"id": "ar1", "type": "artists"}]},
+                    "albums": {"data": [{"id": "al1", "type": "albums"}]},
+                },
+            }
+            for track_id in query["filter[id]"]
+        ]
+        included = [
+            {"id": "ar1", "type": "artists", "attributes": {"name": "Band"}},
+            {
+                "id": "al1",
+                "type": "albums",
+                "attributes": {"title": "Record", "releaseDate": "2020-05-01"},
+            },
+        ]
+        return 200, {"data": data, "included": included}
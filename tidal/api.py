@@ -3,24 +3,54 @@ import hashlib
 import logging
 import os
 import secrets
+import threading
 import time
 import urllib.parse
+from concurrent.futures import FIRST_COMPLETED, wait
 from datetime import timedelta
 
 import requests
+from django.db import close_old_connections, transaction
 from django.utils import timezone
 
+from .http import get_fetch_executor, get_fetch_workers, get_transport
 from .models import TidalToken
+from .token_cache import app_tokens, user_tokens
 
 logger = logging.getLogger(__name__)
 
+# Items per page of Tidal's paginated relationships, e.g. a playlist's items
+ITEMS_PER_PAGE = 20
+
+# User tokens are refreshed once they are this close to expiring
+USER_TOKEN_REFRESH_BUFFER = timedelta(minutes=5)
+
+# Inside this window a still-valid user token is refreshed in the background
+USER_TOKEN_PROACTIVE_REFRESH = timedelta(
+    seconds=int(os.getenv("TIDAL_TOKEN_PROACTIVE_REFRESH_SECONDS", "900"))
+)
+
+_refresh_locks = {}
+_refresh_locks_lock = threading.Lock()
+
+
+def _get_refresh_lock(user_id):
+    with _refresh_locks_lock:
+        return _refresh_locks.setdefault(user_id, threading.Lock())
+
+
+# Largest number of ids Tidal accepts in a single filter[id] query
+MAX_FILTER_IDS = 20
+MAX_PLAYLIST_ITEMS_PER_REQUEST = 20
+
 
 class TidalTokenManager:
     """
     Manages Tidal API access tokens with automatic caching and renewal.
     """
 
-    def __init__(self):
+    def __init__(self, transport=None):
+        self.transport = transport or get_transport()
         self.client_id = os.getenv("TIDAL_CLIENT_ID")
         self.client_secret = os.getenv("TIDAL_CLIENT_SECRET")
         self.token_url = os.getenv("TIDAL_AUTH")
@@ -46,7 +76,7 @@ class TidalTokenManager:
 
         data = {"grant_type": "client_credentials"}
 
-        response = requests.post(self.token_url, headers=headers, data=data)
+        response = self.transport.post(self.token_url, headers=headers, data=data)
         response.raise_for_status()
 
         token_data = response.json()
@@ -63,7 +93,12 @@ class TidalTokenManager:
         """
         Returns the current valid access token, fetching a new one if necessary.
         Renews if the token expires in less than 60 seconds.
+        The token is shared with every other manager in the process using the same client.
         """
+        cached = app_tokens.get(self.client_id)
+        if cached:
+            return cached
+
         current_time = time.time()
 
         if (
@@ -73,56 +108,129 @@ class TidalTokenManager:
         ):
             self._fetch_token()
 
-        return f"{self._token_type} {self._access_token}"
+        token = f"{self._token_type} {self._access_token}"
+        app_tokens.set(self.client_id, token, self._expiry_time - 60)
+        return token
 
-    def get_user_token(self, user):
+    def _cache_user_token(self, tidal_token):
+        token = f"Bearer {tidal_token.access_token}"
+
+        # Cache until the proactive refresh window opens so the next lookup can start a
+        # background refresh; inside the window, cache until the blocking refresh buffer
+        expires_at = tidal_token.expires_at - USER_TOKEN_PROACTIVE_REFRESH
+        if expires_at <= timezone.now():
+            expires_at = tidal_token.expires_at - USER_TOKEN_REFRESH_BUFFER
+        user_tokens.set(tidal_token.user_id, token, expires_at.timestamp())
+        return token
+
+    def _refresh_single_flight(self, user, seen_access_token, blocking=True, delete_invalid=False):
         """
-        Returns the current valid access token for a user, refreshing if necessary.
+        Refreshes the user's token unless another caller already did.
+
+        An in-process lock per user and a row lock on the TidalToken make sure only
+        one refresh runs at a time; callers that waited get the token the winner
+        stored instead of spending (and possibly invalidating) the rotated refresh
+        token again. Returns the current TidalToken, or None when blocking is False
+        and a refresh is already running.
         """
-        try:
-            tidal_token = TidalToken.objects.get(user=user)
+        lock = _get_refresh_lock(user.pk)
+        if not lock.acquire(blocking=blocking):
+            return None
 
-            # Check if token is expired or will expire in the next 5 minutes
-            current_time = timezone.now()
-            buffer_time = timedelta(minutes=5)
-
-            if tidal_token.is_expired() or tidal_token.expires_at <= current_time + buffer_time:
-                # Token is expired or will expire soon, try to refresh
-                if tidal_token.refresh_token:
-                    try:
-                        logger.info(f"Refreshing expired token for user: {user.username}")
-                        oauth_manager = TidalOAuthManager()
-                        new_token_data = oauth_manager.refresh_access_token(
-                            tidal_token.refresh_token
-                        )
-
-                        # Update the token in database
-                        tidal_token.access_token = new_token_data["access_token"]
-                        if new_token_data.get("refresh_token"):
-                            tidal_token.refresh_token = new_token_data["refresh_token"]
-                        tidal_token.expires_at = timezone.now() + timedelta(
-                            seconds=new_token_data["expires_in"]
-                        )
-                        tidal_token.save()
-
-                        logger.info(f"Token refreshed successfully for user: {user.username}")
-                        return f"Bearer {tidal_token.access_token}"
-
-                    except Exception as e:
-                        logger.error(f"Failed to refresh token for user {user.username}: {e}")
-                        # If refresh fails, return None to indicate token is invalid
-                        return None
+        try:
+            invalid_error = None
+            with transaction.atomic():
+                tidal_token = TidalToken.objects.select_for_update().get(user=user)
+                if tidal_token.access_token != seen_access_token:
+                    logger.info(f"Token already refreshed for user: {user.username}")
+                    return tidal_token
+
+                if not tidal_token.refresh_token:
+                    raise ValueError("No refresh token available")
+
+                oauth_manager = TidalOAuthManager(transport=self.transport)
+                try:
+                    new_token_data = oauth_manager.refresh_access_token(tidal_token.refresh_token)
+                except requests.exceptions.HTTPError as e:
+                    if not (delete_invalid and e.response.status_code == 400):
+                        raise
+                    # Refresh token is likely expired or invalid; delete it while still
+                    # holding the row lock and report the error once committed
+                    logger.warning(f"Refresh token expired for user: {user.username}")
+                    tidal_token.delete()
+                    user_tokens.invalidate(user.pk)
+                    invalid_error = e
                 else:
-                    # No refresh token available
-                    logger.warning(f"No refresh token available for user: {user.username}")
-                    return None
+                    # Update the token in database
+                    tidal_token.access_token = new_token_data["access_token"]
+                    if new_token_data.get("refresh_token"):
+                        tidal_token.refresh_token = new_token_data["refresh_token"]
+                    tidal_token.expires_at = timezone.now() + timedelta(
+                        seconds=new_token_data["expires_in"]
+                    )
+                    tidal_token.save()
+
+            if invalid_error is not None:
+                raise invalid_error
+
+            logger.info(f"Token refreshed successfully for user: {user.username}")
+            return tidal_token
+        finally:
+            lock.release()
+
+    def _refresh_in_background(self, user, seen_access_token):
+        def refresh():
+            try:
+                tidal_token = self._refresh_single_flight(user, seen_access_token, blocking=False)
+                if tidal_token is not None:
+                    self._cache_user_token(tidal_token)
+            except Exception as e:
+                logger.warning(f"Proactive token refresh failed for user {user.username}: {e}")
+            finally:
+                close_old_connections()
 
-            return f"Bearer {tidal_token.access_token}"
+        threading.Thread(target=refresh, name="tidal-token-refresh", daemon=True).start()
+
+    def get_user_token(self, user):
+        """
+        Returns the current valid access token for a user, refreshing if necessary.
+        Tokens close to expiring are refreshed in the background ahead of time.
+        """
+        cached = user_tokens.get(user.pk)
+        if cached:
+            return cached
 
+        try:
+            tidal_token = TidalToken.objects.get(user=user)
         except TidalToken.DoesNotExist:
             logger.info(f"No Tidal token found for user: {user.username}")
             return None
 
+        current_time = timezone.now()
+
+        # Check if token is expired or will expire in the next 5 minutes
+        if tidal_token.expires_at <= current_time + USER_TOKEN_REFRESH_BUFFER:
+            if not tidal_token.refresh_token:
+                # No refresh token available
+                logger.warning(f"No refresh token available for user: {user.username}")
+                return None
+
+            try:
+                logger.info(f"Refreshing expired token for user: {user.username}")
+                tidal_token = self._refresh_single_flight(user, tidal_token.access_token)
+            except Exception as e:
+                logger.error(f"Failed to refresh token for user {user.username}: {e}")
+                # If refresh fails, return None to indicate token is invalid
+                return None
+
+        elif (
+            tidal_token.refresh_token
+            and tidal_token.expires_at <= current_time + USER_TOKEN_PROACTIVE_REFRESH
+        ):
+            self._refresh_in_background(user, tidal_token.access_token)
+
+        return self._cache_user_token(tidal_token)
+
     def save_user_token(self, user, token_data):
         """
         Saves or updates the user's Tidal token in the database.
@@ -145,6 +253,7 @@ class TidalTokenManager:
             tidal_token.expires_at = expires_at
             tidal_token.save()
 
+        self._cache_user_token(tidal_token)
         return tidal_token
 
     def save_tidal_user_id(self, user):
@@ -155,7 +264,7 @@ class TidalTokenManager:
         headers = {"Authorization": self.get_valid_user_token(user)}
         tidal_api = os.getenv("TIDAL_API_URL")
         url = f"{tidal_api}/users/me"
-        response = requests.get(url, headers=headers)
+        response = self.transport.get(url, headers=headers, rate_key=f"user:{user.pk}")
 
         if response.status_code != 200:
             logger.error(f"Failed to fetch Tidal user ID for user {user.username}: {response.text}")
@@ -181,46 +290,34 @@ class TidalTokenManager:
         """
         try:
             tidal_token = TidalToken.objects.get(user=user)
+        except TidalToken.DoesNotExist:
+            logger.info(f"No Tidal token found for user: {user.username}")
+            return False
 
-            if not tidal_token.refresh_token:
-                logger.warning(f"No refresh token available for user: {user.username}")
-                return False
-
-            try:
-                logger.info(f"Manually refreshing token for user: {user.username}")
-                oauth_manager = TidalOAuthManager()
-                new_token_data = oauth_manager.refresh_access_token(tidal_token.refresh_token)
-
-                # Update the token in database
-                tidal_token.access_token = new_token_data["access_token"]
-                if new_token_data.get("refresh_token"):
-                    tidal_token.refresh_token = new_token_data["refresh_token"]
-                tidal_token.expires_at = timezone.now() + timedelta(
-                    seconds=new_token_data["expires_in"]
-                )
-                tidal_token.save()
-
-                logger.info(f"Token refreshed successfully for user: {user.username}")
-                return True
-
-            except requests.exceptions.HTTPError as e:
-                if e.response.status_code == 400:
-                    # Refresh token is likely expired or invalid
-                    logger.warning(f"Refresh token expired for user: {user.username}")
-                    # Optionally delete the invalid token
-                    tidal_token.delete()
-                else:
-                    logger.error(f"HTTP error during token refresh for user {user.username}: {e}")
-                return False
+        if not tidal_token.refresh_token:
+            logger.warning(f"No refresh token available for user: {user.username}")
+            return False
 
-            except Exception as e:
-                logger.error(f"Failed to refresh token for user {user.username}: {e}")
-                return False
+        try:
+            logger.info(f"Manually refreshing token for user: {user.username}")
+            tidal_token = self._refresh_single_flight(
+                user, tidal_token.access_token, delete_invalid=True
+            )
+            self._cache_user_token(tidal_token)
+            return True
 
         except TidalToken.DoesNotExist:
             logger.info(f"No Tidal token found for user: {user.username}")
             return False
 
+        except requests.exceptions.HTTPError as e:
+            logger.error(f"HTTP error during token refresh for user {user.username}: {e}")
+            return False
+
+        except Exception as e:
+            logger.error(f"Failed to refresh token for user {user.username}: {e}")
+            return False
+
     def get_valid_user_token(self, user):
         """
         Gets a valid access token for a user, handling refresh automatically.
@@ -272,7 +369,8 @@ class TidalOAuthManager:
     Manages Tidal OAuth 2.1 authorization code flow with PKCE.
     """
 
-    def __init__(self):
+    def __init__(self, transport=None):
+        self.transport = transport or get_transport()
         self.client_id = os.getenv("TIDAL_CLIENT_ID")
         self.client_secret = os.getenv("TIDAL_CLIENT_SECRET")
         self.redirect_uri = os.getenv("TIDAL_REDIRECT_URI")
@@ -333,7 +431,7 @@ class TidalOAuthManager:
             "code_verifier": code_verifier,
         }
 
-        response = requests.post(self.token_url, headers=headers, data=data)
+        response = self.transport.post(self.token_url, headers=headers, data=data)
         response.raise_for_status()
 
         token_data = response.json()
@@ -371,7 +469,7 @@ class TidalOAuthManager:
             "client_id": self.client_id,
         }
 
-        response = requests.post(self.token_url, headers=headers, data=data)
+        response = self.transport.post(self.token_url, headers=headers, data=data)
         response.raise_for_status()
 
         token_data = response.json()
@@ -408,8 +506,9 @@ class TidalAPIClient:
     Client for making authenticated requests to the Tidal API.
     """
 
-    def __init__(self, token_manager=None):
-        self.token_manager = token_manager or TidalTokenManager()
+    def __init__(self, token_manager=None, transport=None):
+        self.transport = transport or get_transport()
+        self.token_manager = token_manager or TidalTokenManager(transport=self.transport)
         self.base_url = os.getenv("TIDAL_API_URL", "https://openapi.tidal.com/v2")
 
     def _get_auth_headers(self, user):
@@ -417,7 +516,26 @@ class TidalAPIClient:
         token = self.token_manager.get_valid_user_token(user)
         if not token:
             raise ValueError("No valid access token available for user")
-        return {"Authorization": token}
+        return {"Authorization": token, "Accept": "application/vnd.api+json"}
+
+    @staticmethod
+    def _rate_key(user):
+        """Key of the user's request budget in the transport's rate-limit scheduler."""
+        return f"user:{user.pk}"
+
+    def _get_page(self, url, headers, rate_key=None):
+        """Fetch a single page of a paginated relationship."""
+        response = self.transport.get(url, headers=headers, rate_key=rate_key)
+        response.raise_for_status()
+
+        data = response.json()
+        return data.get("data", []), data.get("links", {}).get("next")
+
+    def _user_playlists_url(self, user):
+        return f"{self.base_url}/userCollections/{user.tidal_token.tidal_user_id}/relationships/playlists"  # noqa E501
+
+    def _playlist_tracks_url(self, playlist_id):
+        return f"{self.base_url}/playlists/{playlist_id}/relationships/items"
 
     def get_user_playlists(self, user, next_page_url=None):
         """
@@ -428,13 +546,9 @@ class TidalAPIClient:
         if next_page_url:
             url = f"{self.base_url}{next_page_url}"
         else:
-            url = f"{self.base_url}/userCollections/{user.tidal_token.tidal_user_id}/relationships/playlists"  # noqa E501
+            url = self._user_playlists_url(user)
 
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-
-        data = response.json()
-        return data.get("data", []), data.get("links", {}).get("next")
+        return self._get_page(url, headers, self._rate_key(user))
 
     def get_playlist_tracks(self, user, playlist_id, next_page_url=None):
         """
@@ -445,13 +559,121 @@ class TidalAPIClient:
         if next_page_url:
             url = f"{self.base_url}{next_page_url}"
         else:
-            url = f"{self.base_url}/playlists/{playlist_id}/relationships/items"
+            url = self._playlist_tracks_url(playlist_id)
 
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
+        return self._get_page(url, headers, self._rate_key(user))
 
-        data = response.json()
-        return data.get("data", []), data.get("links", {}).get("next")
+    def iter_pages(self, user, url):
+        """
+        Walk every page of a paginated relationship, yielding one list of items per page.
+
+        Tidal's `links.next` cursors are opaque, so the next page can only be requested
+        once the current one has arrived. As soon as it is known, it is submitted to the
+        shared fetch pool so it downloads while the caller processes the current page.
+        """
+        return self._walk_pages(url, self._get_auth_headers(user), self._rate_key(user))
+
+    def _walk_pages(self, url, headers, rate_key=None):
+        executor = get_fetch_executor()
+        seen_cursors = set()
+
+        future = executor.submit(self._get_page, url, headers, rate_key)
+        while future is not None:
+            items, next_page_url = future.result()
+            future = None
+            if next_page_url:
+                self._check_cursor(next_page_url, seen_cursors)
+                future = executor.submit(
+                    self._get_page, f"{self.base_url}{next_page_url}", headers, rate_key
+                )
+            yield items
+
+    @staticmethod
+    def _check_cursor(next_page_url, seen_cursors):
+        """Guard against a server that repeats or cycles its `links.next` cursor."""
+        if next_page_url in seen_cursors:
+            raise ValueError(f"Tidal returned a repeated pagination cursor: {next_page_url}")
+        seen_cursors.add(next_page_url)
+
+    def iter_user_playlists(self, user):
+        """
+        Stream every playlist in the user's collection, page by page.
+        """
+        for items in self.iter_pages(user, self._user_playlists_url(user)):
+            yield from items
+
+    def iter_playlist_tracks(self, user, playlist_id):
+        """
+        Stream every item of a playlist, page by page.
+        """
+        for items in self.iter_pages(user, self._playlist_tracks_url(playlist_id)):
+            yield from items
+
+    def get_all_user_playlists(self, user):
+        """
+        Fetch every playlist in the user's collection.
+        """
+        return list(self.iter_user_playlists(user))
+
+    def get_all_playlist_tracks(self, user, playlist_id):
+        """
+        Fetch every item of a playlist.
+        """
+        return list(self.iter_playlist_tracks(user, playlist_id))
+
+    def collect_playlists_tracks(self, user, playlist_ids, max_workers=None, on_page=None):
+        """
+        Fetch every item of several playlists, walking them concurrently.
+        Returns a dict of playlist id to its ordered list of items. on_page, if given,
+        is called with the playlist id and items of each page as it arrives.
+
+        All page requests run on the shared fetch pool; this method only keeps up to
+        max_workers walks in flight and submits each walk's next page as soon as its
+        cursor arrives.
+        """
+        playlist_ids = list(playlist_ids)
+        if not playlist_ids:
+            return {}
+
+        # Resolve the token once, before fanning out, so worker threads never touch the DB
+        headers = self._get_auth_headers(user)
+        rate_key = self._rate_key(user)
+        executor = get_fetch_executor()
+        max_in_flight = max_workers or get_fetch_workers()
+
+        results = {playlist_id: [] for playlist_id in playlist_ids}
+        seen_cursors = {playlist_id: set() for playlist_id in playlist_ids}
+        pending = iter(playlist_ids)
+        in_flight = {}
+
+        def start_next_walk():
+            playlist_id = next(pending, None)
+            if playlist_id is not None:
+                url = self._playlist_tracks_url(playlist_id)
+                future = executor.submit(self._get_page, url, headers, rate_key)
+                in_flight[future] = playlist_id
+
+        for _ in range(max_in_flight):
+            start_next_walk()
+
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                playlist_id = in_flight.pop(future)
+                items, next_page_url = future.result()
+                results[playlist_id].extend(items)
+                if on_page is not None:
+                    on_page(playlist_id, items)
+
+                if next_page_url:
+                    self._check_cursor(next_page_url, seen_cursors[playlist_id])
+                    url = f"{self.base_url}{next_page_url}"
+                    future = executor.submit(self._get_page, url, headers, rate_key)
+                    in_flight[future] = playlist_id
+                else:
+                    start_next_walk()
+
+        return results
 
     def get_playlist_details(self, user, playlist_id):
         """
@@ -460,10 +682,210 @@ class TidalAPIClient:
         headers = self._get_auth_headers(user)
         url = f"{self.base_url}/playlists/{playlist_id}"
 
-        response = requests.get(url, headers=headers)
+        response = self.transport.get(url, headers=headers, rate_key=self._rate_key(user))
         response.raise_for_status()
 
         data = response.json()
         return data.get("data", {}).get("id", {}), data.get("data", {}).get("attributes", {}).get(
             "name", "Unknown Playlist"
         )
+
+    def _user_country(self, user):
+        tidal_token = getattr(user, "tidal_token", None)
+        return (tidal_token and tidal_token.tidal_country) or "US"
+
+    def fetch_resources(
+        self, user, resource_type, ids, include=None, country_code=None, filter_field="id"
+    ):
+        """
+        Fetch resources of one type by id in batches of MAX_FILTER_IDS, using
+        `filter[id]` and `include` so related resources arrive in the same response.
+        filter_field selects another filter, e.g. "isrc" for tracks.
+        Batches run concurrently on the shared fetch pool.
+        Returns (data, included) lists merged across every batch.
+        """
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            return [], []
+
+        headers = self._get_auth_headers(user)
+        params = {"countryCode": country_code or self._user_country(user)}
+        if include:
+            params["include"] = list(include)
+
+        def fetch_batch(batch):
+            response = self.transport.get(
+                f"{self.base_url}/{resource_type}",
+                headers=headers,
+                params={**params, f"filter[{filter_field}]": batch},
+                rate_key=self._rate_key(user),
+            )
+            response.raise_for_status()
+            body = response.json()
+            return body.get("data", []), body.get("included", [])
+
+        batches = [ids[i : i + MAX_FILTER_IDS] for i in range(0, len(ids), MAX_FILTER_IDS)]
+        data, included = [], []
+        for batch_data, batch_included in get_fetch_executor().map(fetch_batch, batches):
+            data.extend(batch_data)
+            included.extend(batch_included)
+        return data, included
+
+    def resolve_tracks(self, user, track_ids, country_code=None):
+        """
+        Resolve track ids to their attributes together with artists and album.
+        Returns a dict keyed by track id; ids Tidal does not return are left out.
+        """
+        data, included = self.fetch_resources(
+            user, "tracks", track_ids, include=("artists", "albums"), country_code=country_code
+        )
+
+        return parse_tracks(data, included)
+
+    def resolve_isrcs(self, user, isrcs, country_code=None):
+        """
+        Look tracks up by ISRC in batches. Returns a dict of ISRC to the first matching
+        track, in the shape of parse_tracks; ISRCs without a track are left out.
+        """
+        data, included = self.fetch_resources(
+            user,
+            "tracks",
+            isrcs,
+            include=("artists", "albums"),
+            country_code=country_code,
+            filter_field="isrc",
+        )
+
+        found = {}
+        for track in parse_tracks(data, included).values():
+            if track["isrc"]:
+                found.setdefault(track["isrc"].upper(), track)
+        return found
+
+    def search_tracks(self, user, queries, country_code=None):
+        """
+        Search Tidal's catalog for tracks, running the queries concurrently on the
+        shared fetch pool. Returns a dict of query to the track ids of its first page.
+        """
+        headers = self._get_auth_headers(user)
+        params = {"countryCode": country_code or self._user_country(user)}
+
+        def search(query):
+            url = f"{self.base_url}/searchResults/{urllib.parse.quote(query, safe='')}/relationships/tracks"  # noqa E501
+            response = self.transport.get(
+                url, headers=headers, params=params, rate_key=self._rate_key(user)
+            )
+            response.raise_for_status()
+            return query, [item["id"] for item in response.json().get("data", [])]
+
+        return dict(get_fetch_executor().map(search, list(dict.fromkeys(queries))))
+
+    def create_playlist(self, user, name, description=""):
+        """
+        Create a playlist in the user's Tidal account. Returns its id.
+        """
+        response = self.transport.post(
+            f"{self.base_url}/playlists",
+            headers={**self._get_auth_headers(user), "Content-Type": "application/vnd.api+json"},
+            json={
+                "data": {
+                    "type": "playlists",
+                    "attributes": {
+                        "name": name,
+                        "description": description,
+                        "accessType": "UNLISTED",
+                    },
+                }
+            },
+            rate_key=self._rate_key(user),
+        )
+        response.raise_for_status()
+        return response.json()["data"]["id"]
+
+    def _write_playlist_items(self, method, user, playlist_id, data, position_before=None):
+        """
+        Send playlist item resources to the items relationship, in order,
+        MAX_PLAYLIST_ITEMS_PER_REQUEST at a time. Every batch is placed before
+        position_before (an item id), or at the end of the playlist without one.
+        """
+        headers = {**self._get_auth_headers(user), "Content-Type": "application/vnd.api+json"}
+        for i in range(0, len(data), MAX_PLAYLIST_ITEMS_PER_REQUEST):
+            body = {"data": data[i : i + MAX_PLAYLIST_ITEMS_PER_REQUEST]}
+            if position_before:
+                body["meta"] = {"positionBefore": position_before}
+            response = self.transport.request(
+                method,
+                self._playlist_tracks_url(playlist_id),
+                headers=headers,
+                json=body,
+                rate_key=self._rate_key(user),
+            )
+            response.raise_for_status()
+        return len(data)
+
+    def add_playlist_items(self, user, playlist_id, track_ids, position_before=None):
+        """
+        Add tracks to a playlist, in order, before the item position_before or at the end.
+        Returns the number of tracks added.
+        """
+        data = [{"id": track_id, "type": "tracks"} for track_id in track_ids]
+        return self._write_playlist_items("POST", user, playlist_id, data, position_before)
+
+    def move_playlist_items(self, user, playlist_id, items, position_before=None):
+        """
+        Move (item id, track id) entries of a playlist, in order, before the item
+        position_before or to the end. Returns the number of items moved.
+        """
+        data = [
+            {"id": track_id, "type": "tracks", "meta": {"itemId": item_id}}
+            for item_id, track_id in items
+        ]
+        return self._write_playlist_items("PATCH", user, playlist_id, data, position_before)
+
+    def remove_playlist_items(self, user, playlist_id, items):
+        """
+        Remove (item id, track id) entries from a playlist. Returns the number removed.
+        """
+        data = [
+            {"id": track_id, "type": "tracks", "meta": {"itemId": item_id}}
+            for item_id, track_id in items
+        ]
+        return self._write_playlist_items("DELETE", user, playlist_id, data)
+
+
+def parse_tracks(data, included):
+    """
+    Flatten JSON:API track resources and their included artists and albums.
+    Returns a dict keyed by track id.
+    """
+    related = {(item["type"], item["id"]): item.get("attributes", {}) for item in included}
+
+    tracks = {}
+    for item in data:
+        attributes = item.get("attributes", {})
+        relationships = item.get("relationships", {})
+
+        artists = [
+            {"id": ref["id"], "name": related.get(("artists", ref["id"]), {}).get("name")}
+            for ref in relationships.get("artists", {}).get("data", [])
+        ]
+        album = None
+        album_refs = relationships.get("albums", {}).get("data", [])
+        if album_refs:
+            album_attributes = related.get(("albums", album_refs[0]["id"]), {})
+            album = {
+                "id": album_refs[0]["id"],
+                "title": album_attributes.get("title"),
+                "release_date": album_attributes.get("releaseDate"),
+            }
+
+        tracks[item["id"]] = {
+            "id": item["id"],
+            "title": attributes.get("title"),
+            "isrc": attributes.get("isrc"),
+            "duration": attributes.get("duration"),
+            "explicit": attributes.get("explicit", False),
+            "artists": artists,
+            "album": album,
+        }
+    return tracks
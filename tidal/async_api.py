@@ -0,0 +1,383 @@
+import asyncio
+import logging
+import os
+import time
+import urllib.parse
+import weakref
+
+import httpx
+from asgiref.sync import sync_to_async
+
+from harmoniq.metrics import record_upstream
+
+from .api import (
+    MAX_FILTER_IDS,
+    MAX_PLAYLIST_ITEMS_PER_REQUEST,
+    TidalAPIClient,
+    TidalTokenManager,
+    parse_tracks,
+)
+from .http import get_fetch_workers, get_transport
+from .http_cache import SAFE_METHODS
+
+logger = logging.getLogger(__name__)
+
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client():
+    """
+    Returns the pooled keep-alive httpx client of the running event loop.
+    httpx connection pools are bound to a loop, so each loop gets its own client.
+    """
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        pool_size = int(os.getenv("TIDAL_HTTP_POOL_SIZE", "20"))
+        client = _clients[loop] = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            timeout=httpx.Timeout(
+                float(os.getenv("TIDAL_HTTP_READ_TIMEOUT", "15")),
+                connect=float(os.getenv("TIDAL_HTTP_CONNECT_TIMEOUT", "3.05")),
+            ),
+        )
+    return client
+
+
+class AsyncTidalAPIClient:
+    """
+    asyncio counterpart of TidalAPIClient for async views.
+
+    Requests share the rate-limit scheduler of the process-wide sync transport, so
+    both clients spend the same app and user budgets, and writes invalidate the
+    responses its HTTP cache stored for the user.
+    """
+
+    def __init__(self, token_manager=None, client=None, scheduler=None):
+        self.token_manager = token_manager or TidalTokenManager()
+        self.client = client
+        transport = get_transport()
+        self.scheduler = scheduler or transport.scheduler
+        self.http_cache = transport.http_cache
+        self.base_url = os.getenv("TIDAL_API_URL", "https://openapi.tidal.com/v2")
+
+    async def _request(self, method, url, rate_key=None, **kwargs):
+        client = self.client or get_async_client()
+
+        attempt = 0
+        while True:
+            await asyncio.sleep(self.scheduler.reserve(rate_key))
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+            except httpx.TransportError:
+                record_upstream(method, url, rate_key, "error", time.perf_counter() - started)
+                if not self.scheduler.should_retry(method, attempt):
+                    raise
+                response = None
+            else:
+                record_upstream(
+                    method, url, rate_key, response.status_code, time.perf_counter() - started
+                )
+                self.scheduler.observe(rate_key, response)
+                if not self.scheduler.should_retry(method, attempt, response):
+                    response.raise_for_status()
+                    if method not in SAFE_METHODS and self.http_cache is not None:
+                        await sync_to_async(self.http_cache.invalidate)(
+                            rate_key, kwargs.get("headers")
+                        )
+                    return response.json() if response.content else {}
+
+            delay = self.scheduler.retry_delay(attempt, response)
+            logger.info(f"Retrying {method} {url} in {delay:.2f}s (attempt {attempt + 1})")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _get(self, url, headers, rate_key, params=None):
+        return await self._request("GET", url, rate_key, headers=headers, params=params)
+
+    async def _get_auth_headers(self, user):
+        """Get authorization headers for API requests."""
+        token = await sync_to_async(self.token_manager.get_valid_user_token)(user)
+        if not token:
+            raise ValueError("No valid access token available for user")
+        return {"Authorization": token, "Accept": "application/vnd.api+json"}
+
+    async def _tidal_token(self, user):
+        return await sync_to_async(lambda: user.tidal_token)()
+
+    async def _user_country(self, user):
+        tidal_token = await self._tidal_token(user)
+        return tidal_token.tidal_country or "US"
+
+    async def _get_page(self, url, headers, rate_key=None):
+        """Fetch a single page of a paginated relationship."""
+        data = await self._get(url, headers, rate_key)
+        return data.get("data", []), data.get("links", {}).get("next")
+
+    async def _user_playlists_url(self, user):
+        tidal_token = await self._tidal_token(user)
+        return f"{self.base_url}/userCollections/{tidal_token.tidal_user_id}/relationships/playlists"  # noqa E501
+
+    def _playlist_tracks_url(self, playlist_id):
+        return f"{self.base_url}/playlists/{playlist_id}/relationships/items"
+
+    async def get_user_playlists(self, user, next_page_url=None):
+        """
+        Fetch user's playlists from Tidal API. Default 20 items per page.
+        """
+        headers = await self._get_auth_headers(user)
+
+        if next_page_url:
+            url = f"{self.base_url}{next_page_url}"
+        else:
+            url = await self._user_playlists_url(user)
+
+        return await self._get_page(url, headers, TidalAPIClient._rate_key(user))
+
+    async def get_playlist_tracks(self, user, playlist_id, next_page_url=None):
+        """
+        Fetch tracks from a specific playlist.
+        """
+        headers = await self._get_auth_headers(user)
+
+        if next_page_url:
+            url = f"{self.base_url}{next_page_url}"
+        else:
+            url = self._playlist_tracks_url(playlist_id)
+
+        return await self._get_page(url, headers, TidalAPIClient._rate_key(user))
+
+    async def get_playlist_details(self, user, playlist_id):
+        """
+        Get detailed information about a specific playlist.
+        """
+        headers = await self._get_auth_headers(user)
+        url = f"{self.base_url}/playlists/{playlist_id}"
+
+        data = await self._get(url, headers, TidalAPIClient._rate_key(user))
+        return data.get("data", {}).get("id", {}), data.get("data", {}).get("attributes", {}).get(
+            "name", "Unknown Playlist"
+        )
+
+    async def iter_pages(self, user, url):
+        """
+        Walk every page of a paginated relationship, yielding one list of items per page.
+        The next page is requested as soon as its cursor arrives, while the caller
+        processes the current one.
+        """
+        headers = await self._get_auth_headers(user)
+        rate_key = TidalAPIClient._rate_key(user)
+        seen_cursors = set()
+
+        task = asyncio.ensure_future(self._get_page(url, headers, rate_key))
+        while task is not None:
+            items, next_page_url = await task
+            task = None
+            if next_page_url:
+                TidalAPIClient._check_cursor(next_page_url, seen_cursors)
+                task = asyncio.ensure_future(
+                    self._get_page(f"{self.base_url}{next_page_url}", headers, rate_key)
+                )
+            yield items
+
+    async def iter_user_playlists(self, user):
+        """
+        Stream every playlist in the user's collection, page by page.
+        """
+        async for items in self.iter_pages(user, await self._user_playlists_url(user)):
+            for item in items:
+                yield item
+
+    async def iter_playlist_tracks(self, user, playlist_id):
+        """
+        Stream every item of a playlist, page by page.
+        """
+        async for items in self.iter_pages(user, self._playlist_tracks_url(playlist_id)):
+            for item in items:
+                yield item
+
+    async def get_all_user_playlists(self, user):
+        """
+        Fetch every playlist in the user's collection.
+        """
+        return [item async for item in self.iter_user_playlists(user)]
+
+    async def get_all_playlist_tracks(self, user, playlist_id):
+        """
+        Fetch every item of a playlist.
+        """
+        return [item async for item in self.iter_playlist_tracks(user, playlist_id)]
+
+    async def collect_playlists_tracks(self, user, playlist_ids, max_workers=None):
+        """
+        Fetch every item of several playlists, walking up to max_workers of them at once.
+        Returns a dict of playlist id to its ordered list of items.
+        """
+        playlist_ids = list(playlist_ids)
+        semaphore = asyncio.Semaphore(max_workers or get_fetch_workers())
+
+        async def collect(playlist_id):
+            async with semaphore:
+                return await self.get_all_playlist_tracks(user, playlist_id)
+
+        results = await asyncio.gather(*(collect(playlist_id) for playlist_id in playlist_ids))
+        return dict(zip(playlist_ids, results))
+
+    async def fetch_resources(
+        self, user, resource_type, ids, include=None, country_code=None, filter_field="id"
+    ):
+        """
+        Fetch resources of one type by id in concurrent batches of MAX_FILTER_IDS.
+        filter_field selects another filter, e.g. "isrc" for tracks.
+        Returns (data, included) lists merged across every batch.
+        """
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            return [], []
+
+        headers = await self._get_auth_headers(user)
+        rate_key = TidalAPIClient._rate_key(user)
+        country_code = country_code or await self._user_country(user)
+        params = {"countryCode": country_code}
+        if include:
+            params["include"] = list(include)
+
+        batches = [ids[i : i + MAX_FILTER_IDS] for i in range(0, len(ids), MAX_FILTER_IDS)]
+        bodies = await asyncio.gather(
+            *(
+                self._get(
+                    f"{self.base_url}/{resource_type}",
+                    headers,
+                    rate_key,
+                    params={**params, f"filter[{filter_field}]": batch},
+                )
+                for batch in batches
+            )
+        )
+
+        data, included = [], []
+        for body in bodies:
+            data.extend(body.get("data", []))
+            included.extend(body.get("included", []))
+        return data, included
+
+    async def resolve_tracks(self, user, track_ids, country_code=None):
+        """
+        Resolve track ids to their attributes together with artists and album.
+        Returns a dict keyed by track id; ids Tidal does not return are left out.
+        """
+        data, included = await self.fetch_resources(
+            user, "tracks", track_ids, include=("artists", "albums"), country_code=country_code
+        )
+        return parse_tracks(data, included)
+
+    async def resolve_isrcs(self, user, isrcs, country_code=None):
+        """
+        Look tracks up by ISRC in concurrent batches. Returns a dict of ISRC to the first
+        matching track, in the shape of parse_tracks; ISRCs without a track are left out.
+        """
+        data, included = await self.fetch_resources(
+            user,
+            "tracks",
+            isrcs,
+            include=("artists", "albums"),
+            country_code=country_code,
+            filter_field="isrc",
+        )
+
+        found = {}
+        for track in parse_tracks(data, included).values():
+            if track["isrc"]:
+                found.setdefault(track["isrc"].upper(), track)
+        return found
+
+    async def search_tracks(self, user, queries, country_code=None):
+        """
+        Search Tidal's catalog for tracks, running the queries concurrently.
+        Returns a dict of query to the track ids of its first page.
+        """
+        headers = await self._get_auth_headers(user)
+        rate_key = TidalAPIClient._rate_key(user)
+        params = {"countryCode": country_code or await self._user_country(user)}
+
+        async def search(query):
+            url = f"{self.base_url}/searchResults/{urllib.parse.quote(query, safe='')}/relationships/tracks"  # noqa E501
+            body = await self._get(url, headers, rate_key, params=params)
+            return query, [item["id"] for item in body.get("data", [])]
+
+        queries = list(dict.fromkeys(queries))
+        return dict(await asyncio.gather(*(search(query) for query in queries)))
+
+    async def create_playlist(self, user, name, description=""):
+        """
+        Create a playlist in the user's Tidal account. Returns its id.
+        """
+        headers = await self._get_auth_headers(user)
+        body = await self._request(
+            "POST",
+            f"{self.base_url}/playlists",
+            TidalAPIClient._rate_key(user),
+            headers={**headers, "Content-Type": "application/vnd.api+json"},
+            json={
+                "data": {
+                    "type": "playlists",
+                    "attributes": {
+                        "name": name,
+                        "description": description,
+                        "accessType": "UNLISTED",
+                    },
+                }
+            },
+        )
+        return body["data"]["id"]
+
+    async def _write_playlist_items(self, method, user, playlist_id, data, position_before=None):
+        """
+        Send playlist item resources to the items relationship, in order,
+        MAX_PLAYLIST_ITEMS_PER_REQUEST at a time. Every batch is placed before
+        position_before (an item id), or at the end of the playlist without one.
+        """
+        headers = await self._get_auth_headers(user)
+        headers = {**headers, "Content-Type": "application/vnd.api+json"}
+        for i in range(0, len(data), MAX_PLAYLIST_ITEMS_PER_REQUEST):
+            body = {"data": data[i : i + MAX_PLAYLIST_ITEMS_PER_REQUEST]}
+            if position_before:
+                body["meta"] = {"positionBefore": position_before}
+            await self._request(
+                method,
+                self._playlist_tracks_url(playlist_id),
+                TidalAPIClient._rate_key(user),
+                headers=headers,
+                json=body,
+            )
+        return len(data)
+
+    async def add_playlist_items(self, user, playlist_id, track_ids, position_before=None):
+        """
+        Add tracks to a playlist, in order, before the item position_before or at the end.
+        Returns the number of tracks added.
+        """
+        data = [{"id": track_id, "type": "tracks"} for track_id in track_ids]
+        return await self._write_playlist_items("POST", user, playlist_id, data, position_before)
+
+    async def move_playlist_items(self, user, playlist_id, items, position_before=None):
+        """
+        Move (item id, track id) entries of a playlist, in order, before the item
+        position_before or to the end. Returns the number of items moved.
+        """
+        data = [
+            {"id": track_id, "type": "tracks", "meta": {"itemId": item_id}}
+            for item_id, track_id in items
+        ]
+        return await self._write_playlist_items("PATCH", user, playlist_id, data, position_before)
+
+    async def remove_playlist_items(self, user, playlist_id, items):
+        """
+        Remove (item id, track id) entries from a playlist. Returns the number removed.
+        """
+        data = [
+            {"id": track_id, "type": "tracks", "meta": {"itemId": item_id}}
+            for item_id, track_id in items
+        ]
+        return await self._write_playlist_items("DELETE", user, playlist_id, data)
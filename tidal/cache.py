@@ -0,0 +1,116 @@
+import logging
+import threading
+import time
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import caches
+from django.db import close_old_connections
+
+from harmoniq.metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+
+class ReadThroughCache:
+    """
+    Per-user read-through cache for Tidal resources, stored in Django's cache framework.
+
+    Fresh values are returned directly. Stale values are still served while a
+    background thread refetches them (stale-while-revalidate). Invalidation bumps a
+    per-user, per-resource generation number so every key of that resource misses.
+    How long each resource stays fresh and stale is set in settings.TIDAL_CACHE_TTLS;
+    ttls overrides some of them.
+    """
+
+    def __init__(self, alias=None, ttls=None):
+        self.cache = caches[alias or getattr(settings, "TIDAL_CACHE_ALIAS", "default")]
+        self.ttls = {**settings.TIDAL_CACHE_TTLS, **(ttls or {})}
+
+    def _generation_key(self, user_id, resource):
+        return f"tidal:gen:{user_id}:{resource}"
+
+    def _key(self, user_id, resource, parts):
+        generation = self.cache.get(self._generation_key(user_id, resource), 0)
+        suffix = ":".join(str(part) for part in parts)
+        return f"tidal:{user_id}:{resource}:{generation}:{suffix}"
+
+    def get_or_fetch(self, user, resource, fetch, *parts):
+        """
+        Returns the cached value of resource for user, calling fetch() to fill it.
+        parts further identify the resource, e.g. a playlist id.
+        """
+        ttl, stale_ttl = self.ttls[resource]
+        key = self._key(user.pk, resource, parts)
+
+        entry = self.cache.get(key)
+        if entry is not None:
+            if entry["fresh_until"] > time.time():
+                record_cache("tidal", resource, "hit")
+                return entry["value"]
+
+            record_cache("tidal", resource, "stale")
+            self._refresh_in_background(key, fetch, ttl, stale_ttl)
+            return entry["value"]
+
+        record_cache("tidal", resource, "miss")
+        return self._fill(key, fetch, ttl, stale_ttl)
+
+    async def aget_or_fetch(self, user, resource, fetch, *parts):
+        """
+        Async variant of get_or_fetch; fetch is a coroutine function.
+        """
+        ttl, stale_ttl = self.ttls[resource]
+        generation = await self.cache.aget(self._generation_key(user.pk, resource), 0)
+        suffix = ":".join(str(part) for part in parts)
+        key = f"tidal:{user.pk}:{resource}:{generation}:{suffix}"
+
+        entry = await self.cache.aget(key)
+        if entry is not None:
+            if entry["fresh_until"] <= time.time():
+                record_cache("tidal", resource, "stale")
+                # The refresh thread has no event loop of its own, so give it one per fetch
+                self._refresh_in_background(key, async_to_sync(fetch), ttl, stale_ttl)
+            else:
+                record_cache("tidal", resource, "hit")
+            return entry["value"]
+
+        record_cache("tidal", resource, "miss")
+        value = await fetch()
+        await self.cache.aset(
+            key, {"value": value, "fresh_until": time.time() + ttl}, ttl + stale_ttl
+        )
+        return value
+
+    def _fill(self, key, fetch, ttl, stale_ttl):
+        value = fetch()
+        self.cache.set(key, {"value": value, "fresh_until": time.time() + ttl}, ttl + stale_ttl)
+        return value
+
+    def _refresh_in_background(self, key, fetch, ttl, stale_ttl):
+        # Only one refresh per key at a time, across threads and processes sharing the cache
+        lock_key = f"{key}:refreshing"
+        if not self.cache.add(lock_key, True, timeout=60):
+            return
+
+        def refresh():
+            try:
+                self._fill(key, fetch, ttl, stale_ttl)
+            except Exception as e:
+                logger.warning(f"Background refresh failed for {key}: {e}")
+            finally:
+                self.cache.delete(lock_key)
+                close_old_connections()
+
+        threading.Thread(target=refresh, name="tidal-cache-refresh", daemon=True).start()
+
+    def invalidate(self, user, *resources):
+        """
+        Drop the cached values of the given resources for user, or of every resource.
+        """
+        for resource in resources or self.ttls:
+            key = self._generation_key(user.pk, resource)
+            try:
+                self.cache.incr(key)
+            except ValueError:
+                self.cache.set(key, 1, None)
@@ -0,0 +1,139 @@
+import logging
+import os
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+
+from harmoniq.metrics import record_cache
+
+from .models import CatalogEntry
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 500
+
+
+class TrackCatalog:
+    """
+    Cross-user store of track, album and artist metadata.
+
+    Lookups are answered from CatalogEntry rows younger than the TTL; only the
+    missing or expired ids are resolved through the Tidal API, and what comes back
+    is stored for every other user of the same country.
+    """
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl or timedelta(
+            seconds=int(os.getenv("TIDAL_CATALOG_TTL_SECONDS", str(7 * 24 * 3600)))
+        )
+
+    def _fresh(self, kind, country):
+        return CatalogEntry.objects.filter(
+            kind=kind, country=country, fetched_at__gte=timezone.now() - self.ttl
+        )
+
+    def lookup(self, kind, ids, country=""):
+        """
+        Returns the fresh payloads of the given ids, keyed by Tidal id.
+        """
+        ids = list(ids)
+        payloads = {}
+        # Chunked to stay under the database's limit on query parameters
+        for i in range(0, len(ids), CHUNK_SIZE):
+            payloads.update(
+                self._fresh(kind, country)
+                .filter(tidal_id__in=ids[i : i + CHUNK_SIZE])
+                .values_list("tidal_id", "payload")
+            )
+        return payloads
+
+    def lookup_isrcs(self, isrcs, country):
+        """
+        Returns the fresh track payloads with the given ISRCs, keyed by ISRC.
+        """
+        isrcs = list(isrcs)
+        payloads = {}
+        for i in range(0, len(isrcs), CHUNK_SIZE):
+            payloads.update(
+                self._fresh(CatalogEntry.Kind.TRACK, country)
+                .filter(isrc__in=isrcs[i : i + CHUNK_SIZE])
+                .values_list("isrc", "payload")
+            )
+        return payloads
+
+    def store_tracks(self, tracks, country):
+        """
+        Store resolved tracks, as returned by parse_tracks, with their albums and artists.
+        """
+        now = timezone.now()
+        entries = {}
+        for track in tracks:
+            entries[(CatalogEntry.Kind.TRACK, track["id"], country)] = CatalogEntry(
+                kind=CatalogEntry.Kind.TRACK,
+                tidal_id=track["id"],
+                country=country,
+                isrc=track.get("isrc"),
+                payload=track,
+                fetched_at=now,
+            )
+            if track.get("album"):
+                album = track["album"]
+                entries[(CatalogEntry.Kind.ALBUM, album["id"], "")] = CatalogEntry(
+                    kind=CatalogEntry.Kind.ALBUM,
+                    tidal_id=album["id"],
+                    payload=album,
+                    fetched_at=now,
+                )
+            for artist in track.get("artists", []):
+                entries[(CatalogEntry.Kind.ARTIST, artist["id"], "")] = CatalogEntry(
+                    kind=CatalogEntry.Kind.ARTIST,
+                    tidal_id=artist["id"],
+                    payload=artist,
+                    fetched_at=now,
+                )
+
+        CatalogEntry.objects.bulk_create(
+            entries.values(),
+            batch_size=CHUNK_SIZE,
+            update_conflicts=True,
+            unique_fields=["kind", "tidal_id", "country"],
+            update_fields=["isrc", "payload", "fetched_at"],
+        )
+
+    def get_tracks(self, user, api_client, track_ids, country_code=None):
+        """
+        Resolve track ids from the catalog, fetching only misses through api_client.
+        Returns a dict keyed by track id in the shape of parse_tracks.
+        """
+        country = country_code or api_client._user_country(user)
+        track_ids = list(dict.fromkeys(track_ids))
+
+        tracks = self.lookup(CatalogEntry.Kind.TRACK, track_ids, country)
+        missing = [track_id for track_id in track_ids if track_id not in tracks]
+        if missing:
+            fetched = api_client.resolve_tracks(user, missing, country_code=country)
+            self.store_tracks(fetched.values(), country)
+            tracks.update(fetched)
+
+        record_cache("catalog", "track", "hit", len(track_ids) - len(missing))
+        record_cache("catalog", "track", "miss", len(missing))
+        logger.debug(f"Catalog served {len(track_ids) - len(missing)} of {len(track_ids)} tracks")
+        return tracks
+
+    async def aget_tracks(self, user, api_client, track_ids, country_code=None):
+        """
+        Async variant of get_tracks for AsyncTidalAPIClient.
+        """
+        country = country_code or await api_client._user_country(user)
+        track_ids = list(dict.fromkeys(track_ids))
+
+        tracks = await sync_to_async(self.lookup)(CatalogEntry.Kind.TRACK, track_ids, country)
+        missing = [track_id for track_id in track_ids if track_id not in tracks]
+        if missing:
+            fetched = await api_client.resolve_tracks(user, missing, country_code=country)
+            await sync_to_async(self.store_tracks)(fetched.values(), country)
+            tracks.update(fetched)
+        record_cache("catalog", "track", "hit", len(track_ids) - len(missing))
+        record_cache("catalog", "track", "miss", len(missing))
+        return tracks
@@ -0,0 +1,355 @@
+import bisect
+import logging
+import os
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .api import TidalAPIClient
+from .cache import ReadThroughCache
+from .catalog import TrackCatalog
+from .models import Playlist, PlaylistEditQueue, PlaylistItem, Song
+from .sync import PlaylistSyncEngine, items_fingerprint
+
+logger = logging.getLogger(__name__)
+
+
+class EditConflict(ValueError):
+    """
+    Raised when edits were made against an older revision of the playlist.
+    """
+
+    def __init__(self, revision):
+        super().__init__(f"Playlist is at revision {revision}")
+        self.revision = revision
+
+
+def debounce():
+    """
+    Returns (quiet period before a flush, longest a burst of edits can delay it).
+    """
+    return (
+        timedelta(seconds=float(os.getenv("TIDAL_EDIT_DEBOUNCE_SECONDS", "2"))),
+        timedelta(seconds=float(os.getenv("TIDAL_EDIT_MAX_DELAY_SECONDS", "10"))),
+    )
+
+
+def apply_edits(user, playlist, ops, base_revision=None, api_client=None):
+    """
+    Apply a list of edits to the local order of a synced playlist and queue them for
+    Tidal. ops are dicts, applied in order:
+      {"op": "move", "item": <PlaylistItem pk>, "to": <index>}
+      {"op": "remove", "item": <PlaylistItem pk>}
+      {"op": "add", "track": <Tidal track id>, "to": <index, default end>}
+    Raises EditConflict when base_revision is given and is not the playlist's revision,
+    and ValueError for malformed ops. Returns (new revision, flush due time).
+    """
+    ops = list(ops)
+    songs = _songs_for(user, [op["track"] for op in ops if op.get("op") == "add"], api_client)
+
+    with transaction.atomic():
+        playlist = Playlist.objects.select_for_update().get(pk=playlist.pk)
+        if base_revision is not None and base_revision != playlist.revision:
+            raise EditConflict(playlist.revision)
+
+        order = list(
+            PlaylistItem.objects.filter(playlist=playlist)
+            .order_by("position")
+            .only("id", "song_id", "position", "item_id")
+        )
+        queue = PlaylistEditQueue.objects.filter(playlist=playlist).first()
+        if queue is None:
+            queue = PlaylistEditQueue(playlist=playlist, base=snapshot(playlist))
+
+        by_pk = {row.pk: row for row in order}
+        for op in ops:
+            kind = op.get("op")
+            if kind == "add":
+                row = PlaylistItem(playlist=playlist, song_id=songs[op["track"]], position=0)
+                row.added_at = timezone.now()
+                order.insert(_index(op.get("to", len(order)), len(order)), row)
+            elif kind in ("move", "remove"):
+                row = by_pk.get(op.get("item"))
+                if row is None or row not in order:
+                    raise ValueError(f"Unknown playlist item: {op.get('item')}")
+                order.remove(row)
+                if kind == "move":
+                    order.insert(_index(op.get("to"), len(order)), row)
+            else:
+                raise ValueError(f"Unknown edit operation: {kind}")
+
+        remaining = {row.pk for row in order}
+        removed = [pk for pk in by_pk if pk not in remaining]
+        PlaylistItem.objects.filter(pk__in=removed).delete()
+        moved, added = [], []
+        for position, row in enumerate(order):
+            if row.pk is None:
+                row.position = position
+                added.append(row)
+            elif row.position != position:
+                row.position = position
+                moved.append(row)
+        PlaylistItem.objects.bulk_update(moved, ["position"], batch_size=500)
+        PlaylistItem.objects.bulk_create(added, batch_size=500)
+
+        now = timezone.now()
+        quiet, max_delay = debounce()
+        if queue.due_at is None:
+            queue.first_edit_at = now
+        queue.due_at = min(now + quiet, queue.first_edit_at + max_delay)
+        queue.save()
+
+        playlist.revision += 1
+        Playlist.objects.filter(pk=playlist.pk).update(
+            revision=playlist.revision, item_count=len(order)
+        )
+
+        from .tasks import schedule_edit_flush
+
+        due_at = queue.due_at
+        transaction.on_commit(lambda: schedule_edit_flush(playlist.pk, due_at))
+
+    ReadThroughCache().invalidate(user)
+    return playlist.revision, due_at
+
+
+def _index(value, length):
+    try:
+        index = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid position: {value}")
+    return max(0, min(index, length))
+
+
+def _songs_for(user, track_ids, api_client=None):
+    """
+    Returns Song pks of the given Tidal track ids, storing the ones not yet known.
+    """
+    track_ids = set(track_ids)
+    songs = dict(Song.objects.filter(tidal_id__in=track_ids).values_list("tidal_id", "pk"))
+    missing = track_ids - set(songs)
+    if missing:
+        api_client = api_client or TidalAPIClient()
+        tracks = TrackCatalog().get_tracks(user, api_client, missing)
+        unknown = missing - set(tracks)
+        if unknown:
+            raise ValueError(f"Unknown tracks: {', '.join(sorted(unknown))}")
+        PlaylistSyncEngine(api_client).upsert_songs(tracks.values())
+        songs.update(Song.objects.filter(tidal_id__in=missing).values_list("tidal_id", "pk"))
+    return songs
+
+
+def snapshot(playlist):
+    """
+    Returns the playlist's local order as [item id, track id] pairs.
+    """
+    return [
+        [item_id, track_id]
+        for item_id, track_id in playlist.items.order_by("position").values_list(
+            "item_id", "song__tidal_id"
+        )
+    ]
+
+
+def longest_increasing_run(values):
+    """
+    Returns the indexes of a longest strictly increasing subsequence of values.
+    """
+    tails, tail_indexes, previous = [], [], [None] * len(values)
+    for i, value in enumerate(values):
+        j = bisect.bisect_left(tails, value)
+        if j == len(tails):
+            tails.append(value)
+            tail_indexes.append(i)
+        else:
+            tails[j] = value
+            tail_indexes[j] = i
+        previous[i] = tail_indexes[j - 1] if j else None
+
+    indexes = []
+    i = tail_indexes[-1] if tail_indexes else None
+    while i is not None:
+        indexes.append(i)
+        i = previous[i]
+    return indexes[::-1]
+
+
+def plan_edits(base, current):
+    """
+    Work out the fewest Tidal item writes turning the base order into the current one.
+
+    base and current are lists of (item id, track id); current items without an item id
+    are local additions. Returns a dict with
+      "remove": [(item id, track id)],
+      "move": [(anchor item id or None, [(item id, track id)])],
+      "add": [(anchor item id or None, [track id])],
+    to be applied in that order, where each group goes right before its anchor or to
+    the end. Items on a longest run already in base order stay put; every other item
+    is moved, so reversing a 1k playlist is ~1k item moves but moving one item is one.
+    """
+    base = [tuple(item) for item in base if item[0]]
+    base_index = {item_id: i for i, (item_id, _) in enumerate(base)}
+    kept = [tuple(item) for item in current if item[0] in base_index]
+    kept_ids = {item_id for item_id, _ in kept}
+    remove = [item for item in base if item[0] not in kept_ids]
+
+    stay = {kept[i][0] for i in longest_increasing_run([base_index[i] for i, _ in kept])}
+    move = _groups(kept, lambda item: item[0] not in stay, lambda item: item)
+
+    add = _groups(
+        [tuple(item) for item in current if item[0] is None or item[0] in kept_ids],
+        lambda item: item[0] is None,
+        lambda item: item[1],
+    )
+    return {"remove": remove, "move": move, "add": add}
+
+
+def _groups(items, selected, value):
+    """
+    Runs of consecutive selected items, each with the item id following it as anchor.
+    """
+    groups, run = [], []
+    for item in items:
+        if selected(item):
+            run.append(value(item))
+        elif run:
+            groups.append((item[0], run))
+            run = []
+    if run:
+        groups.append((None, run))
+    return groups
+
+
+class EditFlusher:
+    """
+    Writes a playlist's queued local edits to Tidal as one minimal, batched diff.
+
+    Before writing, Tidal's lastModifiedAt is compared with the one of the last sync
+    or flush; when someone else changed the playlist meanwhile the local edits are
+    dropped and the playlist is re-synced from Tidal instead, bumping its revision so
+    editors reload.
+    """
+
+    def __init__(self, api_client=None):
+        self.api_client = api_client or TidalAPIClient()
+
+    def flush(self, playlist_pk, force=False):
+        """
+        Flush the playlist's queue if it is due (or force is set).
+        Returns "flushed", "conflict", or None when there was nothing to do.
+        """
+        with transaction.atomic():
+            queue = (
+                PlaylistEditQueue.objects.select_for_update()
+                .select_related("playlist__owner")
+                .filter(playlist_id=playlist_pk)
+                .first()
+            )
+            if queue is None or queue.due_at is None:
+                return None
+            if not force and queue.due_at > timezone.now():
+                return None
+            playlist, user = queue.playlist, queue.playlist.owner
+            base = queue.base
+            current = list(
+                playlist.items.order_by("position").values_list("pk", "item_id", "song__tidal_id")
+            )
+            # Edits arriving from now on are relative to what this flush writes
+            queue.due_at = None
+            queue.flushes += 1
+            queue.save(update_fields=["due_at", "flushes"])
+
+        try:
+            attributes = self._attributes(user, playlist.tidal_id)
+            modified = parse_datetime(attributes.get("lastModifiedAt") or "")
+            if playlist.last_modified_at and modified and modified != playlist.last_modified_at:
+                logger.warning(f"Playlist {playlist.tidal_id} changed on Tidal; dropping edits")
+                return self.resync(playlist)
+
+            plan = plan_edits(base, [(item_id, track_id) for _, item_id, track_id in current])
+            self.write(user, playlist.tidal_id, plan)
+
+            upstream = [
+                (item.get("meta", {}).get("itemId"), item["id"])
+                for item in self.api_client.iter_playlist_tracks(user, playlist.tidal_id)
+                if item.get("type") == "tracks"
+            ]
+            if [track_id for _, track_id in upstream] != [t for _, _, t in current]:
+                logger.warning(f"Playlist {playlist.tidal_id} differs after writing edits")
+                return self.resync(playlist)
+            attributes = self._attributes(user, playlist.tidal_id)
+        except Exception:
+            logger.exception(f"Writing edits of playlist {playlist.tidal_id} failed")
+            self.resync(playlist)
+            raise
+
+        with transaction.atomic():
+            # Local additions learn the item ids Tidal gave them
+            relabelled = {
+                pk: upstream_item_id
+                for (pk, item_id, _), (upstream_item_id, _) in zip(current, upstream)
+                if item_id != upstream_item_id
+            }
+            # Rows removed by edits made during the flush are skipped
+            rows = PlaylistItem.objects.filter(pk__in=relabelled).only("id")
+            for row in rows:
+                row.item_id = relabelled[row.pk]
+            PlaylistItem.objects.bulk_update(rows, ["item_id"], batch_size=500)
+            Playlist.objects.filter(pk=playlist.pk).update(
+                last_modified_at=parse_datetime(attributes.get("lastModifiedAt") or ""),
+                item_count=len(upstream),
+                items_fingerprint=items_fingerprint([track_id for _, track_id in upstream]),
+            )
+            queue = PlaylistEditQueue.objects.select_for_update().get(pk=queue.pk)
+            if queue.due_at is None:
+                queue.delete()
+            else:
+                queue.base = [list(item) for item in upstream]
+                queue.save(update_fields=["base"])
+        return "flushed"
+
+    def write(self, user, playlist_id, plan):
+        """
+        Send a plan from plan_edits to Tidal.
+        """
+        if plan["remove"]:
+            self.api_client.remove_playlist_items(user, playlist_id, plan["remove"])
+        for anchor, items in plan["move"]:
+            self.api_client.move_playlist_items(user, playlist_id, items, position_before=anchor)
+        for anchor, track_ids in plan["add"]:
+            self.api_client.add_playlist_items(user, playlist_id, track_ids, position_before=anchor)
+
+    def resync(self, playlist):
+        """
+        Drop the playlist's queued edits and copy its current state from Tidal.
+        """
+        PlaylistEditQueue.objects.filter(playlist=playlist).delete()
+        Playlist.objects.filter(pk=playlist.pk).update(
+            items_fingerprint="", revision=F("revision") + 1
+        )
+        playlist.refresh_from_db()
+        user = playlist.owner
+        attributes = {playlist.tidal_id: self._attributes(user, playlist.tidal_id)}
+        PlaylistSyncEngine(self.api_client).sync_playlists(
+            user, {playlist.tidal_id: playlist}, attributes
+        )
+        ReadThroughCache().invalidate(user)
+        return "conflict"
+
+    def _attributes(self, user, playlist_id):
+        data, _ = self.api_client.fetch_resources(user, "playlists", [playlist_id])
+        return data[0].get("attributes", {}) if data else {}
+
+
+def flush_due_edits(api_client=None):
+    """
+    Flush every playlist whose queued edits are due. Returns the number flushed.
+    """
+    flusher = EditFlusher(api_client)
+    due = PlaylistEditQueue.objects.filter(due_at__lte=timezone.now()).values_list(
+        "playlist_id", flat=True
+    )
+    return sum(flusher.flush(playlist_pk) is not None for playlist_pk in list(due))
@@ -0,0 +1,156 @@
+import csv
+import json
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+from .models import Playlist, PlaylistItem
+
+CHUNK_SIZE = 2000
+TRACK_URL = "https://tidal.com/browse/track/{}"
+
+
+def iter_tracks(playlist, chunk_size=CHUNK_SIZE):
+    """
+    Stream a playlist's tracks in order as flat dicts, reading chunk_size rows at a time.
+    """
+    items = (
+        PlaylistItem.objects.filter(playlist=playlist)
+        .order_by("position")
+        .select_related("song__album")
+        .prefetch_related("song__artists")
+    )
+    for item in items.iterator(chunk_size=chunk_size):
+        song = item.song
+        yield {
+            "position": item.position + 1,
+            "tidal_id": song.tidal_id,
+            "title": song.title,
+            "artists": ", ".join(artist.name for artist in song.artists.all()),
+            "album": song.album.title if song.album else "",
+            "isrc": song.ISRC or "",
+            "duration": int(song.duration.total_seconds()) if song.duration else None,
+            "url": TRACK_URL.format(song.tidal_id),
+        }
+
+
+class _Echo:
+    """
+    File-like object handing back whatever csv.writer writes to it.
+    """
+
+    def write(self, value):
+        return value
+
+
+def write_csv(playlist, tracks):
+    writer = csv.writer(_Echo())
+    fields = ["position", "title", "artists", "album", "isrc", "duration", "tidal_id", "url"]
+    yield writer.writerow(fields)
+    for track in tracks:
+        yield writer.writerow([track[field] for field in fields])
+
+
+def write_jsonl(playlist, tracks):
+    for track in tracks:
+        yield json.dumps({"playlist": playlist.tidal_id, **track}) + "\n"
+
+
+def write_m3u8(playlist, tracks):
+    yield f"#EXTM3U\n#PLAYLIST:{playlist.name}\n"
+    for track in tracks:
+        duration = track["duration"] if track["duration"] is not None else -1
+        yield f"#EXTINF:{duration},{track['artists']} - {track['title']}\n{track['url']}\n"
+
+
+def write_xspf(playlist, tracks):
+    yield (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<playlist version="1" xmlns="http://xspf.org/ns/0/">\n'
+        f"  <title>{escape(playlist.name)}</title>\n"
+        "  <trackList>\n"
+    )
+    for track in tracks:
+        duration = ""
+        if track["duration"] is not None:
+            duration = f"<duration>{track['duration'] * 1000}</duration>"
+        yield (
+            "    <track>"
+            f"<location>{escape(track['url'])}</location>"
+            f"<title>{escape(track['title'])}</title>"
+            f"<creator>{escape(track['artists'])}</creator>"
+            f"<album>{escape(track['album'])}</album>"
+            f"{duration}"
+            "</track>\n"
+        )
+    yield "  </trackList>\n</playlist>\n"
+
+
+# format: (content type, file extension, writer)
+FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv", write_csv),
+    "jsonl": ("application/jsonl; charset=utf-8", "jsonl", write_jsonl),
+    "m3u8": ("audio/x-mpegurl; charset=utf-8", "m3u8", write_m3u8),
+    "xspf": ("application/xspf+xml; charset=utf-8", "xspf", write_xspf),
+}
+
+
+def export_playlist(playlist, fmt, chunk_size=CHUNK_SIZE):
+    """
+    Stream a playlist in the given format as text chunks.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    _, _, writer = FORMATS[fmt]
+    return writer(playlist, iter_tracks(playlist, chunk_size))
+
+
+def export_filename(playlist, fmt):
+    name = re.sub(r"\s+", " ", re.sub(r"[^\w\- ]+", "", playlist.name)).strip() or "playlist"
+    return f"{name} ({playlist.tidal_id}).{FORMATS[fmt][1]}"
+
+
+class _ZipSink:
+    """
+    Unseekable file for zipfile that collects written bytes until they are drained.
+    """
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def export_library(user, fmt, chunk_size=CHUNK_SIZE):
+    """
+    Stream a ZIP archive with one file per completely synced playlist of the user as
+    byte chunks. Entries are written with data descriptors, so nothing is buffered
+    beyond a chunk.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+
+    sink = _ZipSink()
+    playlists = Playlist.objects.filter(
+        owner=user, sync_status=Playlist.SyncStatus.COMPLETED
+    ).order_by("name", "pk")
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for playlist in playlists.iterator(chunk_size=chunk_size):
+            with archive.open(export_filename(playlist, fmt), "w") as entry:
+                for chunk in export_playlist(playlist, fmt, chunk_size):
+                    entry.write(chunk.encode())
+                    data = sink.drain()
+                    if data:
+                        yield data
+            yield sink.drain()
+    yield sink.drain()
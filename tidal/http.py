@@ -0,0 +1,266 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+
+from harmoniq.metrics import record_upstream, registry
+
+from .http_cache import SAFE_METHODS, HTTPCache
+from .ratelimit import RateLimitScheduler
+
+logger = logging.getLogger(__name__)
+
+
+class TidalTransport:
+    """
+    Shared HTTP transport for all Tidal traffic.
+
+    Wraps a single requests.Session so connections to auth.tidal.com and
+    openapi.tidal.com are pooled and kept alive between calls instead of
+    paying a new TCP+TLS handshake per request. GET responses go through an
+    HTTPCache unless http_cache is False or TIDAL_HTTP_CACHE is off.
+    """
+
+    def __init__(
+        self,
+        pool_size=None,
+        connect_timeout=None,
+        read_timeout=None,
+        max_retries=0,
+        scheduler=None,
+        http_cache=None,
+    ):
+        self.pool_size = pool_size or int(os.getenv("TIDAL_HTTP_POOL_SIZE", "20"))
+        self.connect_timeout = connect_timeout or float(
+            os.getenv("TIDAL_HTTP_CONNECT_TIMEOUT", "3.05")
+        )
+        self.read_timeout = read_timeout or float(os.getenv("TIDAL_HTTP_READ_TIMEOUT", "15"))
+
+        self.scheduler = scheduler or RateLimitScheduler()
+        if http_cache is None and os.getenv("TIDAL_HTTP_CACHE", "True").lower() in (
+            "true",
+            "1",
+            "yes",
+        ):
+            http_cache = HTTPCache()
+        self.http_cache = http_cache or None
+        self.session = requests.Session()
+
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_size,
+            pool_maxsize=self.pool_size,
+            max_retries=max_retries,
+        )
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    @property
+    def timeout(self):
+        return (self.connect_timeout, self.read_timeout)
+
+    def mount(self, prefix, adapter):
+        """
+        Swap in a transport adapter for every URL starting with prefix.
+        """
+        self.session.mount(prefix, adapter)
+
+    def request(self, method, url, rate_key=None, **kwargs):
+        """
+        Send a request paced by the rate-limit scheduler. rate_key identifies whose
+        budget the request spends besides the app's (e.g. "user:12"), and whose
+        cached responses it sees.
+        Idempotent requests are retried with backoff on 429, 5xx and connection errors.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        if self.http_cache is None:
+            return self.send(method, url, rate_key, **kwargs)
+        if method == "GET":
+            return self.http_cache.fetch(self.send, url, rate_key, **kwargs)
+
+        response = self.send(method, url, rate_key, **kwargs)
+        if method not in SAFE_METHODS and response.status_code < 400:
+            self.http_cache.invalidate(rate_key, kwargs.get("headers"))
+        return response
+
+    def send(self, method, url, rate_key=None, **kwargs):
+        """
+        Send a request upstream, bypassing the cache.
+        """
+
+        attempt = 0
+        while True:
+            self.scheduler.acquire(rate_key)
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                record_upstream(method, url, rate_key, "error", time.perf_counter() - started)
+                if not self.scheduler.should_retry(method, attempt):
+                    raise
+                response = None
+            else:
+                record_upstream(
+                    method, url, rate_key, response.status_code, time.perf_counter() - started
+                )
+                self.scheduler.observe(rate_key, response)
+                if not self.scheduler.should_retry(method, attempt, response):
+                    return response
+
+            delay = self.scheduler.retry_delay(attempt, response)
+            logger.info(f"Retrying {method} {url} in {delay:.2f}s (attempt {attempt + 1})")
+            self.scheduler.wait(delay)
+            attempt += 1
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def patch(self, url, **kwargs):
+        return self.request("PATCH", url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request("DELETE", url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+class StubAdapter(BaseAdapter):
+    """
+    Transport adapter that answers requests from registered handlers without
+    touching the network. Useful for tests and offline benchmarks.
+
+    A handler receives the prepared request and returns either a
+    requests.Response or a (status_code, body) tuple where body is a dict
+    (sent as JSON), str or bytes.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.routes = []
+        self.calls = []
+        self.timeouts = []
+        self._lock = threading.Lock()
+
+    def add(self, method, url_prefix, handler):
+        self.routes.append((method.upper(), url_prefix, handler))
+
+    def send(self, request, **kwargs):
+        with self._lock:
+            self.calls.append((request.method, request.url))
+            self.timeouts.append(kwargs.get("timeout"))
+
+        for method, url_prefix, handler in self.routes:
+            if request.method == method and request.url.startswith(url_prefix):
+                result = handler(request)
+                if isinstance(result, requests.Response):
+                    result.request = request
+                    return result
+                status_code, body = result
+                return self.build_response(request, status_code, body)
+
+        return self.build_response(request, 404, {"errors": [{"detail": "No stub route"}]})
+
+    def build_response(self, request, status_code, body, headers=None):
+        response = requests.Response()
+        response.status_code = status_code
+        response.request = request
+        response.url = request.url
+        response.reason = requests.status_codes._codes.get(status_code, ("",))[0].upper()
+        response.headers.update(headers or {})
+
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body)
+            response.headers.setdefault("Content-Type", "application/vnd.api+json")
+        if isinstance(body, str):
+            body = body.encode()
+        response._content = body or b""
+        return response
+
+    def close(self):
+        pass
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_transport():
+    """
+    Returns the per-process shared transport, creating it on first use.
+    """
+    global _transport
+
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                _transport = TidalTransport()
+                logger.info(f"Created Tidal HTTP transport with pool size {_transport.pool_size}")
+    return _transport
+
+
+def set_transport(transport):
+    """
+    Replaces the per-process shared transport. Returns the previous one.
+    """
+    global _transport
+
+    with _transport_lock:
+        previous, _transport = _transport, transport
+    return previous
+
+
+@registry.collector
+def scheduler_metrics():
+    """
+    The shared transport's rate-limit scheduler counters, as gauges.
+    """
+    transport = _transport
+    if transport is None:
+        return
+    for key, value in transport.scheduler.metrics().items():
+        yield f"harmoniq_upstream_scheduler_{key}", f"Rate-limit scheduler {key}.", value
+
+
+class ContextThreadPoolExecutor(ThreadPoolExecutor):
+    """
+    Thread pool running each task in a copy of the submitter's context, so work fanned
+    out for a request is still timed against that request.
+    """
+
+    def submit(self, fn, /, *args, **kwargs):
+        return super().submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+_fetch_executor = None
+_fetch_executor_lock = threading.Lock()
+
+
+def get_fetch_workers():
+    """
+    Returns the size of the page prefetch pool.
+    """
+    return int(os.getenv("TIDAL_FETCH_WORKERS", "8"))
+
+
+def get_fetch_executor():
+    """
+    Returns the per-process bounded thread pool used to prefetch pages.
+    """
+    global _fetch_executor
+
+    if _fetch_executor is None:
+        with _fetch_executor_lock:
+            if _fetch_executor is None:
+                _fetch_executor = ContextThreadPoolExecutor(
+                    max_workers=get_fetch_workers(), thread_name_prefix="tidal-fetch"
+                )
+    return _fetch_executor
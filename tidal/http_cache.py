@@ -0,0 +1,185 @@
+import hashlib
+import os
+import time
+
+import requests
+from django.conf import settings
+from django.core.cache import caches
+from requests.structures import CaseInsensitiveDict
+
+from harmoniq.metrics import endpoint_label, record_cache
+
+# Methods that do not change anything upstream; any other request invalidates
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+# Headers describing how a body was sent rather than the body requests decoded
+HOP_HEADERS = ("content-length", "content-encoding", "transfer-encoding", "connection")
+
+
+def parse_cache_control(value):
+    """
+    Returns the directives of a Cache-Control header as a dict, e.g.
+    {"private": None, "max-age": "60"}.
+    """
+    directives = {}
+    for part in (value or "").split(","):
+        name, _, argument = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip('"') or None
+    return directives
+
+
+class HTTPCache:
+    """
+    Private HTTP cache of Tidal GET responses, stored in Django's cache framework.
+
+    Responses are stored per URL and per user (the transport's rate_key) with their
+    ETag, Last-Modified and Cache-Control. Within max-age a response is served
+    without a request; after it, the request is sent with If-None-Match and
+    If-Modified-Since, and a 304 is answered from the stored body. Any other method
+    sent on behalf of a user bumps that user's generation number, so everything
+    stored for them is revalidated before it is used again (the validators are kept).
+    """
+
+    def __init__(self, alias=None, ttl=None, max_bytes=None):
+        self.cache = caches[alias or getattr(settings, "TIDAL_HTTP_CACHE_ALIAS", "default")]
+        # How long validators are kept for revalidation after the response went stale
+        self.ttl = ttl or int(os.getenv("TIDAL_HTTP_CACHE_SECONDS", "86400"))
+        self.max_bytes = max_bytes or int(os.getenv("TIDAL_HTTP_CACHE_MAX_BYTES", "2097152"))
+
+    @staticmethod
+    def scope(rate_key, headers):
+        """
+        Whose responses a request sees: the user of rate_key, or else its credentials.
+        """
+        if rate_key:
+            return rate_key
+        authorization = CaseInsensitiveDict(headers or {}).get("Authorization", "")
+        return "auth:" + hashlib.sha256(authorization.encode()).hexdigest()[:16]
+
+    def _generation_key(self, scope):
+        return f"tidal-http:gen:{scope}"
+
+    def _key(self, scope, url, headers):
+        accept = CaseInsensitiveDict(headers or {}).get("Accept", "")
+        digest = hashlib.sha256(f"{url}\n{accept}".encode()).hexdigest()
+        return f"tidal-http:{scope}:{digest}"
+
+    def fetch(self, send, url, rate_key=None, **kwargs):
+        """
+        GET url through the cache; send(method, url, rate_key, **kwargs) sends the
+        request upstream when the cache cannot answer it.
+        """
+        full_url = requests.Request("GET", url, params=kwargs.get("params")).prepare().url
+        headers = dict(kwargs.get("headers") or {})
+        scope = self.scope(rate_key, headers)
+        key, generation_key = self._key(scope, full_url, headers), self._generation_key(scope)
+        found = self.cache.get_many([key, generation_key])
+        entry, generation = found.get(key), found.get(generation_key, 0)
+        endpoint = endpoint_label(full_url)
+
+        if entry is not None:
+            if entry["generation"] == generation and entry["fresh_until"] > time.time():
+                record_cache("http", endpoint, "hit")
+                return self._response(entry, full_url)
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = send("GET", url, rate_key, **{**kwargs, "headers": headers})
+
+        if response.status_code == 304 and entry is not None:
+            record_cache("http", endpoint, "revalidated")
+            entry = self._revalidate(entry, response, generation)
+            self.cache.set(key, entry, self._timeout(entry))
+            return self._response(entry, full_url)
+
+        record_cache("http", endpoint, "miss")
+        if response.status_code == 200:
+            self._store(key, response, generation)
+        return response
+
+    def invalidate(self, rate_key, headers=None):
+        """
+        Make every response stored for the scope of a request revalidate before use.
+        """
+        generation_key = self._generation_key(self.scope(rate_key, headers))
+        try:
+            self.cache.incr(generation_key)
+        except ValueError:
+            self.cache.set(generation_key, 1, None)
+
+    def _store(self, key, response, generation):
+        directives = parse_cache_control(response.headers.get("Cache-Control"))
+        etag, last_modified = response.headers.get("ETag"), response.headers.get("Last-Modified")
+        fresh_for = self._fresh_for(directives, response.headers)
+
+        if "no-store" in directives or response.headers.get("Vary", "").strip() == "*":
+            self.cache.delete(key)
+            return
+        if not (etag or last_modified or fresh_for):
+            return
+        if len(response.content) > self.max_bytes:
+            return
+
+        entry = {
+            "status": response.status_code,
+            "headers": {
+                name: value
+                for name, value in response.headers.items()
+                if name.lower() not in HOP_HEADERS
+            },
+            "content": response.content,
+            "etag": etag,
+            "last_modified": last_modified,
+            "fresh_until": time.time() + fresh_for,
+            "generation": generation,
+        }
+        self.cache.set(key, entry, self._timeout(entry))
+
+    def _revalidate(self, entry, response, generation):
+        """
+        Fold the headers of a 304 into the stored response, which is fresh again.
+        """
+        headers = CaseInsensitiveDict(entry["headers"])
+        for name, value in response.headers.items():
+            if name.lower() not in HOP_HEADERS:
+                headers[name] = value
+        directives = parse_cache_control(headers.get("Cache-Control"))
+        return {
+            **entry,
+            "headers": dict(headers),
+            "etag": headers.get("ETag") or entry["etag"],
+            "last_modified": headers.get("Last-Modified") or entry["last_modified"],
+            "fresh_until": time.time() + self._fresh_for(directives, headers),
+            "generation": generation,
+        }
+
+    @staticmethod
+    def _fresh_for(directives, headers):
+        """
+        Seconds a response may be served without revalidation: its max-age less its
+        Age, or 0 with no-cache or without a max-age.
+        """
+        if "no-cache" in directives:
+            return 0
+        try:
+            max_age = int(directives.get("max-age") or 0)
+            age = int(headers.get("Age") or 0)
+        except ValueError:
+            return 0
+        return max(0, max_age - age)
+
+    def _timeout(self, entry):
+        return max(self.ttl, int(entry["fresh_until"] - time.time()))
+
+    @staticmethod
+    def _response(entry, url):
+        response = requests.Response()
+        response.status_code = entry["status"]
+        response.reason = "OK"
+        response.url = url
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        response._content = entry["content"]
+        return response
@@ -0,0 +1,438 @@
+import csv
+import io
+import json
+import logging
+import os
+import re
+import tempfile
+from datetime import timedelta
+from itertools import islice
+
+from django.core.files import File
+from django.db.models import F
+from django.utils import timezone
+
+from jobs import progress
+from providers.matching import DEFAULT_THRESHOLD, Fingerprint, normalize
+
+from .api import TidalAPIClient
+from .catalog import TrackCatalog
+from .models import ImportJob, TrackResolution
+
+logger = logging.getLogger(__name__)
+
+RESOLVE_BATCH_SIZE = 500
+
+# Search hits scored against a row; Tidal ranks the likeliest recordings first
+SEARCH_CANDIDATES = 5
+TIDAL_TRACK_URL = re.compile(r"tidal\.com/(?:browse/)?track/(\d+)")
+
+
+def track_entry(line, title="", artist="", isrc="", tidal_id="", location=""):
+    """
+    One parsed line of an upload.
+    """
+    if not tidal_id and location:
+        match = TIDAL_TRACK_URL.search(location)
+        tidal_id = match.group(1) if match else ""
+    return {
+        "line": line,
+        "title": (title or "").strip(),
+        "artist": (artist or "").strip(),
+        "isrc": (isrc or "").strip().upper(),
+        "tidal_id": (tidal_id or "").strip(),
+    }
+
+
+def parse_csv(stream):
+    """
+    Parse CSV rows one at a time. Columns are matched by name, case-insensitively.
+    """
+    reader = csv.DictReader(stream)
+    columns = {name.strip().lower(): name for name in reader.fieldnames or []}
+
+    def pick(row, *names):
+        for name in names:
+            value = row.get(columns.get(name, ""), "")
+            if value:
+                return value
+        return ""
+
+    for row in reader:
+        yield track_entry(
+            reader.line_num,
+            title=pick(row, "title", "track", "track name", "name"),
+            artist=pick(row, "artist", "artists", "artist name"),
+            isrc=pick(row, "isrc"),
+            tidal_id=pick(row, "tidal_id", "tidal id"),
+            location=pick(row, "url", "location"),
+        )
+
+
+def parse_m3u(stream):
+    """
+    Parse an M3U/M3U8 playlist entry by entry. Titles come from #EXTINF lines
+    ("Artist - Title") or, failing that, from the file name.
+    """
+    extinf = None
+    for number, raw in enumerate(stream, 1):
+        line = raw.strip()
+        if line.startswith("#EXTINF"):
+            extinf = (number, line.partition(",")[2])
+            continue
+        if not line or line.startswith("#"):
+            continue
+
+        entry_line, info = extinf or (number, os.path.splitext(os.path.basename(line))[0])
+        artist, _, title = info.rpartition(" - ")
+        yield track_entry(entry_line, title=title, artist=artist, location=line)
+        extinf = None
+
+
+def _json_entry(line, item):
+    artists = item.get("artists") or item.get("artist") or ""
+    if isinstance(artists, list):
+        artists = ", ".join(
+            artist.get("name", "") if isinstance(artist, dict) else str(artist)
+            for artist in artists
+        )
+    return track_entry(
+        line,
+        title=item.get("title") or item.get("name") or "",
+        artist=artists,
+        isrc=item.get("isrc") or "",
+        tidal_id=str(item.get("tidal_id") or ""),
+        location=item.get("url") or "",
+    )
+
+
+def _iter_json_array(stream, chunk_size=65536):
+    """
+    Decode the items of a top-level JSON array without reading the whole file.
+    """
+    decoder = json.JSONDecoder()
+    buffer, eof = "", False
+
+    def fill():
+        nonlocal buffer, eof
+        chunk = stream.read(chunk_size)
+        eof = not chunk
+        buffer += chunk
+
+    while not buffer.lstrip() and not eof:
+        fill()
+    buffer = buffer.lstrip()
+    if not buffer.startswith("["):
+        raise ValueError("Expected a JSON array")
+    buffer = buffer[1:]
+
+    while True:
+        buffer = buffer.lstrip().removeprefix(",").lstrip()
+        if buffer.startswith("]"):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            if eof:
+                raise ValueError("Truncated JSON array")
+            fill()
+            continue
+        if end == len(buffer) and not eof:
+            # A scalar at the end of the buffer may continue in the next chunk
+            fill()
+            continue
+        yield item
+        buffer = buffer[end:]
+
+
+class _PrefixedStream(io.TextIOBase):
+    """
+    Text stream that yields an already consumed prefix before the rest of a stream.
+    """
+
+    def __init__(self, prefix, stream):
+        self.prefix, self.stream = prefix, stream
+
+    def read(self, size=-1):
+        prefix, self.prefix = self.prefix, ""
+        if size is None or size < 0:
+            return prefix + self.stream.read()
+        return prefix + self.stream.read(max(size - len(prefix), 0))
+
+    def readline(self, size=-1):
+        prefix, self.prefix = self.prefix, ""
+        if prefix.endswith("\n"):
+            return prefix
+        return prefix + self.stream.readline()
+
+
+def parse_json(stream):
+    """
+    Parse a JSON array of track objects, or JSON Lines, item by item.
+    """
+    first = stream.read(1)
+    while first and first.isspace():
+        first = stream.read(1)
+    if not first:
+        return
+    if first == "[":
+        items = _iter_json_array(_PrefixedStream(first, stream))
+        for index, item in enumerate(items, 1):
+            yield _json_entry(index, item)
+        return
+
+    for number, line in enumerate(_PrefixedStream(first, stream), 1):
+        if line.strip():
+            yield _json_entry(number, json.loads(line))
+
+
+PARSERS = {
+    ImportJob.Format.CSV: parse_csv,
+    ImportJob.Format.M3U: parse_m3u,
+    ImportJob.Format.JSON: parse_json,
+}
+
+
+def guess_format(filename):
+    """
+    Returns the ImportJob format for an uploaded file name, or None.
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    return {
+        ".csv": ImportJob.Format.CSV,
+        ".m3u": ImportJob.Format.M3U,
+        ".m3u8": ImportJob.Format.M3U,
+        ".json": ImportJob.Format.JSON,
+        ".jsonl": ImportJob.Format.JSON,
+    }.get(extension)
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class PlaylistImporter:
+    """
+    Imports an uploaded playlist into the user's Tidal account.
+
+    The upload is parsed incrementally and handled in batches: entries are resolved
+    to Tidal tracks by id, then ISRC, then title/artist search, with every answer
+    cached in TrackResolution, and the matches of each batch are appended to the new
+    playlist before the next batch is read. A search hit only counts when it scores
+    at least threshold against the entry's title and artist. Progress is saved on
+    the ImportJob after every batch and a per-line result CSV is attached when done.
+    """
+
+    def __init__(
+        self,
+        api_client=None,
+        catalog=None,
+        batch_size=RESOLVE_BATCH_SIZE,
+        ttl=None,
+        threshold=DEFAULT_THRESHOLD,
+    ):
+        self.api_client = api_client or TidalAPIClient()
+        self.catalog = catalog or TrackCatalog()
+        self.batch_size = batch_size
+        self.threshold = threshold
+        self.ttl = ttl or timedelta(
+            seconds=int(os.getenv("TIDAL_RESOLUTION_TTL_SECONDS", str(30 * 24 * 3600)))
+        )
+
+    def run(self, job):
+        user = job.owner
+        self._update(job, status=ImportJob.Status.RUNNING, error="")
+
+        try:
+            with tempfile.TemporaryFile("w+", newline="", encoding="utf-8") as report:
+                writer = csv.writer(report)
+                writer.writerow(["line", "status", "method", "tidal_id", "isrc", "artist", "title"])
+
+                if not job.playlist_tidal_id:
+                    playlist_id = self.api_client.create_playlist(user, job.name)
+                    self._update(job, playlist_tidal_id=playlist_id)
+
+                progress.report(stage=f"Importing {job.name}")
+                with job.source.open("rb") as raw:
+                    size = job.source.size or 1
+                    stream = io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+                    for batch in chunked(PARSERS[job.format](stream), self.batch_size):
+                        self.import_batch(job, batch, writer)
+                        # Read ahead by the text buffer, which is close enough for an ETA
+                        progress.report(fraction=raw.tell() / size)
+
+                report.seek(0)
+                job.result.save(f"import-{job.pk}.csv", File(report), save=False)
+                self._update(job, result=job.result.name, status=ImportJob.Status.COMPLETED)
+        except Exception as e:
+            logger.exception(f"Playlist import {job.pk} failed for user: {user.username}")
+            self._update(job, status=ImportJob.Status.FAILED, error=str(e))
+            raise
+
+        job.refresh_from_db()
+        return job
+
+    def import_batch(self, job, entries, writer):
+        """
+        Resolve one batch of entries, add the matches to the playlist and record results.
+        """
+        results = self.resolve(job.owner, entries)
+        track_ids = [tidal_id for tidal_id, _ in results if tidal_id]
+        self.api_client.add_playlist_items(job.owner, job.playlist_tidal_id, track_ids)
+
+        for entry, (tidal_id, method) in zip(entries, results):
+            writer.writerow(
+                [
+                    entry["line"],
+                    "matched" if tidal_id else "unmatched",
+                    method or "",
+                    tidal_id or "",
+                    entry["isrc"],
+                    entry["artist"],
+                    entry["title"],
+                ]
+            )
+
+        progress.report(items=len(track_ids))
+        ImportJob.objects.filter(pk=job.pk).update(
+            lines=F("lines") + len(entries),
+            matched=F("matched") + len(track_ids),
+            unmatched=F("unmatched") + len(entries) - len(track_ids),
+            added=F("added") + len(track_ids),
+            updated_at=timezone.now(),
+        )
+
+    def resolve(self, user, entries):
+        """
+        Resolve entries to Tidal track ids. Returns a (tidal_id, method) pair per entry,
+        with (None, None) for entries no method could match.
+        """
+        country = self.api_client._user_country(user)
+        results = [
+            (entry["tidal_id"], "tidal_id") if entry["tidal_id"] else None for entry in entries
+        ]
+
+        isrcs = {
+            entry["isrc"] for entry, result in zip(entries, results) if not result and entry["isrc"]
+        }
+        by_isrc = self.resolve_isrcs(user, isrcs, country)
+        for index, entry in enumerate(entries):
+            if not results[index] and by_isrc.get(entry["isrc"]):
+                results[index] = (by_isrc[entry["isrc"]], "isrc")
+
+        keys = {}
+        for index, entry in enumerate(entries):
+            if not results[index] and entry["title"]:
+                key = f"{normalize(entry['artist'])} - {normalize(entry['title'])}"
+                keys.setdefault(key, entry)
+        by_search = self.resolve_searches(user, keys, country)
+        for index, entry in enumerate(entries):
+            if not results[index] and entry["title"]:
+                key = f"{normalize(entry['artist'])} - {normalize(entry['title'])}"
+                if by_search.get(key):
+                    results[index] = (by_search[key], "search")
+
+        return [result or (None, None) for result in results]
+
+    def resolve_isrcs(self, user, isrcs, country):
+        """
+        Returns a dict of ISRC to Tidal track id (or None) from the resolution cache,
+        the catalog and, for the rest, batched ISRC lookups.
+        """
+        resolved = self._cached(TrackResolution.Method.ISRC, isrcs, country)
+        missing = set(isrcs) - set(resolved)
+
+        for isrc, track in self.catalog.lookup_isrcs(missing, country).items():
+            resolved[isrc] = track["id"]
+        missing -= set(resolved)
+
+        if missing:
+            tracks = self.api_client.resolve_isrcs(user, missing, country_code=country)
+            self.catalog.store_tracks(tracks.values(), country)
+            fetched = {isrc: tracks[isrc]["id"] if isrc in tracks else None for isrc in missing}
+            self._store(TrackResolution.Method.ISRC, fetched, country)
+            resolved.update(fetched)
+        return resolved
+
+    def resolve_searches(self, user, queries, country):
+        """
+        Returns a dict of search key to Tidal track id (or None). queries maps each
+        normalised key to the entry whose artist and title are searched for it when it
+        is not cached. The hit most similar to the entry is kept, unless it scores
+        below the threshold.
+        """
+        resolved = self._cached(TrackResolution.Method.SEARCH, queries, country)
+        missing = [key for key in queries if key not in resolved]
+
+        if missing:
+            texts = {
+                key: f"{queries[key]['artist']} {queries[key]['title']}".strip() for key in missing
+            }
+            found = self.api_client.search_tracks(user, list(texts.values()), country_code=country)
+            hits = {key: found.get(texts[key], [])[:SEARCH_CANDIDATES] for key in missing}
+            tracks = self.catalog.get_tracks(
+                user,
+                self.api_client,
+                [track_id for track_ids in hits.values() for track_id in track_ids],
+                country_code=country,
+            )
+            fetched = {key: self.best_hit(queries[key], hits[key], tracks) for key in missing}
+            self._store(TrackResolution.Method.SEARCH, fetched, country)
+            resolved.update(fetched)
+        return resolved
+
+    def best_hit(self, entry, track_ids, tracks):
+        """
+        Returns the id of the search hit most similar to entry, or None when none
+        scores at least the threshold.
+        """
+        fingerprint = Fingerprint(
+            {"id": None, "title": entry["title"], "artists": [{"name": entry["artist"]}]}
+        )
+        best_id, best_score = None, self.threshold
+        for track_id in track_ids:
+            if track_id in tracks:
+                score = fingerprint.similarity(Fingerprint(tracks[track_id]))
+                if score >= best_score and (best_id is None or score > best_score):
+                    best_id, best_score = track_id, score
+        return best_id
+
+    def _cached(self, method, keys, country):
+        keys = list(keys)
+        resolved = {}
+        for batch in chunked(keys, 500):
+            resolved.update(
+                TrackResolution.objects.filter(
+                    method=method,
+                    country=country,
+                    key__in=batch,
+                    resolved_at__gte=timezone.now() - self.ttl,
+                ).values_list("key", "tidal_id")
+            )
+        return resolved
+
+    def _store(self, method, resolved, country):
+        now = timezone.now()
+        TrackResolution.objects.bulk_create(
+            [
+                TrackResolution(
+                    method=method,
+                    key=key[:512],
+                    country=country,
+                    tidal_id=tidal_id,
+                    resolved_at=now,
+                )
+                for key, tidal_id in resolved.items()
+            ],
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=["method", "key", "country"],
+            update_fields=["tidal_id", "resolved_at"],
+        )
+
+    def _update(self, job, **fields):
+        for name, value in fields.items():
+            setattr(job, name, value)
+        ImportJob.objects.filter(pk=job.pk).update(**fields, updated_at=timezone.now())
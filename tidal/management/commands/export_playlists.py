@@ -0,0 +1,50 @@
+import sys
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from tidal import export
+from tidal.models import Playlist
+
+
+class Command(BaseCommand):
+    help = "Export a user's synced playlists, streaming rows straight from the database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("username")
+        parser.add_argument("--playlist", help="Tidal id of one playlist (default: ZIP of all)")
+        parser.add_argument("--format", choices=sorted(export.FORMATS), default="csv")
+        parser.add_argument("--output", "-o", default="-", help="File to write (default: stdout)")
+        parser.add_argument("--chunk-size", type=int, default=export.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"No such user: {options['username']}")
+
+        fmt, chunk_size = options["format"], options["chunk_size"]
+        if options["playlist"]:
+            try:
+                playlist = Playlist.objects.get(
+                    owner=user,
+                    tidal_id=options["playlist"],
+                    sync_status=Playlist.SyncStatus.COMPLETED,
+                )
+            except Playlist.DoesNotExist:
+                raise CommandError(f"No synced playlist {options['playlist']} for {user.username}")
+            chunks = (chunk.encode() for chunk in export.export_playlist(playlist, fmt, chunk_size))
+        else:
+            chunks = export.export_library(user, fmt, chunk_size)
+
+        if options["output"] == "-":
+            output = getattr(self.stdout, "buffer", None) or sys.stdout.buffer
+            for chunk in chunks:
+                output.write(chunk)
+            output.flush()
+            return
+
+        with open(options["output"], "wb") as output:
+            for chunk in chunks:
+                output.write(chunk)
+        self.stdout.write(f"Exported to {options['output']}")
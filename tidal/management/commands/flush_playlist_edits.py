@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from tidal.edits import flush_due_edits
+
+
+class Command(BaseCommand):
+    help = "Write queued playlist edits that are due to Tidal (e.g. after a restart)."
+
+    def handle(self, *args, **options):
+        flushed = flush_due_edits()
+        self.stdout.write(f"Flushed edits of {flushed} playlists")
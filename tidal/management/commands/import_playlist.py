@@ -0,0 +1,49 @@
+import os
+
+from django.contrib.auth.models import User
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+
+from tidal import importer
+from tidal.models import ImportJob
+
+
+class Command(BaseCommand):
+    help = "Import a CSV, M3U or JSON playlist file into a user's Tidal account."
+
+    def add_arguments(self, parser):
+        parser.add_argument("username")
+        parser.add_argument("path")
+        parser.add_argument("--name", help="Name of the new playlist (default: file name)")
+        parser.add_argument("--format", choices=ImportJob.Format.values)
+        parser.add_argument("--batch-size", type=int, default=importer.RESOLVE_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"No such user: {options['username']}")
+
+        path = options["path"]
+        filename = os.path.basename(path)
+        fmt = options["format"] or importer.guess_format(filename)
+        if fmt is None:
+            raise CommandError(f"Cannot tell the format of {filename}; pass --format")
+
+        with open(path, "rb") as source:
+            job = ImportJob(
+                owner=user,
+                name=options["name"] or os.path.splitext(filename)[0],
+                format=fmt,
+            )
+            job.source.save(filename, File(source), save=True)
+
+        try:
+            job = importer.PlaylistImporter(batch_size=options["batch_size"]).run(job)
+        except Exception as e:
+            raise CommandError(f"Import failed: {e}")
+
+        self.stdout.write(
+            f"Imported {job.added} of {job.lines} tracks into playlist {job.playlist_tidal_id} "
+            f"({job.unmatched} unmatched); results in {job.result.path}"
+        )
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from tidal import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index of the synced library."
+
+    def handle(self, *args, **options):
+        if not search.is_supported():
+            raise CommandError("Full-text search needs the SQLite database backend")
+
+        with transaction.atomic():
+            search.rebuild()
+        self.stdout.write("Search index rebuilt")
@@ -0,0 +1,34 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from tidal.sync import PlaylistSyncEngine
+
+
+class Command(BaseCommand):
+    help = "Sync Tidal playlists and their tracks into the local database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("usernames", nargs="*", help="Users to sync (default: all linked)")
+        parser.add_argument("--chunk-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(tidal_token__isnull=False)
+        if options["usernames"]:
+            users = users.filter(username__in=options["usernames"])
+            missing = set(options["usernames"]) - set(users.values_list("username", flat=True))
+            if missing:
+                raise CommandError(f"No linked Tidal account for: {', '.join(sorted(missing))}")
+
+        engine = PlaylistSyncEngine(chunk_size=options["chunk_size"])
+        failed = 0
+        for user in users:
+            try:
+                count = engine.sync_user(user)
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f"{user.username}: sync failed: {e}")
+            else:
+                self.stdout.write(f"{user.username}: synced {count} playlists")
+
+        if failed:
+            raise CommandError(f"{failed} user(s) failed to sync")
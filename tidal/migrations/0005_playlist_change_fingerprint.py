@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tidal", "0004_playlist_song"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="playlist",
+            name="item_count",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="playlist",
+            name="items_fingerprint",
+            field=models.CharField(blank=True, default="", max_length=64),
+        ),
+        migrations.AddField(
+            model_name="playlist",
+            name="last_modified_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,168 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def copy_playlist_links(apps, schema_editor):
+    """
+    Move the unordered song links into PlaylistItem, numbering them in insertion order.
+    """
+    Song = apps.get_model("tidal", "Song")
+    PlaylistItem = apps.get_model("tidal", "PlaylistItem")
+    through = Song.playlists.through
+
+    items = []
+    positions = {}
+    for playlist_id, song_id in through.objects.order_by("playlist_id", "id").values_list(
+        "playlist_id", "song_id"
+    ):
+        position = positions.get(playlist_id, 0)
+        positions[playlist_id] = position + 1
+        items.append(PlaylistItem(playlist_id=playlist_id, song_id=song_id, position=position))
+    PlaylistItem.objects.bulk_create(items, batch_size=500)
+
+
+def copy_playlist_items(apps, schema_editor):
+    Song = apps.get_model("tidal", "Song")
+    PlaylistItem = apps.get_model("tidal", "PlaylistItem")
+    through = Song.playlists.through
+
+    links = PlaylistItem.objects.values_list("playlist_id", "song_id").distinct()
+    through.objects.bulk_create(
+        [through(playlist_id=playlist_id, song_id=song_id) for playlist_id, song_id in links],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("tidal", "0005_playlist_change_fingerprint"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Artist",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("tidal_id", models.CharField(max_length=128, unique=True)),
+                ("name", models.CharField(max_length=256)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="Album",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("tidal_id", models.CharField(max_length=128, unique=True)),
+                ("title", models.CharField(max_length=256)),
+                ("release_date", models.DateField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="playlist",
+            name="owner",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="playlists",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="playlist",
+            name="tidal_id",
+            field=models.CharField(max_length=128),
+        ),
+        migrations.AddConstraint(
+            model_name="playlist",
+            constraint=models.UniqueConstraint(
+                fields=("owner", "tidal_id"), name="playlist_owner_tidal_id"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="playlist",
+            index=models.Index(fields=["owner", "name"], name="playlist_owner_name"),
+        ),
+        migrations.AddField(
+            model_name="song",
+            name="duration",
+            field=models.DurationField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="song",
+            name="album",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="songs",
+                to="tidal.album",
+            ),
+        ),
+        migrations.AddField(
+            model_name="song",
+            name="artists",
+            field=models.ManyToManyField(blank=True, related_name="songs", to="tidal.artist"),
+        ),
+        migrations.AddIndex(
+            model_name="song",
+            index=models.Index(fields=["ISRC"], name="song_isrc"),
+        ),
+        migrations.CreateModel(
+            name="PlaylistItem",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("position", models.PositiveIntegerField()),
+                ("added_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "playlist",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="items",
+                        to="tidal.playlist",
+                    ),
+                ),
+                (
+                    "song",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="playlist_items",
+                        to="tidal.song",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["playlist", "position"], name="playlistitem_position")
+                ],
+            },
+        ),
+        migrations.RunPython(copy_playlist_links, copy_playlist_items),
+        migrations.RemoveField(
+            model_name="song",
+            name="playlists",
+        ),
+        migrations.AddField(
+            model_name="song",
+            name="playlists",
+            field=models.ManyToManyField(
+                related_name="songs", through="tidal.PlaylistItem", to="tidal.playlist"
+            ),
+        ),
+    ]
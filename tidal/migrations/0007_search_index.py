@@ -0,0 +1,59 @@
+from django.db import migrations
+
+CREATE_SQL = """
+CREATE VIRTUAL TABLE tidal_search USING fts5(
+    name, detail, owner_id UNINDEXED, tidal_id UNINDEXED,
+    tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+)
+"""
+
+# rowid = pk * 4 + kind code (song 0, artist 1, album 2, playlist 3)
+BACKFILL_SQL = [
+    """
+    INSERT INTO tidal_search (rowid, name, detail, owner_id, tidal_id)
+    SELECT s.id * 4, s.title,
+           trim(coalesce(group_concat(a.name, ' '), '') || ' ' || coalesce(al.title, '')),
+           NULL, s.tidal_id
+    FROM tidal_song s
+    LEFT JOIN tidal_album al ON al.id = s.album_id
+    LEFT JOIN tidal_song_artists sa ON sa.song_id = s.id
+    LEFT JOIN tidal_artist a ON a.id = sa.artist_id
+    GROUP BY s.id
+    """,
+    """
+    INSERT INTO tidal_search (rowid, name, detail, owner_id, tidal_id)
+    SELECT id * 4 + 1, name, '', NULL, tidal_id FROM tidal_artist
+    """,
+    """
+    INSERT INTO tidal_search (rowid, name, detail, owner_id, tidal_id)
+    SELECT id * 4 + 2, title, '', NULL, tidal_id FROM tidal_album
+    """,
+    """
+    INSERT INTO tidal_search (rowid, name, detail, owner_id, tidal_id)
+    SELECT id * 4 + 3, name, '', owner_id, tidal_id FROM tidal_playlist
+    """,
+]
+
+
+def create_search_table(apps, schema_editor):
+    # FTS5 is SQLite only; other databases fall back to substring search
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute(CREATE_SQL)
+    for sql in BACKFILL_SQL:
+        schema_editor.execute(sql)
+
+
+def drop_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor == "sqlite":
+        schema_editor.execute("DROP TABLE IF EXISTS tidal_search")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tidal", "0006_library_schema"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_table, drop_search_table),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tidal", "0007_search_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CatalogEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[("track", "Track"), ("album", "Album"), ("artist", "Artist")],
+                        max_length=16,
+                    ),
+                ),
+                ("tidal_id", models.CharField(max_length=128)),
+                ("country", models.CharField(blank=True, default="", max_length=20)),
+                ("isrc", models.CharField(blank=True, max_length=50, null=True)),
+                ("payload", models.JSONField()),
+                ("fetched_at", models.DateTimeField()),
+            ],
+            options={
+                "indexes": [models.Index(fields=["isrc", "country"], name="catalogentry_isrc")],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("kind", "tidal_id", "country"), name="catalogentry_kind_id_country"
+                    )
+                ],
+            },
+        ),
+    ]
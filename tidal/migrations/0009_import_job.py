@@ -0,0 +1,94 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:18
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tidal", "0008_catalog_entry"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ImportJob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("name", models.CharField(max_length=256)),
+                (
+                    "format",
+                    models.CharField(
+                        choices=[("csv", "CSV"), ("m3u", "M3U"), ("json", "JSON / JSON Lines")],
+                        max_length=16,
+                    ),
+                ),
+                ("source", models.FileField(upload_to="imports/")),
+                ("result", models.FileField(blank=True, upload_to="imports/results/")),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("running", "Running"),
+                            ("completed", "Completed"),
+                            ("failed", "Failed"),
+                        ],
+                        default="pending",
+                        max_length=50,
+                    ),
+                ),
+                ("playlist_tidal_id", models.CharField(blank=True, default="", max_length=128)),
+                ("lines", models.PositiveIntegerField(default=0)),
+                ("matched", models.PositiveIntegerField(default=0)),
+                ("unmatched", models.PositiveIntegerField(default=0)),
+                ("added", models.PositiveIntegerField(default=0)),
+                ("error", models.TextField(blank=True, default="")),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "owner",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="import_jobs",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="TrackResolution",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                (
+                    "method",
+                    models.CharField(
+                        choices=[("isrc", "ISRC"), ("search", "Search")], max_length=16
+                    ),
+                ),
+                ("key", models.CharField(max_length=512)),
+                ("country", models.CharField(max_length=20)),
+                ("tidal_id", models.CharField(blank=True, max_length=128, null=True)),
+                ("resolved_at", models.DateTimeField()),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("method", "key", "country"),
+                        name="trackresolution_method_key_country",
+                    )
+                ],
+            },
+        ),
+    ]
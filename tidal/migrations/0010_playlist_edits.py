@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tidal", "0009_import_job"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="playlist",
+            name="revision",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="playlistitem",
+            name="item_id",
+            field=models.CharField(blank=True, max_length=128, null=True),
+        ),
+        migrations.CreateModel(
+            name="PlaylistEditQueue",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("base", models.JSONField(default=list)),
+                ("first_edit_at", models.DateTimeField(blank=True, null=True)),
+                ("due_at", models.DateTimeField(blank=True, null=True)),
+                ("flushes", models.PositiveIntegerField(default=0)),
+                (
+                    "playlist",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="edit_queue",
+                        to="tidal.playlist",
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -24,22 +24,197 @@ class Playlist(models.Model):
         COMPLETED = "completed", "Completed"
         FAILED = "failed", "Failed"
 
-    tidal_id = models.CharField(max_length=128, unique=True)
+    owner = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="playlists", null=True, blank=True
+    )
+    tidal_id = models.CharField(max_length=128)
     name = models.CharField(max_length=256)
     sync_status = models.CharField(
         choices=SyncStatus.choices, max_length=50, default=SyncStatus.PENDING
     )
     synced_at = models.DateTimeField(auto_now=True)
+    last_modified_at = models.DateTimeField(null=True, blank=True)
+    item_count = models.PositiveIntegerField(null=True, blank=True)
+    items_fingerprint = models.CharField(max_length=64, blank=True, default="")
+    # Bumped on every local edit, so editors can detect they worked on a stale order
+    revision = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["owner", "tidal_id"], name="playlist_owner_tidal_id")
+        ]
+        indexes = [models.Index(fields=["owner", "name"], name="playlist_owner_name")]
+
+    def __str__(self):
+        return self.name
+
+    def ordered_items(self):
+        """
+        Returns the playlist's items in order with their song, album and artists loaded.
+        """
+        return (
+            self.items.order_by("position")
+            .select_related("song__album")
+            .prefetch_related("song__artists")
+        )
+
+
+class Artist(models.Model):
+    tidal_id = models.CharField(max_length=128, unique=True)
+    name = models.CharField(max_length=256)
 
     def __str__(self):
         return self.name
 
 
+class Album(models.Model):
+    tidal_id = models.CharField(max_length=128, unique=True)
+    title = models.CharField(max_length=256)
+    release_date = models.DateField(null=True, blank=True)
+
+    def __str__(self):
+        return self.title
+
+
 class Song(models.Model):
     tidal_id = models.CharField(max_length=128, unique=True)
     title = models.CharField(max_length=256)
     ISRC = models.CharField(max_length=50, null=True, blank=True)
-    playlists = models.ManyToManyField(Playlist, related_name="songs")
+    duration = models.DurationField(null=True, blank=True)
+    album = models.ForeignKey(
+        Album, on_delete=models.SET_NULL, related_name="songs", null=True, blank=True
+    )
+    artists = models.ManyToManyField(Artist, related_name="songs", blank=True)
+    playlists = models.ManyToManyField(Playlist, through="PlaylistItem", related_name="songs")
+
+    class Meta:
+        indexes = [models.Index(fields=["ISRC"], name="song_isrc")]
+
+    def __str__(self):
+        artists = ", ".join(artist.name for artist in self.artists.all())
+        return f"{self.title} by {artists}" if artists else self.title
+
+
+class PlaylistItem(models.Model):
+    playlist = models.ForeignKey(Playlist, on_delete=models.CASCADE, related_name="items")
+    song = models.ForeignKey(Song, on_delete=models.CASCADE, related_name="playlist_items")
+    position = models.PositiveIntegerField()
+    added_at = models.DateTimeField(null=True, blank=True)
+    # Tidal's id of this entry (meta.itemId); null for local additions not yet written
+    item_id = models.CharField(max_length=128, null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["playlist", "position"], name="playlistitem_position"),
+        ]
+
+    def __str__(self):
+        return f"{self.playlist} #{self.position}: {self.song}"
+
+
+class PlaylistEditQueue(models.Model):
+    """
+    Local edits of a playlist waiting to be written to Tidal.
+
+    base holds Tidal's order of the playlist as [item id, track id] pairs when the
+    queue was last flushed; a flush writes the difference between it and the local
+    order. due_at is pushed back by every edit, so a burst of edits is flushed once.
+    """
+
+    playlist = models.OneToOneField(Playlist, on_delete=models.CASCADE, related_name="edit_queue")
+    base = models.JSONField(default=list)
+    first_edit_at = models.DateTimeField(null=True, blank=True)
+    due_at = models.DateTimeField(null=True, blank=True)
+    flushes = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Edits of {self.playlist} due {self.due_at}"
+
+
+class CatalogEntry(models.Model):
+    """
+    Shared metadata of a Tidal track, album or artist, cached for every user.
+    Tracks are stored per country since availability differs; albums and artists
+    are stored once with an empty country.
+    """
+
+    class Kind(models.TextChoices):
+        TRACK = "track", "Track"
+        ALBUM = "album", "Album"
+        ARTIST = "artist", "Artist"
+
+    kind = models.CharField(choices=Kind.choices, max_length=16)
+    tidal_id = models.CharField(max_length=128)
+    country = models.CharField(max_length=20, blank=True, default="")
+    isrc = models.CharField(max_length=50, null=True, blank=True)
+    payload = models.JSONField()
+    fetched_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["kind", "tidal_id", "country"], name="catalogentry_kind_id_country"
+            )
+        ]
+        indexes = [models.Index(fields=["isrc", "country"], name="catalogentry_isrc")]
+
+    def __str__(self):
+        return f"{self.kind} {self.tidal_id} ({self.country or 'global'})"
+
+
+class TrackResolution(models.Model):
+    """
+    Cached answer to "which Tidal track is this?" for an ISRC or a normalised
+    "artist - title" search, per country. A null tidal_id records a known miss.
+    """
+
+    class Method(models.TextChoices):
+        ISRC = "isrc", "ISRC"
+        SEARCH = "search", "Search"
+
+    method = models.CharField(choices=Method.choices, max_length=16)
+    key = models.CharField(max_length=512)
+    country = models.CharField(max_length=20)
+    tidal_id = models.CharField(max_length=128, null=True, blank=True)
+    resolved_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["method", "key", "country"], name="trackresolution_method_key_country"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.method} {self.key} -> {self.tidal_id or 'not found'}"
+
+
+class ImportJob(models.Model):
+    class Format(models.TextChoices):
+        CSV = "csv", "CSV"
+        M3U = "m3u", "M3U"
+        JSON = "json", "JSON / JSON Lines"
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "Pending"
+        RUNNING = "running", "Running"
+        COMPLETED = "completed", "Completed"
+        FAILED = "failed", "Failed"
+
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="import_jobs")
+    name = models.CharField(max_length=256)
+    format = models.CharField(choices=Format.choices, max_length=16)
+    source = models.FileField(upload_to="imports/")
+    result = models.FileField(upload_to="imports/results/", blank=True)
+    status = models.CharField(choices=Status.choices, max_length=50, default=Status.PENDING)
+    playlist_tidal_id = models.CharField(max_length=128, blank=True, default="")
+    lines = models.PositiveIntegerField(default=0)
+    matched = models.PositiveIntegerField(default=0)
+    unmatched = models.PositiveIntegerField(default=0)
+    added = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
-        return f"{self.title} by {self.artist}"
+        return f"Import {self.name} ({self.status})"
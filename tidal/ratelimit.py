@@ -0,0 +1,214 @@
+import email.utils
+import logging
+import os
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at `rate` tokens per second up to `capacity`.
+
+    Callers reserve tokens up front and are told how long to wait for them, so the
+    bucket may go negative while a queue of callers sleeps off the deficit.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now):
+        elapsed = max(0.0, now - self.updated)
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated = max(self.updated, now)
+
+    def reserve(self, now, cost=1):
+        """Take cost tokens and return the seconds to wait before using them."""
+        self._refill(now)
+        self.tokens -= cost
+        wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        return max(wait, self.blocked_until - now)
+
+    def update(self, now, rate=None, capacity=None, remaining=None):
+        """Align the bucket with limits reported by the server."""
+        self._refill(now)
+        if rate:
+            self.rate = rate
+        if capacity:
+            self.capacity = capacity
+        if remaining is not None:
+            self.tokens = min(self.tokens, remaining)
+
+    def block(self, now, seconds):
+        self.blocked_until = max(self.blocked_until, now + seconds)
+
+
+class RateLimitScheduler:
+    """
+    Paces Tidal requests with one token bucket for the whole app and one per user,
+    adapts the user buckets to Tidal's X-RateLimit-* headers, honours Retry-After
+    and computes jittered exponential backoff for retries.
+    """
+
+    RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(
+        self,
+        app_rate=None,
+        app_burst=None,
+        user_rate=None,
+        user_burst=None,
+        max_retries=None,
+        backoff_base=None,
+        backoff_max=None,
+    ):
+        self.app_rate = app_rate or float(os.getenv("TIDAL_RATE_LIMIT_APP_RPS", "50"))
+        self.app_burst = app_burst or float(os.getenv("TIDAL_RATE_LIMIT_APP_BURST", "100"))
+        self.user_rate = user_rate or float(os.getenv("TIDAL_RATE_LIMIT_USER_RPS", "10"))
+        self.user_burst = user_burst or float(os.getenv("TIDAL_RATE_LIMIT_USER_BURST", "20"))
+        self.max_retries = (
+            max_retries
+            if max_retries is not None
+            else int(os.getenv("TIDAL_HTTP_MAX_RETRIES", "4"))
+        )
+        self.backoff_base = backoff_base or float(os.getenv("TIDAL_HTTP_BACKOFF_BASE", "0.5"))
+        self.backoff_max = backoff_max or float(os.getenv("TIDAL_HTTP_BACKOFF_MAX", "30"))
+
+        self.sleep = time.sleep
+        self._lock = threading.Lock()
+        self._app_bucket = TokenBucket(self.app_rate, self.app_burst)
+        self._user_buckets = {}
+        self._metrics = {
+            "requests": 0,
+            "throttled": 0,
+            "retries": 0,
+            "waits": 0,
+            "wait_seconds": 0.0,
+            "queue_depth": 0,
+            "max_queue_depth": 0,
+        }
+
+    def _user_bucket(self, rate_key):
+        bucket = self._user_buckets.get(rate_key)
+        if bucket is None:
+            bucket = self._user_buckets[rate_key] = TokenBucket(self.user_rate, self.user_burst)
+        return bucket
+
+    def reserve(self, rate_key=None):
+        """
+        Reserve a request slot for the app and for rate_key (usually a user).
+        Returns the seconds the caller must wait before sending.
+        """
+        with self._lock:
+            now = time.monotonic()
+            wait = self._app_bucket.reserve(now)
+            if rate_key is not None:
+                wait = max(wait, self._user_bucket(rate_key).reserve(now))
+            self._metrics["requests"] += 1
+            if wait > 0:
+                self._metrics["waits"] += 1
+                self._metrics["wait_seconds"] += wait
+            return wait
+
+    def acquire(self, rate_key=None):
+        """Block until a request may be sent for rate_key."""
+        self.wait(self.reserve(rate_key))
+
+    def wait(self, seconds):
+        if seconds <= 0:
+            return
+        self._enter_queue()
+        try:
+            self.sleep(seconds)
+        finally:
+            self._leave_queue()
+
+    def _enter_queue(self):
+        with self._lock:
+            self._metrics["queue_depth"] += 1
+            self._metrics["max_queue_depth"] = max(
+                self._metrics["max_queue_depth"], self._metrics["queue_depth"]
+            )
+
+    def _leave_queue(self):
+        with self._lock:
+            self._metrics["queue_depth"] -= 1
+
+    def observe(self, rate_key, response):
+        """
+        Learn from a response: adapt the bucket to Tidal's rate-limit headers and stop
+        sending for the Retry-After period on a 429.
+        """
+        headers = response.headers
+        with self._lock:
+            now = time.monotonic()
+            bucket = self._app_bucket if rate_key is None else self._user_bucket(rate_key)
+            bucket.update(
+                now,
+                rate=_float_header(headers, "X-RateLimit-Replenish-Rate"),
+                capacity=_float_header(headers, "X-RateLimit-Burst-Capacity"),
+                remaining=_float_header(headers, "X-RateLimit-Remaining"),
+            )
+
+            if response.status_code == 429:
+                self._metrics["throttled"] += 1
+                retry_after = parse_retry_after(headers.get("Retry-After"))
+                if retry_after is not None:
+                    bucket.block(now, retry_after)
+                    logger.warning(f"Tidal rate limit hit for {rate_key or 'app'}: {retry_after}s")
+
+    def retry_delay(self, attempt, response=None):
+        """
+        Seconds to wait before retry number attempt (starting at 0). Uses Retry-After
+        when the server sent one, full-jitter exponential backoff otherwise.
+        """
+        with self._lock:
+            self._metrics["retries"] += 1
+
+        if response is not None:
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if retry_after is not None:
+                return retry_after
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+    def should_retry(self, method, attempt, response=None):
+        if method.upper() not in ("GET", "HEAD", "OPTIONS") or attempt >= self.max_retries:
+            return False
+        return response is None or response.status_code in self.RETRYABLE_STATUSES
+
+    def metrics(self):
+        """
+        Returns a snapshot of request, throttling and queueing counters.
+        """
+        with self._lock:
+            return {**self._metrics, "tracked_users": len(self._user_buckets)}
+
+
+def _float_header(headers, name):
+    try:
+        return float(headers[name])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def parse_retry_after(value):
+    """
+    Parse a Retry-After header given either as seconds or as an HTTP date.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
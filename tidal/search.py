@@ -0,0 +1,179 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Album, Artist, Playlist, Song
+
+# Rows of the FTS5 table get rowid = pk * len(KINDS) + kind code, so a row can be
+# replaced by rowid without scanning the unindexed columns
+KINDS = ("song", "artist", "album", "playlist")
+KIND_CODES = {kind: code for code, kind in enumerate(KINDS)}
+
+MAX_LIMIT = 100
+CHUNK_SIZE = 500
+
+# Ranking every match of a one or two letter prefix over a large library is what makes
+# type-ahead slow, so only the first MAX_CANDIDATES matches in the user's library are
+# ranked
+MAX_CANDIDATES = 1000
+
+INDEX_SQL = {
+    "song": """
+        SELECT s.id * 4, s.title,
+               trim(coalesce(group_concat(a.name, ' '), '') || ' ' || coalesce(al.title, '')),
+               NULL, s.tidal_id
+        FROM tidal_song s
+        LEFT JOIN tidal_album al ON al.id = s.album_id
+        LEFT JOIN tidal_song_artists sa ON sa.song_id = s.id
+        LEFT JOIN tidal_artist a ON a.id = sa.artist_id
+        WHERE s.id IN ({ids})
+        GROUP BY s.id
+    """,
+    "artist": "SELECT id * 4 + 1, name, '', NULL, tidal_id FROM tidal_artist WHERE id IN ({ids})",
+    "album": "SELECT id * 4 + 2, title, '', NULL, tidal_id FROM tidal_album WHERE id IN ({ids})",
+    "playlist": """
+        SELECT id * 4 + 3, name, '', owner_id, tidal_id FROM tidal_playlist WHERE id IN ({ids})
+    """,
+}
+
+# The search rowids of the user's library: their playlists and the songs, artists and
+# albums on them. Songs, artists and albums are shared between users, so a match is
+# only visible to a user when its rowid is in here
+LIBRARY_SQL = """
+    SELECT p.id * 4 + 3 FROM tidal_playlist p WHERE p.owner_id = %(user)s
+    UNION
+    SELECT i.song_id * 4 FROM tidal_playlistitem i
+    JOIN tidal_playlist p ON p.id = i.playlist_id
+    WHERE p.owner_id = %(user)s
+    UNION
+    SELECT sa.artist_id * 4 + 1 FROM tidal_song_artists sa
+    JOIN tidal_playlistitem i ON i.song_id = sa.song_id
+    JOIN tidal_playlist p ON p.id = i.playlist_id
+    WHERE p.owner_id = %(user)s
+    UNION
+    SELECT s.album_id * 4 + 2 FROM tidal_song s
+    JOIN tidal_playlistitem i ON i.song_id = s.id
+    JOIN tidal_playlist p ON p.id = i.playlist_id
+    WHERE p.owner_id = %(user)s AND s.album_id IS NOT NULL
+"""
+
+
+def is_supported():
+    """
+    Tells whether the database has the FTS5 search table (SQLite only).
+    """
+    return connection.vendor == "sqlite"
+
+
+def index(kind, pks):
+    """
+    Add or refresh the search rows of the given rows of one kind.
+    """
+    pks = list(pks)
+    if not pks or not is_supported():
+        return
+
+    with connection.cursor() as cursor:
+        for i in range(0, len(pks), CHUNK_SIZE):
+            chunk = pks[i : i + CHUNK_SIZE]
+            ids = ", ".join(["%s"] * len(chunk))
+            rowids = [pk * len(KINDS) + KIND_CODES[kind] for pk in chunk]
+            cursor.execute(f"DELETE FROM tidal_search WHERE rowid IN ({ids})", rowids)
+            cursor.execute(
+                "INSERT INTO tidal_search (rowid, name, detail, owner_id, tidal_id) "
+                + INDEX_SQL[kind].format(ids=ids),
+                chunk,
+            )
+
+
+def unindex(kind, pks):
+    """
+    Remove the search rows of the given rows of one kind, e.g. before deleting them.
+    """
+    pks = list(pks)
+    if not pks or not is_supported():
+        return
+
+    with connection.cursor() as cursor:
+        for i in range(0, len(pks), CHUNK_SIZE):
+            chunk = pks[i : i + CHUNK_SIZE]
+            ids = ", ".join(["%s"] * len(chunk))
+            rowids = [pk * len(KINDS) + KIND_CODES[kind] for pk in chunk]
+            cursor.execute(f"DELETE FROM tidal_search WHERE rowid IN ({ids})", rowids)
+
+
+def rebuild():
+    """
+    Rebuild the whole search table from the library tables.
+    """
+    if not is_supported():
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute("DELETE FROM tidal_search")
+    for kind, model in zip(KINDS, (Song, Artist, Album, Playlist)):
+        index(kind, model.objects.values_list("pk", flat=True).iterator())
+
+
+def build_match_query(query):
+    """
+    Turn user input into an FTS5 query matching every word as a prefix, for type-ahead.
+    Returns an empty string when the input has no searchable words.
+    """
+    words = re.findall(r"\w+", query.lower())
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def search(user, query, limit=20):
+    """
+    Search the user's synced library, best matches first.
+    Returns a list of {"type", "id", "name", "detail"} dicts where id is the Tidal id.
+    """
+    limit = max(1, min(int(limit), MAX_LIMIT))
+    match = build_match_query(query)
+    if not match:
+        return []
+
+    if not is_supported():
+        return _search_without_fts(user, query, limit)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT c.rowid, c.name, c.detail, c.tidal_id FROM (
+                SELECT rowid, name, detail, tidal_id, bm25(tidal_search, 10.0, 2.0) AS score
+                FROM tidal_search
+                WHERE tidal_search MATCH %(match)s AND rowid IN ({LIBRARY_SQL})
+                LIMIT %(candidates)s
+            ) c
+            ORDER BY c.score
+            LIMIT %(limit)s
+            """,
+            {"match": match, "user": user.pk, "candidates": MAX_CANDIDATES, "limit": limit},
+        )
+        return [
+            {"type": KINDS[rowid % len(KINDS)], "id": tidal_id, "name": name, "detail": detail}
+            for rowid, name, detail, tidal_id in cursor.fetchall()
+        ]
+
+
+def _search_without_fts(user, query, limit):
+    """
+    Substring search for databases without FTS5; unranked and much slower.
+    """
+    playlists = Playlist.objects.filter(owner=user, name__icontains=query)
+    songs = (
+        Song.objects.filter(playlists__owner=user)
+        .filter(Q(title__icontains=query) | Q(artists__name__icontains=query))
+        .distinct()
+    )
+    results = [
+        {"type": "playlist", "id": playlist.tidal_id, "name": playlist.name, "detail": ""}
+        for playlist in playlists[:limit]
+    ]
+    results += [
+        {"type": "song", "id": song.tidal_id, "name": song.title, "detail": ""}
+        for song in songs[: limit - len(results)]
+    ]
+    return results
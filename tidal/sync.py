@@ -0,0 +1,433 @@
+import hashlib
+import logging
+import math
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime, parse_duration
+
+from jobs import progress
+
+from . import search
+from .api import ITEMS_PER_PAGE, TidalAPIClient
+from .cache import ReadThroughCache
+from .catalog import TrackCatalog
+from .models import Album, Artist, Playlist, PlaylistEditQueue, PlaylistItem, Song
+
+logger = logging.getLogger(__name__)
+
+
+def items_fingerprint(track_ids):
+    """
+    Returns a hash of the ordered track ids of a playlist.
+    """
+    return hashlib.sha256("\n".join(track_ids).encode()).hexdigest()
+
+
+class PlaylistSyncEngine:
+    """
+    Copies a user's Tidal playlists and their tracks into the local database.
+
+    Syncs are incremental: playlists whose `lastModifiedAt` and item count match
+    what was stored last time are skipped without fetching their items, and for
+    changed playlists only the added, removed and moved items are written.
+    """
+
+    def __init__(self, api_client=None, chunk_size=500, catalog=None):
+        self.api_client = api_client or TidalAPIClient()
+        self.catalog = catalog or TrackCatalog()
+        self.chunk_size = chunk_size
+
+    def sync_user(self, user, force=False):
+        """
+        Sync the playlists in the user's collection that changed since the last sync,
+        or every playlist when force is set.
+        Returns the number of playlists synced.
+        """
+        playlists, changed = self.plan_user(user, force)
+        if not changed:
+            return 0
+
+        synced = self.sync_playlists(
+            user, {tidal_id: playlists[tidal_id] for tidal_id in changed}, changed
+        )
+        ReadThroughCache().invalidate(user)
+        return synced
+
+    def plan_user(self, user, force=False):
+        """
+        Store the playlists in the user's collection, remove the ones that left it, and
+        mark the ones that changed since the last sync, or all of them when force is
+        set, as pending.
+        Returns (Playlist rows keyed by Tidal id, attributes of the changed playlists
+        keyed by Tidal id).
+        """
+        playlist_ids = [item["id"] for item in self.api_client.get_all_user_playlists(user)]
+        self.remove_playlists(user, playlist_ids)
+        if not playlist_ids:
+            return {}, {}
+
+        playlist_data, _ = self.api_client.fetch_resources(user, "playlists", playlist_ids)
+        existing = self.user_playlists(user, playlist_ids)
+        # Playlists with local edits waiting to be written are brought up to date by the
+        # edit flush; syncing them now would undo those edits
+        editing = self.editing(user)
+        changed = {
+            item["id"]: item.get("attributes", {})
+            for item in playlist_data
+            if item["id"] not in editing
+            and (force or self.has_changed(existing.get(item["id"]), item.get("attributes", {})))
+        }
+        logger.info(
+            f"Syncing {len(changed)} of {len(playlist_ids)} playlists for user: {user.username}"
+        )
+
+        playlists = self.upsert_playlists(user, playlist_data)
+        if changed:
+            self._set_status(
+                Playlist.objects.filter(owner=user, tidal_id__in=changed),
+                Playlist.SyncStatus.PENDING,
+            )
+        return playlists, changed
+
+    def sync_playlist(self, user, tidal_id, attributes=None):
+        """
+        Sync one of the user's playlists, e.g. one planned by plan_user. Without
+        attributes, the playlist is fetched from Tidal first.
+        Returns the number of playlists synced: 0 when the playlist is gone or has
+        edits waiting to be written.
+        """
+        if tidal_id in self.editing(user):
+            return 0
+        if attributes is None:
+            playlist_data, _ = self.api_client.fetch_resources(user, "playlists", [tidal_id])
+            if not playlist_data:
+                return 0
+            attributes = playlist_data[0].get("attributes", {})
+            playlists = self.upsert_playlists(user, playlist_data)
+        else:
+            playlists = self.user_playlists(user, [tidal_id])
+        if tidal_id not in playlists:
+            return 0
+
+        synced = self.sync_playlists(user, {tidal_id: playlists[tidal_id]}, {tidal_id: attributes})
+        ReadThroughCache().invalidate(user)
+        return synced
+
+    @staticmethod
+    def editing(user):
+        """
+        Returns the Tidal ids of user's playlists with local edits waiting to be written.
+        """
+        return set(
+            PlaylistEditQueue.objects.filter(playlist__owner=user).values_list(
+                "playlist__tidal_id", flat=True
+            )
+        )
+
+    @staticmethod
+    def has_changed(playlist, attributes):
+        """
+        Tells whether a stored playlist is out of date with Tidal's playlist attributes.
+        """
+        if playlist is None or playlist.sync_status != Playlist.SyncStatus.COMPLETED:
+            return True
+
+        last_modified_at = parse_datetime(attributes.get("lastModifiedAt") or "")
+        item_count = attributes.get("numberOfItems")
+        if last_modified_at is None and item_count is None:
+            return True
+
+        return last_modified_at != playlist.last_modified_at or item_count != playlist.item_count
+
+    def upsert_playlists(self, user, playlist_data):
+        """
+        Create or rename user's Playlist rows from Tidal playlist resources.
+        Returns the rows keyed by Tidal id.
+        """
+        rows = [
+            Playlist(
+                owner=user,
+                tidal_id=item["id"],
+                name=(item.get("attributes", {}).get("name") or "Unknown Playlist")[:256],
+            )
+            for item in playlist_data
+        ]
+        Playlist.objects.bulk_create(
+            rows,
+            batch_size=self.chunk_size,
+            update_conflicts=True,
+            unique_fields=["owner", "tidal_id"],
+            update_fields=["name"],
+        )
+        tidal_ids = [row.tidal_id for row in rows]
+        playlists = self.user_playlists(user, tidal_ids)
+        search.index("playlist", [playlist.pk for playlist in playlists.values()])
+        return playlists
+
+    @staticmethod
+    def remove_playlists(user, tidal_ids):
+        """
+        Delete user's Playlist rows, with their items and search rows, whose Tidal id is
+        not among tidal_ids, the playlists now in the collection.
+        Returns the number of playlists removed.
+        """
+        pks = list(
+            Playlist.objects.filter(owner=user)
+            .exclude(tidal_id__in=tidal_ids)
+            .values_list("pk", flat=True)
+        )
+        if not pks:
+            return 0
+
+        logger.info(
+            f"Removing {len(pks)} playlists no longer in the collection of: {user.username}"
+        )
+        search.unindex("playlist", pks)
+        Playlist.objects.filter(pk__in=pks).delete()
+        ReadThroughCache().invalidate(user)
+        return len(pks)
+
+    @staticmethod
+    def user_playlists(user, tidal_ids):
+        """
+        Returns user's Playlist rows with the given Tidal ids, keyed by Tidal id.
+        """
+        return {
+            playlist.tidal_id: playlist
+            for playlist in Playlist.objects.filter(owner=user, tidal_id__in=tidal_ids)
+        }
+
+    def sync_playlists(self, user, playlists, attributes=None):
+        """
+        Fetch the items of the given playlists and apply what changed.
+        playlists is a dict of Tidal id to Playlist row; attributes optionally maps
+        Tidal id to the playlist attributes used as its change fingerprint.
+        """
+        attributes = attributes or {}
+        queryset = Playlist.objects.filter(pk__in=[p.pk for p in playlists.values()])
+        self._set_status(queryset, Playlist.SyncStatus.IN_PROGRESS)
+
+        names = ", ".join(playlist.name for playlist in playlists.values())
+        expected_pages = sum(
+            max(
+                1,
+                math.ceil(
+                    (attributes.get(tidal_id, {}).get("numberOfItems") or 0) / ITEMS_PER_PAGE
+                ),
+            )
+            for tidal_id in playlists
+        )
+        fetched_pages = 0
+
+        def on_page(tidal_id, page):
+            nonlocal fetched_pages
+            fetched_pages += 1
+            progress.report(pages=1, fraction=min(fetched_pages / expected_pages, 1.0))
+
+        progress.report(stage=f"Fetching {names}")
+        try:
+            items = self.api_client.collect_playlists_tracks(
+                user, playlists.keys(), on_page=on_page
+            )
+            items = {
+                tidal_id: [item for item in playlist_items if item.get("type") == "tracks"]
+                for tidal_id, playlist_items in items.items()
+            }
+            track_ids = {
+                tidal_id: [item["id"] for item in playlist_items]
+                for tidal_id, playlist_items in items.items()
+            }
+            changed_ids = {
+                tidal_id: ids
+                for tidal_id, ids in track_ids.items()
+                if items_fingerprint(ids) != playlists[tidal_id].items_fingerprint
+            }
+
+            all_track_ids = {track_id for ids in changed_ids.values() for track_id in ids}
+            known = set(
+                Song.objects.filter(tidal_id__in=all_track_ids).values_list("tidal_id", flat=True)
+            )
+            tracks = self.catalog.get_tracks(user, self.api_client, all_track_ids - known)
+
+            progress.report(stage=f"Saving {names}")
+            with transaction.atomic():
+                self.upsert_songs(tracks.values())
+                songs = dict(
+                    Song.objects.filter(tidal_id__in=all_track_ids).values_list("tidal_id", "pk")
+                )
+                for tidal_id in changed_ids:
+                    written = self.apply_diff(playlists[tidal_id], items[tidal_id], songs)
+                    progress.report(items=sum(written))
+                self.save_fingerprints(playlists, track_ids, attributes)
+        except Exception:
+            logger.exception(f"Playlist sync failed for user: {user.username}")
+            self._set_status(queryset, Playlist.SyncStatus.FAILED)
+            raise
+
+        self._set_status(queryset, Playlist.SyncStatus.COMPLETED)
+        return len(playlists)
+
+    def upsert_songs(self, tracks):
+        """
+        Create or update Song rows, with their album and artists, from resolved tracks.
+        """
+        tracks = list(tracks)
+        artists = {artist["id"]: artist for track in tracks for artist in track["artists"]}
+        albums = {track["album"]["id"]: track["album"] for track in tracks if track["album"]}
+
+        Artist.objects.bulk_create(
+            [
+                Artist(tidal_id=artist["id"], name=(artist.get("name") or "Unknown Artist")[:256])
+                for artist in artists.values()
+            ],
+            batch_size=self.chunk_size,
+            update_conflicts=True,
+            unique_fields=["tidal_id"],
+            update_fields=["name"],
+        )
+        Album.objects.bulk_create(
+            [
+                Album(
+                    tidal_id=album["id"],
+                    title=(album.get("title") or "Unknown Album")[:256],
+                    release_date=parse_date(album.get("release_date") or ""),
+                )
+                for album in albums.values()
+            ],
+            batch_size=self.chunk_size,
+            update_conflicts=True,
+            unique_fields=["tidal_id"],
+            update_fields=["title", "release_date"],
+        )
+        album_pks = dict(Album.objects.filter(tidal_id__in=albums).values_list("tidal_id", "pk"))
+
+        rows = [
+            Song(
+                tidal_id=track["id"],
+                title=(track.get("title") or "Unknown Track")[:256],
+                ISRC=track.get("isrc"),
+                duration=parse_duration(track.get("duration") or ""),
+                album_id=album_pks.get((track["album"] or {}).get("id")),
+            )
+            for track in tracks
+        ]
+        Song.objects.bulk_create(
+            rows,
+            batch_size=self.chunk_size,
+            update_conflicts=True,
+            unique_fields=["tidal_id"],
+            update_fields=["title", "ISRC", "duration", "album"],
+        )
+
+        # Replace the artist links of the songs just written
+        song_pks = dict(
+            Song.objects.filter(tidal_id__in=[row.tidal_id for row in rows]).values_list(
+                "tidal_id", "pk"
+            )
+        )
+        artist_pks = dict(Artist.objects.filter(tidal_id__in=artists).values_list("tidal_id", "pk"))
+        through = Song.artists.through
+        through.objects.filter(song_id__in=song_pks.values()).delete()
+        through.objects.bulk_create(
+            [
+                through(song_id=song_pks[track["id"]], artist_id=artist_pks[artist["id"]])
+                for track in tracks
+                for artist in {artist["id"]: artist for artist in track["artists"]}.values()
+            ],
+            batch_size=self.chunk_size,
+            ignore_conflicts=True,
+        )
+
+        search.index("artist", artist_pks.values())
+        search.index("album", album_pks.values())
+        search.index("song", song_pks.values())
+
+    def apply_diff(self, playlist, items, songs):
+        """
+        Bring a playlist's items in line with Tidal's ordered playlist items, keeping
+        rows whose song is still there and writing only what was added, removed or
+        moved. songs maps track ids to Song pks. Returns (added, removed, moved) counts.
+        """
+        wanted = [
+            (
+                songs[item["id"]],
+                parse_datetime(item.get("meta", {}).get("addedAt") or ""),
+                item.get("meta", {}).get("itemId"),
+            )
+            for item in items
+            if item["id"] in songs
+        ]
+        current = list(
+            PlaylistItem.objects.filter(playlist=playlist).only(
+                "id", "song_id", "position", "item_id"
+            )
+        )
+
+        # Rows already holding the right song at the right position stay untouched
+        by_position = {(row.position, row.song_id): row for row in current}
+        matched = {}
+        relabelled = []
+        for position, (song_id, _, item_id) in enumerate(wanted):
+            row = by_position.pop((position, song_id), None)
+            if row is not None:
+                matched[position] = row
+                if row.item_id != item_id:
+                    row.item_id = item_id
+                    relabelled.append(row)
+
+        # Other rows of a wanted song are moved; whatever is left over is removed
+        spare = defaultdict(list)
+        for row in by_position.values():
+            spare[row.song_id].append(row)
+        for rows in spare.values():
+            rows.sort(key=lambda row: row.position, reverse=True)
+
+        moved, added = [], []
+        for position, (song_id, added_at, item_id) in enumerate(wanted):
+            if position in matched:
+                continue
+            if spare[song_id]:
+                row = spare[song_id].pop()
+                row.position = position
+                row.item_id = item_id
+                moved.append(row)
+            else:
+                added.append(
+                    PlaylistItem(
+                        playlist=playlist,
+                        song_id=song_id,
+                        position=position,
+                        added_at=added_at,
+                        item_id=item_id,
+                    )
+                )
+
+        removed = [row.pk for rows in spare.values() for row in rows]
+        if removed:
+            PlaylistItem.objects.filter(pk__in=removed).delete()
+        PlaylistItem.objects.bulk_update(
+            moved + relabelled, ["position", "item_id"], batch_size=self.chunk_size
+        )
+        PlaylistItem.objects.bulk_create(added, batch_size=self.chunk_size)
+        return len(added), len(removed), len(moved)
+
+    def save_fingerprints(self, playlists, track_ids, attributes):
+        rows = []
+        for tidal_id, ids in track_ids.items():
+            row = playlists[tidal_id]
+            playlist_attributes = attributes.get(tidal_id, {})
+            row.last_modified_at = parse_datetime(playlist_attributes.get("lastModifiedAt") or "")
+            row.item_count = playlist_attributes.get("numberOfItems")
+            row.items_fingerprint = items_fingerprint(ids)
+            rows.append(row)
+
+        Playlist.objects.bulk_update(
+            rows,
+            ["last_modified_at", "item_count", "items_fingerprint"],
+            batch_size=self.chunk_size,
+        )
+
+    def _set_status(self, queryset, status):
+        queryset.update(sync_status=status, synced_at=timezone.now())
@@ -1,30 +1,135 @@
-def sync_playlists(user):
-    """
-    Sync playlists for the given user.
-    """
-    from tidal.api import TidalAPI
-    from tidal.models import Playlist, SyncStatus
-
-    api = TidalAPI()
-    limit = 50
-    offset = 0
-    while True:
-        playlists_data = api.get_user_playlists(user, limit=limit, offset=offset)
-        items = playlists_data.get("items", [])
-        if not items:
-            break
-
-        for item in items:
-            playlist, created = Playlist.objects.update_or_create(
-                tidal_id=item["uuid"],
-                defaults={
-                    "name": item["title"],
-                    "sync_status": SyncStatus.PENDING,
-                },
-            )
-            # Here you might want to trigger a task to sync songs in the playlist
-            # e.g., sync_playlist_songs.delay(playlist.id)
-
-        offset += limit
-        if offset >= playlists_data.get("totalNumberOfItems", 0):
-            break
+import math
+
+from jobs.models import Job
+from jobs.queue import enqueue, user_tenant
+from jobs.registry import register
+from tidal.api import ITEMS_PER_PAGE
+
+
+@register("tidal.sync_playlists")
+def run_sync(user_id, force=False):
+    """
+    Work out which of the user's playlists changed and queue a sync of each, so a
+    large library is synced in small units that interleave with other users' work.
+    """
+    from django.contrib.auth.models import User
+
+    from tidal.sync import PlaylistSyncEngine
+
+    user = User.objects.get(pk=user_id)
+    _, changed = PlaylistSyncEngine().plan_user(user, force)
+    for tidal_id, attributes in changed.items():
+        enqueue_playlist_sync(
+            user_id, tidal_id, attributes, item_count=attributes.get("numberOfItems")
+        )
+
+
+@register("tidal.sync_playlist")
+def run_playlist_sync(user_id, playlist_id, attributes=None):
+    from django.contrib.auth.models import User
+
+    from tidal.sync import PlaylistSyncEngine
+
+    PlaylistSyncEngine().sync_playlist(
+        User.objects.select_related("tidal_token").get(pk=user_id), playlist_id, attributes
+    )
+
+
+@register("tidal.import_playlist")
+def run_import(job_id):
+    """
+    Import an uploaded playlist into the user's Tidal account.
+    """
+    from tidal.importer import PlaylistImporter
+    from tidal.models import ImportJob
+
+    PlaylistImporter().run(ImportJob.objects.select_related("owner").get(pk=job_id))
+
+
+@register("tidal.flush_playlist_edits")
+def run_flush(playlist_pk):
+    from tidal.edits import EditFlusher
+    from tidal.models import PlaylistEditQueue
+
+    EditFlusher().flush(playlist_pk)
+    due_at = (
+        PlaylistEditQueue.objects.filter(playlist_id=playlist_pk, due_at__isnull=False)
+        .values_list("due_at", flat=True)
+        .first()
+    )
+    if due_at is not None:
+        schedule_edit_flush(playlist_pk, due_at)
+
+
+def enqueue_sync_playlists(user_id):
+    """
+    Queue a playlist sync for the user. A user whose sync is already waiting in the
+    queue is not queued twice. Returns True if the sync was queued.
+    """
+    _, created = enqueue(
+        "tidal.sync_playlists",
+        {"user_id": user_id},
+        dedupe_key=f"tidal.sync:{user_id}",
+        tenant=user_tenant(user_id),
+    )
+    return created
+
+
+def enqueue_playlist_sync(user_id, playlist_id, attributes=None, item_count=0, interactive=False):
+    """
+    Queue a sync of one playlist, costed by the pages of items it fetches. An
+    interactive sync, one the user is waiting for, goes ahead of background syncs
+    and takes over a background sync of the same playlist that is still waiting.
+    Returns True if the sync was queued.
+    """
+    args = {"user_id": user_id, "playlist_id": playlist_id}
+    if attributes is not None:
+        args["attributes"] = attributes
+    _, created = enqueue(
+        "tidal.sync_playlist",
+        args,
+        priority=Job.Priority.HIGH if interactive else Job.Priority.NORMAL,
+        dedupe_key=f"tidal.sync:{user_id}:{playlist_id}",
+        tenant=user_tenant(user_id),
+        cost=1 + math.ceil((item_count or 0) / ITEMS_PER_PAGE),
+    )
+    return created
+
+
+def enqueue_import(job_id):
+    """
+    Queue a playlist import ahead of syncs, since its user is watching the progress.
+    Imports create a playlist on Tidal, so a failed one is not retried.
+    """
+    from tidal.models import ImportJob
+
+    owner_id = ImportJob.objects.values_list("owner_id", flat=True).get(pk=job_id)
+    job, _ = enqueue(
+        "tidal.import_playlist",
+        {"job_id": job_id},
+        priority=Job.Priority.HIGH,
+        dedupe_key=f"tidal.import:{job_id}",
+        max_attempts=1,
+        tenant=user_tenant(owner_id),
+    )
+    return job
+
+
+def schedule_edit_flush(playlist_pk, due_at):
+    """
+    Flush a playlist's queued edits once they are due. A playlist has at most one
+    flush waiting; when it runs early because more edits pushed the due time back,
+    the flush is queued again for the new time. Returns True if a flush was queued.
+    """
+    from tidal.models import Playlist
+
+    owner_id = Playlist.objects.values_list("owner_id", flat=True).get(pk=playlist_pk)
+    _, created = enqueue(
+        "tidal.flush_playlist_edits",
+        {"playlist_pk": playlist_pk},
+        priority=Job.Priority.HIGH,
+        dedupe_key=f"tidal.edits:{playlist_pk}",
+        run_at=due_at,
+        tenant=user_tenant(owner_id),
+    )
+    return created
@@ -0,0 +1,43 @@
+import threading
+import time
+
+
+class TokenCache:
+    """
+    Thread-safe in-process cache of authorization header values, each kept until
+    its own expiry timestamp.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if time.time() >= expires_at:
+                del self._entries[key]
+                return None
+            return value
+
+    def set(self, key, value, expires_at):
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# User tokens keyed by user id, valid until they enter the refresh buffer
+user_tokens = TokenCache()
+
+# Client credentials tokens keyed by client id, shared by every TidalTokenManager
+app_tokens = TokenCache()
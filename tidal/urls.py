@@ -9,4 +9,35 @@ urlpatterns = [
     path("auth/callback/", views.tidal_callback, name="tidal_callback"),
     path("playlists/", views.user_playlists, name="tidal_playlists"),
     path("playlists/<str:playlist_id>/", views.playlist_tracks, name="playlist_tracks"),
+    path(
+        "playlists/<str:playlist_id>/tracks/",
+        views.playlist_tracks_page,
+        name="playlist_tracks_page",
+    ),
+    path(
+        "playlists/<str:playlist_id>/edits/",
+        views.playlist_edits,
+        name="playlist_edits",
+    ),
+    path(
+        "playlists/<str:playlist_id>/refresh/",
+        views.playlist_refresh,
+        name="playlist_refresh",
+    ),
+    path(
+        "playlists/<str:playlist_id>/export/<str:fmt>/",
+        views.export_playlist,
+        name="export_playlist",
+    ),
+    path("export/", views.export_library, name="export_library"),
+    path("import/", views.import_playlist, name="import_playlist"),
+    path("import/<int:job_id>/", views.import_progress, name="import_status"),
+    path("import/<int:job_id>/result/", views.import_result, name="import_result"),
+    path("search/", views.search_library, name="search"),
+    path("async/playlists/", views.async_user_playlists, name="async_tidal_playlists"),
+    path(
+        "async/playlists/<str:playlist_id>/",
+        views.async_playlist_tracks,
+        name="async_playlist_tracks",
+    ),
 ]
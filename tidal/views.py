@@ -1,16 +1,38 @@
+import asyncio
+import json
 import logging
+from urllib.parse import urlencode
 
+from asgiref.sync import sync_to_async
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponseBadRequest
-from django.shortcuts import redirect, render
+from django.contrib.auth.views import redirect_to_login
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponseBadRequest,
+    HttpResponseNotAllowed,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
-from django.views.decorators.http import require_GET
+from django.utils.dateparse import parse_duration
+from django.views.decorators.http import require_GET, require_POST
 
+from . import edits, export, importer, search
 from .api import TidalAPIClient, TidalOAuthManager, TidalTokenManager
+from .async_api import AsyncTidalAPIClient
+from .cache import ReadThroughCache
+from .catalog import TrackCatalog
+from .models import ImportJob, Playlist, PlaylistEditQueue
+from .tasks import enqueue_import, enqueue_playlist_sync, enqueue_sync_playlists
 
 logger = logging.getLogger(__name__)
 
+TRACK_PAGE_SIZE = 50
+MAX_TRACK_PAGE_SIZE = 200
+
 
 def auto_login_test_user(request):
     from django.contrib.auth import login
@@ -107,6 +129,7 @@ def tidal_callback(request):
         token_manager.save_tidal_user_id(request.user)
 
         logger.info(f"Tokens saved for user: {request.user.username}")
+        enqueue_sync_playlists(request.user.pk)
 
         # Redirect to success page (you can customize this)
         return redirect(reverse("index"))  # or wherever you want to redirect after successful auth
@@ -116,13 +139,261 @@ def tidal_callback(request):
         return HttpResponseBadRequest(f"Token exchange failed: {e}")
 
 
+def fetch_playlists(user):
+    """
+    Fetch every playlist in the user's collection with its attributes.
+    """
+    api_client = TidalAPIClient()
+    playlist_ids = [item["id"] for item in api_client.get_all_user_playlists(user)]
+    data, _ = api_client.fetch_resources(user, "playlists", playlist_ids)
+
+    order = {playlist_id: index for index, playlist_id in enumerate(playlist_ids)}
+    return sorted(data, key=lambda item: order.get(item["id"], len(order)))
+
+
+def fetch_playlist(user, playlist_id):
+    """
+    Fetch a playlist's attributes in the shape the templates expect.
+    """
+    data, _ = TidalAPIClient().fetch_resources(user, "playlists", [playlist_id])
+    return playlist_context(playlist_id, data)
+
+
+def playlist_context(playlist_id, data):
+    if not data:
+        raise ValueError(f"Playlist {playlist_id} not found")
+
+    attributes = data[0].get("attributes", {})
+    return {
+        "id": data[0]["id"],
+        "title": attributes.get("name", "Unknown Playlist"),
+        "description": attributes.get("description", ""),
+        "numberOfItems": attributes.get("numberOfItems"),
+        "imageLinks": attributes.get("imageLinks", []),
+    }
+
+
+def _take_tracks(taken, items, page_cursor, next_cursor, offset, limit):
+    """
+    Add the tracks of one Tidal page, from offset on, to taken until it holds limit.
+    Returns (offset into the next Tidal page, or None once the walk is done; where the
+    following page starts as {"cursor", "skip"}, or None at the end of the playlist).
+    """
+    track_ids = [item["id"] for item in items if item.get("type") == "tracks"]
+    if offset >= len(track_ids):
+        # Still skipping to the first track of the page
+        return (offset - len(track_ids), None) if next_cursor else (None, None)
+
+    chunk = track_ids[offset : offset + limit - len(taken)]
+    taken.extend(chunk)
+    end = offset + len(chunk)
+    if end < len(track_ids):
+        return None, {"cursor": page_cursor or "", "skip": end}
+    if not next_cursor:
+        return None, None
+    if len(taken) == limit:
+        return None, {"cursor": next_cursor, "skip": 0}
+    return 0, None
+
+
+def _tidal_track_rows(track_ids, tracks, after, following):
+    """
+    Rows and continuation of a page read from Tidal, in the shape of synced_track_page.
+    """
+    rows = [
+        {
+            "position": position,
+            "item": {
+                **tracks[track_id],
+                "duration": format_duration(tracks[track_id].get("duration")),
+            },
+        }
+        for position, track_id in enumerate(track_ids, after + 1)
+        if track_id in tracks
+    ]
+    if following is None:
+        return rows, None
+    return rows, {"after": after + len(track_ids), **following}
+
+
+def _start(cursor, skip, after):
+    """
+    Where a page read from Tidal starts: after a cursor, skip that many tracks of its
+    Tidal page; without one, walk from the first Tidal page past position after.
+    """
+    if skip is None:
+        skip = 0 if cursor else after + 1
+    return cursor or None, skip
+
+
+def fetch_track_page(user, playlist_id, after=-1, limit=TRACK_PAGE_SIZE, cursor=None, skip=None):
+    """
+    Page of an unsynced playlist's tracks, fetching only the Tidal pages it spans.
+
+    Tidal's cursors are opaque, so a page continues from the cursor of the Tidal page
+    holding its first track. Returns (tracks, continuation or None), where the
+    continuation holds the after, cursor and skip of the next page.
+    """
+    api_client = TidalAPIClient()
+    page_cursor, offset = _start(cursor, skip, after)
+    taken, seen_cursors = [], set()
+    while offset is not None:
+        items, next_cursor = api_client.get_playlist_tracks(user, playlist_id, page_cursor)
+        offset, following = _take_tracks(taken, items, page_cursor, next_cursor, offset, limit)
+        if offset is not None:
+            TidalAPIClient._check_cursor(next_cursor, seen_cursors)
+            page_cursor = next_cursor
+
+    tracks = TrackCatalog().get_tracks(user, api_client, taken)
+    return _tidal_track_rows(taken, tracks, after, following)
+
+
+def format_duration(duration):
+    """
+    Format a timedelta or an ISO 8601 duration string as m:ss.
+    """
+    if isinstance(duration, str):
+        duration = parse_duration(duration)
+    if not duration:
+        return ""
+    minutes, seconds = divmod(int(duration.total_seconds()), 60)
+    return f"{minutes}:{seconds:02d}"
+
+
+def synced_playlist(user, playlist_id):
+    """
+    Returns the user's completely synced Playlist row, or None.
+    """
+    return Playlist.objects.filter(
+        owner=user, tidal_id=playlist_id, sync_status=Playlist.SyncStatus.COMPLETED
+    ).first()
+
+
+def _page(rows, limit):
+    """
+    Cut a page from limit + 1 rows. Returns (rows, position to continue after or None).
+    """
+    if len(rows) > limit:
+        return rows[:limit], rows[limit - 1]["position"]
+    return rows, None
+
+
+def synced_track_page(playlist, after=-1, limit=TRACK_PAGE_SIZE):
+    """
+    Keyset page of a synced playlist's tracks after the given position, read with one
+    range scan of the (playlist, position) index.
+    """
+    items = playlist.ordered_items().filter(position__gt=after)[: limit + 1]
+    rows = [
+        {
+            "position": item.position,
+            "pk": item.pk,
+            "item": {
+                "id": item.song.tidal_id,
+                "title": item.song.title,
+                "duration": format_duration(item.song.duration),
+                "artists": [
+                    {"id": artist.tidal_id, "name": artist.name}
+                    for artist in item.song.artists.all()
+                ],
+                "album": item.song.album
+                and {"id": item.song.album.tidal_id, "title": item.song.album.title},
+            },
+        }
+        for item in items
+    ]
+    return _page(rows, limit)
+
+
+def synced_page(playlist, after=-1, limit=TRACK_PAGE_SIZE):
+    """
+    synced_track_page with the query parameters of the next page, as track_page returns.
+    """
+    tracks, next_after = synced_track_page(playlist, after, limit)
+    return tracks, None if next_after is None else {"after": next_after}
+
+
+def valid_cursor(playlist_id, cursor):
+    """
+    Whether cursor continues the playlist's items, as Tidal's `links.next` does.
+    """
+    return not cursor or cursor.startswith(f"/playlists/{playlist_id}/relationships/items?")
+
+
+def tidal_track_page(user, playlist_id, after=-1, limit=TRACK_PAGE_SIZE, cursor=None, skip=None):
+    """
+    fetch_track_page through the read-through cache.
+    """
+    return ReadThroughCache().get_or_fetch(
+        user,
+        "playlist_tracks",
+        lambda: fetch_track_page(user, playlist_id, after, limit, cursor, skip),
+        playlist_id,
+        after,
+        limit,
+        cursor or "",
+        skip,
+    )
+
+
+def track_page(user, playlist_id, after=-1, limit=TRACK_PAGE_SIZE, cursor=None, skip=None):
+    """
+    Page of a playlist's tracks from the database when it is synced, from Tidal otherwise.
+    Returns (tracks, query parameters of the next page or None).
+    """
+    playlist = synced_playlist(user, playlist_id)
+    if playlist is not None:
+        return synced_page(playlist, after, limit)
+    return tidal_track_page(user, playlist_id, after, limit, cursor, skip)
+
+
+async def afetch_playlists(user):
+    """
+    Async variant of fetch_playlists.
+    """
+    api_client = AsyncTidalAPIClient()
+    playlist_ids = [item["id"] for item in await api_client.get_all_user_playlists(user)]
+    data, _ = await api_client.fetch_resources(user, "playlists", playlist_ids)
+
+    order = {playlist_id: index for index, playlist_id in enumerate(playlist_ids)}
+    return sorted(data, key=lambda item: order.get(item["id"], len(order)))
+
+
+async def afetch_playlist(user, playlist_id):
+    """
+    Async variant of fetch_playlist.
+    """
+    data, _ = await AsyncTidalAPIClient().fetch_resources(user, "playlists", [playlist_id])
+    return playlist_context(playlist_id, data)
+
+
+async def afetch_track_page(user, playlist_id, after=-1, limit=TRACK_PAGE_SIZE):
+    """
+    Async variant of fetch_track_page.
+    """
+    api_client = AsyncTidalAPIClient()
+    page_cursor, offset = _start(None, None, after)
+    taken, seen_cursors = [], set()
+    while offset is not None:
+        items, next_cursor = await api_client.get_playlist_tracks(user, playlist_id, page_cursor)
+        offset, following = _take_tracks(taken, items, page_cursor, next_cursor, offset, limit)
+        if offset is not None:
+            TidalAPIClient._check_cursor(next_cursor, seen_cursors)
+            page_cursor = next_cursor
+
+    tracks = await TrackCatalog().aget_tracks(user, api_client, taken)
+    return _tidal_track_rows(taken, tracks, after, following)
+
+
+@login_required
 def user_playlists(request):
     """
     Display user's Tidal playlists in a folder-like interface.
     """
     try:
-        api_client = TidalAPIClient()
-        playlists = api_client.get_user_playlists(request.user)
+        playlists = ReadThroughCache().get_or_fetch(
+            request.user, "playlists", lambda: fetch_playlists(request.user)
+        )
 
         context = {"playlists": playlists, "current_path": "My Playlists"}
         return render(request, "tidal/playlists.html", context)
@@ -133,22 +404,40 @@ def user_playlists(request):
         return redirect("index")
 
 
+@login_required
 def playlist_tracks(request, playlist_id):
     """
-    Display tracks from a specific playlist.
+    Display a playlist's header and the first page of its tracks.
+    Synced playlists are rendered from the database without calling Tidal.
     """
     try:
-        api_client = TidalAPIClient()
-
-        # Get playlist details and tracks
-        playlist_details = api_client.get_playlist_details(request.user, playlist_id)
-        tracks = api_client.get_playlist_tracks(request.user, playlist_id)
+        user = request.user
+
+        playlist = synced_playlist(user, playlist_id)
+        if playlist is not None:
+            playlist_details = {
+                "id": playlist.tidal_id,
+                "title": playlist.name,
+                "numberOfItems": playlist.item_count,
+            }
+            tracks, following = synced_page(playlist)
+            edits_url = reverse("tidal:playlist_edits", args=[playlist_id])
+        else:
+            playlist_details = ReadThroughCache().get_or_fetch(
+                user, "playlist", lambda: fetch_playlist(user, playlist_id), playlist_id
+            )
+            tracks, following = tidal_track_page(user, playlist_id)
+            edits_url = None
 
         context = {
             "playlist": playlist_details,
             "tracks": tracks,
+            "next_query": urlencode(following or {}),
+            "track_count": playlist_details.get("numberOfItems") or len(tracks),
             "current_path": f"My Playlists / {playlist_details.get('title', 'Unknown Playlist')}",
             "playlist_id": playlist_id,
+            "edits_url": edits_url,
+            "revision": playlist.revision if playlist is not None else None,
         }
 
         return render(request, "tidal/playlist_tracks.html", context)
@@ -156,4 +445,301 @@ def playlist_tracks(request, playlist_id):
     except Exception as e:
         logger.error(f"Failed to fetch playlist tracks for playlist {playlist_id}: {e}")
         messages.error(request, f"Failed to load playlist: {e}")
-        return redirect("tidal_playlists")
+        return redirect("tidal:tidal_playlists")
+
+
+@require_POST
+@login_required
+def playlist_refresh(request, playlist_id):
+    """
+    Queue a sync of one playlist ahead of the background syncs, since the user is
+    waiting for it, and go back to the playlist.
+    """
+    item_count = (
+        Playlist.objects.filter(owner=request.user, tidal_id=playlist_id)
+        .values_list("item_count", flat=True)
+        .first()
+    )
+    enqueue_playlist_sync(request.user.pk, playlist_id, item_count=item_count, interactive=True)
+    messages.info(request, "The playlist will be refreshed from Tidal shortly.")
+    return redirect("tidal:playlist_tracks", playlist_id=playlist_id)
+
+
+@require_GET
+@login_required
+def playlist_tracks_page(request, playlist_id):
+    """
+    One keyset page of a playlist's tracks, continuing after ?after=<position>.
+    Pages of unsynced playlists also carry Tidal's ?cursor= and the tracks to ?skip= of
+    its page. Returns an Unpoly fragment, or JSON with ?format=json or an
+    application/json Accept.
+    """
+    try:
+        after = max(int(request.GET.get("after", -1)), -1)
+        limit = min(max(int(request.GET.get("limit", TRACK_PAGE_SIZE)), 1), MAX_TRACK_PAGE_SIZE)
+        skip = request.GET.get("skip")
+        skip = None if skip is None else max(int(skip), 0)
+    except ValueError:
+        return HttpResponseBadRequest("after, limit and skip must be integers")
+    cursor = request.GET.get("cursor", "")
+    if not valid_cursor(playlist_id, cursor):
+        return HttpResponseBadRequest("cursor does not continue this playlist")
+
+    tracks, following = track_page(request.user, playlist_id, after, limit, cursor, skip)
+
+    if request.GET.get("format") == "json" or request.headers.get("Accept", "").startswith(
+        "application/json"
+    ):
+        next_url = None
+        if following is not None:
+            page_url = reverse("tidal:playlist_tracks_page", args=[playlist_id])
+            query = urlencode({**following, "limit": limit, "format": "json"})
+            next_url = f"{page_url}?{query}"
+        after = following and following["after"]
+        return JsonResponse({"tracks": tracks, "after": after, "next": next_url})
+
+    context = {
+        "tracks": tracks,
+        "next_query": urlencode(following or {}),
+        "playlist_id": playlist_id,
+    }
+    return render(request, "tidal/_track_page.html", context)
+
+
+@require_GET
+@login_required
+def export_playlist(request, playlist_id, fmt):
+    """
+    Download a synced playlist as CSV, JSON Lines, M3U8 or XSPF, streamed from the database.
+    Answers 409 while the playlist is not completely synced, since its stored tracks
+    may be partial or out of date.
+    """
+    if fmt not in export.FORMATS:
+        raise Http404(f"Unknown export format: {fmt}")
+    playlist = get_object_or_404(Playlist, owner=request.user, tidal_id=playlist_id)
+    if playlist.sync_status != Playlist.SyncStatus.COMPLETED:
+        return JsonResponse(
+            {"error": "not_synced", "sync_status": playlist.sync_status}, status=409
+        )
+
+    response = StreamingHttpResponse(
+        (chunk.encode() for chunk in export.export_playlist(playlist, fmt)),
+        content_type=export.FORMATS[fmt][0],
+    )
+    response[
+        "Content-Disposition"
+    ] = f'attachment; filename="{export.export_filename(playlist, fmt)}"'
+    return response
+
+
+@require_GET
+@login_required
+def export_library(request):
+    """
+    Download every synced playlist of the user as a streamed ZIP, one file per playlist.
+    """
+    fmt = request.GET.get("format", "csv")
+    if fmt not in export.FORMATS:
+        return HttpResponseBadRequest(f"Unknown export format: {fmt}")
+
+    response = StreamingHttpResponse(
+        export.export_library(request.user, fmt), content_type="application/zip"
+    )
+    response["Content-Disposition"] = 'attachment; filename="harmoniq-library.zip"'
+    return response
+
+
+@login_required
+def playlist_edits(request, playlist_id):
+    """
+    Edit a synced playlist's order. POST a JSON body
+    {"revision": <revision the edits are based on>, "ops": [...]} (see edits.apply_edits):
+    the local order changes at once and Tidal is updated after a short debounce.
+    Answers 409 with the current revision when the edits are based on a stale one.
+    GET returns the revision and whether edits are waiting to be written.
+    """
+    playlist = synced_playlist(request.user, playlist_id)
+    if playlist is None:
+        raise Http404("Playlist is not synced")
+
+    if request.method == "GET":
+        queue = PlaylistEditQueue.objects.filter(playlist=playlist).first()
+        return JsonResponse(
+            {
+                "revision": playlist.revision,
+                "pending": bool(queue and queue.due_at),
+                "due_at": queue.due_at if queue else None,
+            }
+        )
+    if request.method != "POST":
+        return HttpResponseNotAllowed(["GET", "POST"])
+
+    try:
+        body = json.loads(request.body)
+        revision, due_at = edits.apply_edits(
+            request.user, playlist, body.get("ops", []), base_revision=body.get("revision")
+        )
+    except edits.EditConflict as e:
+        return JsonResponse({"error": "conflict", "revision": e.revision}, status=409)
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    return JsonResponse({"revision": revision, "pending": True, "due_at": due_at}, status=202)
+
+
+def import_status(job):
+    return {
+        "id": job.pk,
+        "name": job.name,
+        "status": job.status,
+        "playlist_id": job.playlist_tidal_id or None,
+        "lines": job.lines,
+        "matched": job.matched,
+        "unmatched": job.unmatched,
+        "added": job.added,
+        "error": job.error or None,
+        "result_url": (reverse("tidal:import_result", args=[job.pk]) if job.result else None),
+    }
+
+
+@require_POST
+@login_required
+def import_playlist(request):
+    """
+    Upload a CSV, M3U or JSON playlist and start importing it into Tidal in the
+    background. Returns the job's status URL with 202 Accepted.
+    """
+    upload = request.FILES.get("file")
+    if upload is None:
+        return JsonResponse({"error": "file is required"}, status=400)
+
+    fmt = request.POST.get("format") or importer.guess_format(upload.name)
+    if fmt not in ImportJob.Format.values:
+        return JsonResponse({"error": f"Unknown import format: {fmt}"}, status=400)
+
+    name = request.POST.get("name") or upload.name.rsplit(".", 1)[0]
+    job = ImportJob.objects.create(owner=request.user, name=name, format=fmt, source=upload)
+    enqueue_import(job.pk)
+
+    response = JsonResponse(import_status(job), status=202)
+    response["Location"] = reverse("tidal:import_status", args=[job.pk])
+    return response
+
+
+@require_GET
+@login_required
+def import_progress(request, job_id):
+    """
+    Progress of one of the user's imports as JSON.
+    """
+    job = get_object_or_404(ImportJob, pk=job_id, owner=request.user)
+    return JsonResponse(import_status(job))
+
+
+@require_GET
+@login_required
+def import_result(request, job_id):
+    """
+    Download the per-line result CSV of a finished import.
+    """
+    job = get_object_or_404(ImportJob, pk=job_id, owner=request.user)
+    if not job.result:
+        raise Http404("Import has no result yet")
+    return FileResponse(
+        job.result.open("rb"), as_attachment=True, filename=f"import-{job.pk}-result.csv"
+    )
+
+
+@require_GET
+@login_required
+def search_library(request):
+    """
+    Search the user's synced library. Returns JSON results, best matches first.
+    """
+    try:
+        limit = int(request.GET.get("limit", 20))
+    except ValueError:
+        return JsonResponse({"error": "limit must be an integer"}, status=400)
+
+    query = request.GET.get("q", "")
+    return JsonResponse({"query": query, "results": search.search(request.user, query, limit)})
+
+
+async def async_user_playlists(request):
+    """
+    Async variant of user_playlists for ASGI deployments.
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        return redirect_to_login(request.get_full_path())
+
+    try:
+        playlists = await ReadThroughCache().aget_or_fetch(
+            user, "playlists", lambda: afetch_playlists(user)
+        )
+
+        context = {"playlists": playlists, "current_path": "My Playlists"}
+        return await sync_to_async(render)(request, "tidal/playlists.html", context)
+
+    except Exception as e:
+        logger.error(f"Failed to fetch playlists for user {user.username}: {e}")
+        messages.error(request, f"Failed to load playlists: {e}")
+        return redirect("index")
+
+
+async def async_playlist_tracks(request, playlist_id):
+    """
+    Async variant of playlist_tracks. Synced playlists are read from the database;
+    otherwise playlist details and the first page of tracks are fetched concurrently.
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        return redirect_to_login(request.get_full_path())
+
+    try:
+        playlist = await sync_to_async(synced_playlist)(user, playlist_id)
+        if playlist is not None:
+            playlist_details = {
+                "id": playlist.tidal_id,
+                "title": playlist.name,
+                "numberOfItems": playlist.item_count,
+            }
+            tracks, following = await sync_to_async(synced_page)(playlist)
+            edits_url = reverse("tidal:playlist_edits", args=[playlist_id])
+        else:
+            cache = ReadThroughCache()
+            playlist_details, (tracks, following) = await asyncio.gather(
+                cache.aget_or_fetch(
+                    user, "playlist", lambda: afetch_playlist(user, playlist_id), playlist_id
+                ),
+                cache.aget_or_fetch(
+                    user,
+                    "playlist_tracks",
+                    lambda: afetch_track_page(user, playlist_id),
+                    # The key of tidal_track_page's first page
+                    playlist_id,
+                    -1,
+                    TRACK_PAGE_SIZE,
+                    "",
+                    None,
+                ),
+            )
+            edits_url = None
+
+        context = {
+            "playlist": playlist_details,
+            "tracks": tracks,
+            "next_query": urlencode(following or {}),
+            "track_count": playlist_details.get("numberOfItems") or len(tracks),
+            "current_path": f"My Playlists / {playlist_details.get('title', 'Unknown Playlist')}",
+            "playlist_id": playlist_id,
+            "edits_url": edits_url,
+            "revision": playlist.revision if playlist is not None else None,
+        }
+
+        return await sync_to_async(render)(request, "tidal/playlist_tracks.html", context)
+
+    except Exception as e:
+        logger.error(f"Failed to fetch playlist tracks for playlist {playlist_id}: {e}")
+        messages.error(request, f"Failed to load playlist: {e}")
+        return redirect("tidal:tidal_playlists")